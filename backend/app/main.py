@@ -1,13 +1,42 @@
 import os
-from fastapi import FastAPI
+import threading
+from contextlib import asynccontextmanager
+from anyio import to_thread
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import text
 from .routers import data, chat, search, voice
+from .services import llm_service
+from .services.vector_service import vector_service
+from .utils import metrics, profiling
+from .utils.database import engine
+
+# Threads available to sync route handlers and dependencies (e.g. get_db).
+# Handlers beyond this wait for a free thread without blocking the event loop.
+API_THREADPOOL_SIZE = int(os.getenv("API_THREADPOOL_SIZE", "40"))
+
+
+def _warm_up():
+    """Loads the embedding model, FAISS index and Gemini client off the startup path."""
+    vector_service.load()
+    llm_service.warm_up()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    to_thread.current_default_thread_limiter().total_tokens = API_THREADPOOL_SIZE
+    # A daemon thread rather than the API thread pool: the warmup can take
+    # tens of seconds and must neither hold a handler thread nor delay
+    # shutdown. Until it finishes, /ready answers 503 while / already answers.
+    threading.Thread(target=_warm_up, name="warmup", daemon=True).start()
+    yield
 
 
 app = FastAPI(
     title="OceanAI",
     description="Next-Generation Oceanographic Data Intelligence Platform",
     version="0.1.0-mvp",
+    lifespan=lifespan,
 )
 
 origins_str = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:8000,http://localhost:8080")
@@ -19,7 +48,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paginated endpoints return the next page's cursor in this header.
+    expose_headers=["X-Next-Cursor"],
 )
+# Opt-in per-request profiles (see utils/profiling.py).
+app.add_middleware(profiling.ProfilingMiddleware)
+# Outermost, so request latency includes CORS handling.
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 app.include_router(data.router, prefix="/api/v1", tags=["ARGO Data"])
@@ -34,3 +69,42 @@ async def root():
     A simple health check endpoint to confirm the API is running.
     """
     return {"status": "ok", "message": "Welcome to the OceanAI Intelligence Core."}
+
+
+@app.get("/ready", tags=["Health Check"])
+def readiness(response: Response):
+    """
+    Readiness check, separate from the liveness check at /. Answers 503
+    until the database is reachable and the startup warmup has finished.
+    A component that failed to load (e.g. a missing FAISS index) is
+    reported but does not hold readiness back: the rest of the API works.
+    """
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        database = 'ready'
+    except Exception as e:
+        print(f"Database error: {e}")
+        database = 'failed'
+
+    components = {
+        'database': database,
+        'vector_search': vector_service.state,
+        'llm': llm_service.get_state(),
+    }
+    ready = database == 'ready' and 'loading' not in components.values()
+    if not ready:
+        response.status_code = 503
+    body = {'status': 'ready' if ready else 'not_ready', 'components': components}
+    if vector_service.error:
+        body['vector_search_error'] = vector_service.error
+    return body
+
+
+@app.get("/metrics", tags=["Health Check"])
+def get_metrics():
+    """
+    Request, SQL, connection pool, embedding and LLM latency histograms in
+    the Prometheus text format, for this worker process.
+    """
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,10 +1,18 @@
-from sqlalchemy import Column, Integer, DateTime, Float
+from sqlalchemy import Column, Integer, DateTime, Float, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import ARRAY, REAL
 from geoalchemy2 import Geometry
 from ..utils.database import Base
 
 class ArgoProfile(Base):
     __tablename__ = 'argo_profiles'
+    __table_args__ = (
+        # One row per profile; also serves lookups by float_id.
+        UniqueConstraint('float_id', 'cycle_number', name='argo_profiles_float_cycle_key'),
+        # Time-window filters; spatial filters use the GiST index on geom.
+        Index('idx_argo_profiles_profile_time', 'profile_time'),
+        # Keyset pages of one float's profiles (see data_service.iter_float_profiles).
+        Index('idx_argo_profiles_float_time', 'float_id', 'profile_time', 'cycle_number'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     float_id = Column(Integer, nullable=False)
@@ -15,4 +23,21 @@ class ArgoProfile(Base):
     pressure_dbar = Column(ARRAY(REAL))
     temperature_celsius = Column(ARRAY(REAL))
     salinity_psu = Column(ARRAY(REAL))
-    geom = Column(Geometry(geometry_type='POINT', srid=4326))
\ No newline at end of file
+    # The profile interpolated onto argo_standard_levels, one slot per level
+    # (NULL where not bracketed); see data/scripts/standard_levels.py.
+    temperature_std = Column(ARRAY(REAL))
+    salinity_std = Column(ARRAY(REAL))
+    geom = Column(Geometry(geometry_type='POINT', srid=4326))
+
+class ArgoFloatLatest(Base):
+    """Latest profile and profile count per float, maintained by the ingest."""
+    __tablename__ = 'argo_float_latest'
+
+    float_id = Column(Integer, primary_key=True)
+    cycle_number = Column(Integer, nullable=False)
+    profile_time = Column(DateTime(timezone=True), nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    profile_count = Column(Integer, nullable=False)
+    geom = Column(Geometry(geometry_type='POINT', srid=4326))
+    updated_at = Column(DateTime(timezone=True), nullable=False)
\ No newline at end of file
@@ -6,6 +6,9 @@ from ..utils.database import get_db
 
 router = APIRouter()
 
+# Plain `def`: the SQL and LLM calls below block, so FastAPI runs the handler
+# in the API thread pool rather than on the event loop.
+
 class ChatQuery(BaseModel):
     # This field now correctly matches the frontend request
     message: str
@@ -14,7 +17,7 @@ class ChatResponse(BaseModel):
     answer: str
 
 @router.post("/chat", response_model=ChatResponse)
-async def handle_chat_query(query: ChatQuery, db: Session = Depends(get_db)):
+def handle_chat_query(query: ChatQuery, db: Session = Depends(get_db)):
     """
     Receives a natural language question, queries the database,
     and returns an AI-generated answer based on the retrieved data.
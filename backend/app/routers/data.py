@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, ConfigDict
 import datetime
-from ..services import data_service
+from ..services import data_service, analytics_store, climatology_service
+from ..utils.cache import cached_response
+from ..utils import streaming
 
 # --- ADVISOR NOTE ---
 # We are defining explicit Pydantic models for our API responses. This is a best
@@ -29,27 +32,87 @@ class ArgoProfileResponse(BaseModel):
 
 # We'll need a way to get a DB session. This will live in utils.
 # For now, let's assume we have a get_db dependency.
-from ..utils.database import get_db 
+from ..utils.database import get_db, SessionLocal
 # And a service to handle the business logic.
 from ..services.data_service import get_profiles_by_float
 
 
 router = APIRouter()
 
+# Handlers that touch the database are plain `def`: FastAPI runs them in the
+# API thread pool (sized in main.py), so a slow query ties up one worker
+# thread instead of blocking the event loop for every other request.
+
+MAX_PROFILE_PAGE = 1000
+
+
+def _stream_float_profiles(float_id, after, limit, encode):
+    """
+    Body of a streamed response. It outlives the request's get_db session,
+    so it reads through a session of its own.
+    """
+    db = SessionLocal()
+    try:
+        yield from encode(data_service.iter_float_profiles(db, float_id, after=after, limit=limit))
+    finally:
+        db.close()
+
+
 @router.get("/argo/float/{float_id}", response_model=List[ArgoProfileResponse])
-async def read_float_profiles(float_id: int, db: Session = Depends(get_db)):
+def read_float_profiles(
+    float_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PROFILE_PAGE),
+    format: str = Query("json", pattern="^(json|ndjson|arrow)$"),
+    db: Session = Depends(get_db),
+):
     """
     Retrieves all recorded profiles for a specific ARGO float, identified by its ID.
     
     This endpoint is the backbone for tracking a single float's journey and sensor readings over time.
+
+    With `limit`, profiles come in pages ordered by (profile_time, cycle_number);
+    pass the `X-Next-Cursor` response header back as `cursor` for the next page.
+    `format=ndjson` or `format=arrow` (Arrow IPC stream) stream the rows as they
+    are read, without building the response in memory.
     """
-    profiles = get_profiles_by_float(db, float_id=float_id)
-    if not profiles:
+    if format == "json" and cursor is None and limit is None:
+        profiles = get_profiles_by_float(db, float_id=float_id)
+        if not profiles:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"AquaLense: No data found for ARGO float with ID {float_id}."
+            )
+        return profiles
+
+    try:
+        after = data_service.decode_profile_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if format == "arrow" and not streaming.arrow_available():
+        raise HTTPException(status_code=406, detail="Arrow output needs pyarrow installed on the server.")
+
+    has_rows, next_cursor = data_service.get_profile_page_bounds(db, float_id, after, limit)
+    if not has_rows and after is None:
         raise HTTPException(
-            status_code=404, 
+            status_code=404,
             detail=f"AquaLense: No data found for ARGO float with ID {float_id}."
         )
-    return profiles
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
+    if format == "ndjson":
+        return StreamingResponse(_stream_float_profiles(float_id, after, limit, streaming.ndjson_lines),
+                                 media_type=streaming.NDJSON_MEDIA_TYPE, headers=headers)
+    if format == "arrow":
+        schema = streaming.profile_arrow_schema()
+        return StreamingResponse(
+            _stream_float_profiles(float_id, after, limit, lambda rows: streaming.arrow_ipc_stream(rows, schema)),
+            media_type=streaming.ARROW_STREAM_MEDIA_TYPE, headers=headers,
+        )
+
+    response.headers.update(headers)
+    return list(data_service.iter_float_profiles(db, float_id, after=after, limit=limit))
 
 
 class FloatLocation(BaseModel):
@@ -63,20 +126,17 @@ class FloatLocation(BaseModel):
 # ... (keep the existing read_float_profiles endpoint) ...
 
 @router.get("/argo/locations")
-async def read_all_float_locations(db: Session = Depends(get_db)):
+def read_all_float_locations(db: Session = Depends(get_db)):
     """
     Retrieves the last known location of all ARGO floats in the database.
     This is used to populate the main 3D globe view.
     """
     try:
+        # argo_float_latest holds one row per float, updated by the ingest
         result = db.execute(text("""
-            SELECT DISTINCT ON (platform_id) 
-                platform_id as float_id,
-                latitude,
-                longitude,
-                timestamp as profile_time
-            FROM argo_profiles 
-            ORDER BY platform_id, timestamp DESC
+            SELECT float_id, latitude, longitude, profile_time
+            FROM argo_float_latest
+            ORDER BY float_id
         """))
         locations = []
         for row in result:
@@ -90,23 +150,214 @@ async def read_all_float_locations(db: Session = Depends(get_db)):
     except Exception as e:
         return {"error": str(e)}
 
+# --- Spatial / temporal search ---
+MAX_SEARCH_RESULTS = 10000
+MAX_CLUSTER_ZOOM = 12
+
+
+def _search_area(min_lat, max_lat, min_lon, max_lon, lat, lon, radius_km, required=True):
+    """Validates the area parameters into (bbox, center) for data_service."""
+    bbox_values = (min_lon, min_lat, max_lon, max_lat)
+    has_bbox = any(v is not None for v in bbox_values)
+    has_radius = any(v is not None for v in (lat, lon, radius_km))
+    if has_bbox and has_radius:
+        raise HTTPException(status_code=400, detail="Use either a bounding box or lat/lon/radius_km, not both.")
+    if has_bbox:
+        if any(v is None for v in bbox_values):
+            raise HTTPException(status_code=400, detail="A bounding box needs min_lat, max_lat, min_lon and max_lon.")
+        if min_lat > max_lat:
+            raise HTTPException(status_code=400, detail="min_lat must not be greater than max_lat.")
+        return bbox_values, None
+    if has_radius:
+        if lat is None or lon is None or radius_km is None:
+            raise HTTPException(status_code=400, detail="A radius search needs lat, lon and radius_km.")
+        return None, (lat, lon)
+    if required:
+        raise HTTPException(status_code=400, detail="Give a bounding box or lat/lon/radius_km.")
+    return None, None
+
+
+def _time_window(start, end):
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end.")
+    return start, end
+
+
+@router.get("/argo/profiles/search")
+def search_profiles(
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0, le=20000),
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    limit: int = Query(1000, ge=1, le=MAX_SEARCH_RESULTS),
+    include_measurements: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Profiles in a bounding box (min_lon > max_lon wraps the antimeridian) or
+    within radius_km of lat/lon, optionally between start and end.
+    Spatial filters use the GiST index on geom, time filters the profile_time index.
+    """
+    bbox, center = _search_area(min_lat, max_lat, min_lon, max_lon, lat, lon, radius_km)
+    start, end = _time_window(start, end)
+    return data_service.search_profiles(db, bbox=bbox, center=center, radius_km=radius_km,
+                                        start=start, end=end, limit=limit,
+                                        include_measurements=include_measurements)
+
+
+@router.get("/argo/profiles/clusters")
+def cluster_profiles(
+    zoom: int = Query(2, ge=0, le=MAX_CLUSTER_ZOOM),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Server-side grid clusters for the globe at coarse zoom levels. Cells are
+    180 / 2**zoom degrees wide; each cluster has a mean position and counts.
+    Without start/end the floats' latest positions are clustered.
+    """
+    bbox, _ = _search_area(min_lat, max_lat, min_lon, max_lon, None, None, None, required=False)
+    start, end = _time_window(start, end)
+    return data_service.cluster_profiles(db, zoom, bbox=bbox, start=start, end=end)
+
+
+@router.get("/argo/standard-levels")
+def read_standard_levels(db: Session = Depends(get_db)):
+    """The standard pressure levels (dbar) every profile is interpolated onto at ingest."""
+    return data_service.get_standard_levels(db)
+
+
+@router.get("/argo/profiles/depth-slice")
+def read_depth_slice(
+    pressure: float = Query(..., gt=0),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0, le=20000),
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    limit: int = Query(1000, ge=1, le=MAX_SEARCH_RESULTS),
+    db: Session = Depends(get_db),
+):
+    """
+    Temperature and salinity at one standard pressure level (see
+    /argo/standard-levels) for each profile, with the same optional area and
+    time filters as /argo/profiles/search. Values are interpolated at ingest,
+    so no raw levels are read.
+    """
+    levels = data_service.get_standard_levels(db)
+    if pressure not in levels:
+        raise HTTPException(status_code=400,
+                            detail=f"pressure must be one of the standard levels: {', '.join(f'{p:g}' for p in levels)}.")
+    bbox, center = _search_area(min_lat, max_lat, min_lon, max_lon, lat, lon, radius_km, required=False)
+    start, end = _time_window(start, end)
+    return data_service.get_depth_slice(db, pressure, bbox=bbox, center=center, radius_km=radius_km,
+                                        start=start, end=end, limit=limit)
+
+
+# --- Climatology cube ---
+# Served from the memory-mapped cube built by data/scripts/build_climatology.py;
+# no database access, so slices come back in milliseconds.
+def _require_climatology():
+    if not climatology_service.is_available():
+        raise HTTPException(status_code=503,
+                            detail="The climatology has not been built yet (data/scripts/build_climatology.py).")
+
+
+@router.get("/climatology")
+def read_climatology_meta():
+    """Grid, standard levels and variables of the climatology cube."""
+    _require_climatology()
+    return climatology_service.get_meta()
+
+
+@router.get("/climatology/map")
+def read_climatology_map(
+    pressure: float = Query(..., gt=0),
+    variable: str = Query("temperature", pattern="^(temperature|salinity)$"),
+    stat: str = Query("mean", pattern="^(mean|std|count)$"),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+):
+    """
+    A lat x lon map of the mean, standard deviation or count of `variable` at
+    one standard pressure level, for one month or (without `month`) the year.
+    """
+    _require_climatology()
+    bbox, _ = _search_area(min_lat, max_lat, min_lon, max_lon, None, None, None, required=False)
+    if bbox is not None and bbox[0] > bbox[2]:
+        raise HTTPException(status_code=400, detail="Climatology maps do not wrap the antimeridian; use min_lon <= max_lon.")
+    try:
+        return climatology_service.map_slice(variable, stat, pressure, month=month, bbox=bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/climatology/section")
+def read_climatology_section(
+    variable: str = Query("temperature", pattern="^(temperature|salinity)$"),
+    stat: str = Query("mean", pattern="^(mean|std|count)$"),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+):
+    """
+    A depth section across the standard levels: along the latitude `lat`
+    (levels x longitudes) or along the longitude `lon` (levels x latitudes).
+    """
+    _require_climatology()
+    if (lat is None) == (lon is None):
+        raise HTTPException(status_code=400, detail="Give exactly one of lat or lon.")
+    return climatology_service.depth_section(variable, stat, month=month, lat=lat, lon=lon)
+
+
+# The dashboard and home-page endpoints go through the response cache: results
+# are reused until the next ingest (or the cache TTL) and carry ETag and
+# Last-Modified so browsers can revalidate with a 304.
 @router.get("/dashboard/floats")
-async def get_float_summary(db: Session = Depends(get_db)):
+def get_float_summary(request: Request, db: Session = Depends(get_db)):
     """Get summary of all floats for dashboard"""
-    return data_service.get_float_summary(db)
+    return cached_response(request, 'dashboard_floats', lambda: data_service.get_float_summary(db))
 
 @router.get("/dashboard/metrics")
-async def get_ocean_metrics(db: Session = Depends(get_db)):
+def get_ocean_metrics(request: Request, db: Session = Depends(get_db)):
     """Get current ocean metrics"""
-    return data_service.get_ocean_metrics(db)
+    return cached_response(request, 'dashboard_metrics', lambda: data_service.get_ocean_metrics(db))
 
 @router.get("/dashboard/alerts")
-async def get_recent_alerts(db: Session = Depends(get_db)):
-    """Get recent system alerts"""
-    return data_service.get_recent_alerts(db)
+def get_recent_alerts(
+    request: Request,
+    limit: int = Query(5, ge=1, le=100),
+    before: Optional[int] = Query(None, ge=1),
+    kind: Optional[str] = Query(None, pattern="^(temperature_anomaly|salinity_anomaly|position_jump|stalled_float)$"),
+    db: Session = Depends(get_db),
+):
+    """
+    Recent anomaly alerts (out-of-range temperature or salinity, position
+    jumps, stalled floats), newest first. Pass the last alert's `id` as
+    `before` to page back.
+    """
+    return cached_response(request, f'dashboard_alerts:{limit}:{before}:{kind}',
+                           lambda: data_service.get_recent_alerts(db, limit=limit, before=before, kind=kind))
 
 @router.get("/test/db")
-async def test_database(db: Session = Depends(get_db)):
+def test_database(db: Session = Depends(get_db)):
     """Test database connection and return sample data"""
     try:
         result = db.execute(text("SELECT COUNT(*) FROM argo_profiles"))
@@ -115,53 +366,93 @@ async def test_database(db: Session = Depends(get_db)):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+# --- Temperature-salinity chart ---
+# Both endpoints read summaries maintained at ingest (data/scripts/ts_summary.py)
+# rather than scanning argo_profiles, so they cover the whole dataset.
+MAX_TS_POINTS = 20000
+
+
+def _columns(points, names):
+    return {name: [point[name] for point in points] for name in names}
+
+
 @router.get("/charts/temperature-salinity")
-async def get_temperature_salinity_data(db: Session = Depends(get_db)):
-    """Get temperature vs salinity data for scatter plot"""
-    try:
-        result = db.execute(text("""
-            SELECT 
-                CAST(temperature AS FLOAT) as temperature,
-                CAST(salinity AS FLOAT) as salinity,
-                CAST(pressure AS FLOAT) as pressure,
-                platform_id
-            FROM argo_profiles 
-            WHERE temperature IS NOT NULL 
-            AND salinity IS NOT NULL 
-            AND pressure IS NOT NULL
-            AND CAST(pressure AS FLOAT) < 100
-            LIMIT 500
-        """))
-        data = [dict(row._mapping) for row in result]
-        return data
-    except Exception as e:
-        return {"error": str(e)}
+def get_temperature_salinity_data(
+    limit: int = Query(500, ge=1, le=MAX_TS_POINTS),
+    max_pressure: float = Query(100.0, gt=0),
+    format: str = Query("json", pattern="^(json|columns|arrow)$"),
+    db: Session = Depends(get_db),
+):
+    """
+    Get temperature vs salinity data for scatter plot.
+
+    Points come from a sample stratified by float, depth band and month, so
+    even a small `limit` spans every float and season. `format=columns` (JSON
+    arrays per field) and `format=arrow` return the same points in columnar form.
+    """
+    if format == "arrow" and not streaming.arrow_available():
+        raise HTTPException(status_code=406, detail="Arrow output needs pyarrow installed on the server.")
+
+    points = data_service.get_ts_sample(db, limit=limit, max_pressure=max_pressure)
+    if points is None and analytics_store.is_available():
+        try:
+            points = analytics_store.temperature_salinity_points(max_pressure=max_pressure, limit=limit)
+        except Exception as e:
+            analytics_store.log_fallback("temperature-salinity chart", e)
+    if points is None:
+        try:
+            result = db.execute(text("""
+                SELECT 
+                    CAST(l.temperature AS FLOAT) as temperature,
+                    CAST(l.salinity AS FLOAT) as salinity,
+                    CAST(l.pressure AS FLOAT) as pressure,
+                    p.float_id as platform_id
+                FROM argo_profiles p
+                CROSS JOIN LATERAL unnest(p.pressure_dbar, p.temperature_celsius, p.salinity_psu)
+                    AS l(pressure, temperature, salinity)
+                WHERE l.temperature IS NOT NULL 
+                AND l.salinity IS NOT NULL 
+                AND l.pressure < :max_pressure
+                LIMIT :limit
+            """), {'limit': limit, 'max_pressure': max_pressure})
+            points = [dict(row._mapping) for row in result]
+        except Exception as e:
+            return {"error": str(e)}
+
+    if format == "json":
+        return points
+    columns = _columns(points, ('temperature', 'salinity', 'pressure', 'platform_id'))
+    if format == "arrow":
+        return Response(content=streaming.arrow_ipc_bytes(columns), media_type=streaming.ARROW_STREAM_MEDIA_TYPE)
+    return columns
+
+
+@router.get("/charts/temperature-salinity/density")
+def get_temperature_salinity_density(
+    temperature_bin: float = Query(0.5, ge=0.1, le=10),
+    salinity_bin: float = Query(0.05, ge=0.01, le=1),
+    max_pressure: Optional[float] = Query(None, gt=0),
+    format: str = Query("json", pattern="^(json|arrow)$"),
+    db: Session = Depends(get_db),
+):
+    """
+    2D temperature-salinity density over every stored level, as columnar
+    (temperature, salinity, count) cells. Bin sizes are rounded to multiples
+    of 0.1 °C and 0.01 PSU; `max_pressure` keeps the depth bands above it.
+    """
+    if format == "arrow" and not streaming.arrow_available():
+        raise HTTPException(status_code=406, detail="Arrow output needs pyarrow installed on the server.")
+    density = data_service.get_ts_density(db, temperature_bin, salinity_bin, max_pressure)
+    if density is None:
+        raise HTTPException(status_code=503, detail="The temperature-salinity summary has not been built yet.")
+    if format == "arrow":
+        columns = {name: density[name] for name in ('temperature', 'salinity', 'count')}
+        return Response(content=streaming.arrow_ipc_bytes(columns), media_type=streaming.ARROW_STREAM_MEDIA_TYPE,
+                        headers={'X-Temperature-Bin': str(density['temperature_bin']),
+                                 'X-Salinity-Bin': str(density['salinity_bin'])})
+    return density
 
 @router.get("/home/stats")
-async def get_home_stats(db: Session = Depends(get_db)):
+def get_home_stats(request: Request, db: Session = Depends(get_db)):
     """Get real-time stats for home page"""
-    try:
-        floats_result = db.execute(text("SELECT COUNT(DISTINCT platform_id) FROM argo_profiles"))
-        active_floats = floats_result.scalar() or 0
-        
-        daily_result = db.execute(text("SELECT COUNT(*) FROM argo_profiles WHERE timestamp >= NOW() - INTERVAL '1 day'"))
-        daily_profiles = daily_result.scalar() or 0
-        
-        total_result = db.execute(text("SELECT COUNT(*) FROM argo_profiles"))
-        total_points = total_result.scalar() or 0
-        
-        def format_number(num):
-            if num >= 1000000:
-                return f"{num/1000000:.1f}M"
-            elif num >= 1000:
-                return f"{num/1000:.0f}K" if num >= 10000 else f"{num/1000:.1f}K"
-            return str(num)
-        
-        return [
-            {"label": "Active Floats", "value": format_number(active_floats), "change": "+12% this month"},
-            {"label": "Daily Profiles", "value": format_number(daily_profiles), "change": "+8% this month"},
-            {"label": "Ocean Coverage", "value": "87%", "change": "+3% this month"},
-            {"label": "Data Points", "value": format_number(total_points), "change": "+25% this month"}
-        ]
-    except Exception as e:
-        return {"error": str(e)}
+    return cached_response(request, 'home_stats', lambda: data_service.get_home_stats(db))
\ No newline at end of file
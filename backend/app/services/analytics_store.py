@@ -0,0 +1,131 @@
+# backend/app/services/analytics_store.py
+
+import os
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as pads
+except ImportError:  # pyarrow is optional; callers fall back to Postgres
+    pa = pc = pads = None
+
+# --- Configuration ---
+# Written by data/scripts/ingest_argo.py: one row per level, hive-partitioned
+# as platform_id=<id>/month=<YYYY-MM>/ with one file per cycle, so every
+# profile is stored once, however many source files carried it.
+PARQUET_DIR = os.getenv("ARGO_PARQUET_DIR", "data/processed/argo_levels")
+# Written by the ingest's export of the rows already in Postgres. Until it
+# exists the store may hold only the files ingested since, so callers use
+# Postgres instead.
+PARQUET_COMPLETE_MARKER = "_EXPORTED"
+# How long a discovered file listing is reused before new ingests are picked up.
+DATASET_REFRESH_SECONDS = float(os.getenv("ARGO_PARQUET_REFRESH_SECONDS", "60"))
+SCAN_BATCH_ROWS = 256_000
+
+_dataset = None
+_dataset_loaded_at = 0.0
+
+
+def is_available() -> bool:
+    """True when pyarrow is installed and the dataset holds every profile in the database."""
+    return pads is not None and os.path.exists(os.path.join(PARQUET_DIR, PARQUET_COMPLETE_MARKER))
+
+
+def _get_dataset():
+    """Discovers the partitioned dataset, reusing the listing for a short while."""
+    global _dataset, _dataset_loaded_at
+    now = time.monotonic()
+    if _dataset is None or now - _dataset_loaded_at > DATASET_REFRESH_SECONDS:
+        partitioning = pads.partitioning(
+            pa.schema([('platform_id', pa.int64()), ('month', pa.string())]), flavor='hive'
+        )
+        _dataset = pads.dataset(PARQUET_DIR, format='parquet', partitioning=partitioning)
+        _dataset_loaded_at = now
+    return _dataset
+
+
+def _batches(columns, filter=None):
+    """Streams only the requested columns, letting pyarrow skip pruned partitions."""
+    scanner = _get_dataset().scanner(columns=columns, filter=filter, batch_size=SCAN_BATCH_ROWS)
+    return scanner.to_batches()
+
+
+def _months_since(start: datetime) -> list:
+    """The month partition values covering `start` up to now."""
+    months = []
+    cursor = start.replace(day=1)
+    now = datetime.now(timezone.utc)
+    while cursor <= now:
+        months.append(cursor.strftime('%Y-%m'))
+        cursor = (cursor + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def average(column: str, max_pressure: float = None) -> dict:
+    """Mean and count of one measurement column, optionally above a pressure cut-off."""
+    columns = [column] if max_pressure is None else [column, 'pressure']
+    filter = None if max_pressure is None else pc.field('pressure') < max_pressure
+    total, count = 0.0, 0
+    for batch in _batches(columns, filter):
+        values = batch.column(column)
+        count += len(values) - values.null_count
+        total += pc.sum(values).as_py() or 0.0
+    return {'mean': total / count if count else None, 'count': count}
+
+
+def surface_averages(max_pressure: float = 10.0) -> dict:
+    """Average temperature, salinity and pressure for levels shallower than `max_pressure`."""
+    columns = ['pressure', 'temperature', 'salinity']
+    sums = dict.fromkeys(columns, 0.0)
+    count = 0
+    for batch in _batches(columns, pc.field('pressure') < max_pressure):
+        count += batch.num_rows
+        for column in columns:
+            sums[column] += pc.sum(batch.column(column)).as_py() or 0.0
+    if not count:
+        return {'avg_temp': None, 'avg_salinity': None, 'avg_pressure': None, 'total_measurements': 0}
+    return {
+        'avg_temp': sums['temperature'] / count,
+        'avg_salinity': sums['salinity'] / count,
+        'avg_pressure': sums['pressure'] / count,
+        'total_measurements': count,
+    }
+
+
+def temperature_salinity_points(max_pressure: float = 100.0, limit: int = 500) -> list:
+    """Up to `limit` T/S points shallower than `max_pressure`, reading four columns only."""
+    columns = ['temperature', 'salinity', 'pressure', 'platform_id']
+    table = _get_dataset().head(limit, columns=columns, filter=pc.field('pressure') < max_pressure)
+    return table.to_pylist()
+
+
+def max_pressure_by_float(limit: int = 5) -> list:
+    """The `limit` floats with the deepest measurement, aggregated a batch at a time."""
+    deepest = {}
+    for batch in _batches(['platform_id', 'pressure']):
+        grouped = pa.Table.from_batches([batch]).group_by('platform_id').aggregate([('pressure', 'max')])
+        for float_id, depth in zip(grouped.column('platform_id').to_pylist(),
+                                   grouped.column('pressure_max').to_pylist()):
+            if depth is not None and depth > deepest.get(float_id, float('-inf')):
+                deepest[float_id] = depth
+    top = sorted(deepest.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [{'float_id': float_id, 'max_depth': float(depth)} for float_id, depth in top]
+
+
+def recent_profile_count(days: int = 7) -> int:
+    """Profiles taken in the last `days` days; only the matching month partitions are read."""
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    filter = pc.field('month').isin(_months_since(since)) & (pc.field('profile_time') >= pa.scalar(since))
+    profiles = set()
+    for batch in _batches(['platform_id', 'cycle_number'], filter):
+        grouped = pa.Table.from_batches([batch]).group_by(['platform_id', 'cycle_number']).aggregate([])
+        profiles.update(zip(grouped.column('platform_id').to_pylist(),
+                            grouped.column('cycle_number').to_pylist()))
+    return len(profiles)
+
+
+def log_fallback(operation: str, error: Exception):
+    logging.warning(f"Parquet store unavailable for {operation}, falling back to Postgres: {error}")
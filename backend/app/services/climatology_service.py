@@ -0,0 +1,178 @@
+# backend/app/services/climatology_service.py
+
+import json
+import os
+import time
+import threading
+import numpy as np
+
+# --- Configuration ---
+# Written by data/scripts/climatology.py: CURRENT names the published version
+# directory, which holds meta.json and one level x lat x lon .npy slab per
+# statistic, variable and month. Arrays are memory-mapped, so a slice only
+# reads the pages it touches.
+CLIMATOLOGY_DIR = os.getenv("ARGO_CLIMATOLOGY_DIR", "data/processed/climatology")
+# How often CURRENT is re-read to pick up a newly published version.
+CLIMATOLOGY_REFRESH_SECONDS = float(os.getenv("ARGO_CLIMATOLOGY_REFRESH_SECONDS", "5"))
+STATS = ('count', 'mean', 'm2')
+MONTHS = range(1, 13)
+
+_lock = threading.Lock()
+_cube = None
+_checked_at = float('-inf')
+
+
+def _current_version():
+    try:
+        with open(os.path.join(CLIMATOLOGY_DIR, 'CURRENT')) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _get_cube():
+    """The published cube as {'version', 'meta', 'arrays'}, reopened when CURRENT changes."""
+    global _cube, _checked_at
+    now = time.monotonic()
+    with _lock:
+        if _cube is not None and now - _checked_at < CLIMATOLOGY_REFRESH_SECONDS:
+            return _cube
+        _checked_at = now
+        version = _current_version()
+        if version is None:
+            _cube = None
+        elif _cube is None or _cube['version'] != version:
+            directory = os.path.join(CLIMATOLOGY_DIR, version)
+            with open(os.path.join(directory, 'meta.json')) as f:
+                meta = json.load(f)
+            # {variable: {stat: [slab of January, ..., slab of December]}}
+            arrays = {
+                variable: {stat: [np.load(os.path.join(directory, f"{stat}_{variable}_m{month:02d}.npy"),
+                                          mmap_mode='r') for month in MONTHS]
+                           for stat in STATS}
+                for variable in meta['variables']
+            }
+            _cube = {'version': version, 'meta': meta, 'arrays': arrays}
+        return _cube
+
+
+def is_available() -> bool:
+    """True once data/scripts/build_climatology.py has published a cube."""
+    return _get_cube() is not None
+
+
+def get_meta() -> dict:
+    cube = _get_cube()
+    meta = cube['meta']
+    _, _, n_lat, n_lon = meta['shape']
+    return {
+        'version': cube['version'],
+        'grid_degrees': meta['grid_degrees'],
+        'levels_dbar': meta['levels_dbar'],
+        'months': list(range(1, 13)),
+        'variables': meta['variables'],
+        'latitudes': _centres(-90, meta['grid_degrees'], n_lat),
+        'longitudes': _centres(-180, meta['grid_degrees'], n_lon),
+        'profiles': meta['profiles'],
+    }
+
+
+def _centres(start, step, n):
+    return [round(start + (i + 0.5) * step, 6) for i in range(n)]
+
+
+def _level_index(meta, pressure):
+    try:
+        return meta['levels_dbar'].index(float(pressure))
+    except ValueError:
+        raise ValueError(f"pressure must be one of the standard levels: "
+                         f"{', '.join(f'{p:g}' for p in meta['levels_dbar'])}.")
+
+
+def _index(origin, step, n, value):
+    return min(max(int((value - origin) // step), 0), n - 1)
+
+
+def _statistic(arrays, stat, month, selection):
+    """
+    `stat` over the cells picked by `selection` (an index tuple into a
+    month's level x lat x lon slab). Without a month the twelve months are pooled exactly:
+    counts add, means are count-weighted and M2 gains the spread of the
+    monthly means about the pooled mean.
+    """
+    def read(name):
+        if month is None:
+            return np.stack([slab[selection] for slab in arrays[name]])
+        return np.asarray(arrays[name][month - 1][selection])
+
+    count, mean, m2 = read('count').astype('float64'), read('mean'), read('m2')
+    if month is None:
+        total = count.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pooled = (count * mean).sum(axis=0) / total
+            m2 = (m2 + count * (mean - pooled) ** 2).sum(axis=0)
+        count, mean = total, pooled
+
+    if stat == 'count':
+        return count.astype('int64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if stat == 'mean':
+            return np.where(count > 0, mean, np.nan)
+        return np.where(count > 1, np.sqrt(m2 / (count - 1)), np.nan)  # 'std'
+
+
+def _to_json(values):
+    """Nested lists with None for empty cells, rounded to keep the payload small."""
+    rounded = np.round(values, 4).astype(object)
+    rounded[~np.isfinite(values)] = None
+    return rounded.tolist()
+
+
+def map_slice(variable, stat, pressure, month=None, bbox=None):
+    """
+    A lat x lon grid of `stat` at one standard level and month (all months
+    pooled when None), optionally cut to bbox = (min_lon, min_lat, max_lon, max_lat).
+    """
+    cube = _get_cube()
+    meta, arrays = cube['meta'], cube['arrays'][variable]
+    _, _, n_lat, n_lon = meta['shape']
+    step = meta['grid_degrees']
+    level = _level_index(meta, pressure)
+
+    lat_slice, lon_slice = slice(0, n_lat), slice(0, n_lon)
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        lat_slice = slice(_index(-90, step, n_lat, min_lat), _index(-90, step, n_lat, max_lat) + 1)
+        lon_slice = slice(_index(-180, step, n_lon, min_lon), _index(-180, step, n_lon, max_lon) + 1)
+
+    values = _statistic(arrays, stat, month, (level, lat_slice, lon_slice))
+    latitudes = _centres(-90, step, n_lat)[lat_slice]
+    longitudes = _centres(-180, step, n_lon)[lon_slice]
+    return {
+        'variable': variable, 'stat': stat, 'month': month, 'pressure_dbar': float(pressure),
+        'latitudes': latitudes, 'longitudes': longitudes, 'values': _to_json(values),
+    }
+
+
+def depth_section(variable, stat, month=None, lat=None, lon=None):
+    """
+    A depth section of `stat`: along the latitude row through `lat` (levels x
+    longitudes), or along the longitude column through `lon` (levels x latitudes).
+    """
+    cube = _get_cube()
+    meta, arrays = cube['meta'], cube['arrays'][variable]
+    _, _, n_lat, n_lon = meta['shape']
+    step = meta['grid_degrees']
+
+    if lat is not None:
+        selection = (slice(None), _index(-90, step, n_lat, lat), slice(None))
+        axis = {'along': 'longitude', 'latitude': lat, 'longitudes': _centres(-180, step, n_lon)}
+    else:
+        selection = (slice(None), slice(None), _index(-180, step, n_lon, lon))
+        axis = {'along': 'latitude', 'longitude': lon, 'latitudes': _centres(-90, step, n_lat)}
+
+    values = _statistic(arrays, stat, month, selection)
+    return {
+        'variable': variable, 'stat': stat, 'month': month,
+        'levels_dbar': meta['levels_dbar'], **axis, 'values': _to_json(values),
+    }
@@ -1,8 +1,12 @@
 from sqlalchemy.orm import Session
+from types import SimpleNamespace
 from ..models import argo
+from . import analytics_store
 from sqlalchemy import text, func, desc
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta, timezone
 import numpy as np
+import math
+import base64
 
 
 def get_profiles_by_float(db: Session, float_id: int):
@@ -16,20 +20,104 @@ def get_profiles_by_float(db: Session, float_id: int):
         return []
 
 
+# --- Keyset pagination over a float's profiles ---
+# Pages are ordered by (profile_time, cycle_number) and a cursor is the key of
+# the last row served, so every page is an index range scan on
+# idx_argo_profiles_float_time no matter how deep into the float it starts.
+PROFILE_STREAM_BATCH_ROWS = 100
+
+
+def encode_profile_cursor(profile_time: datetime, cycle_number: int) -> str:
+    raw = f"{profile_time.isoformat()}|{cycle_number}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_profile_cursor(cursor: str):
+    """(profile_time, cycle_number) from a cursor; ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        profile_time, cycle_number = raw.rsplit('|', 1)
+        return datetime.fromisoformat(profile_time), int(cycle_number)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _float_page_filter(float_id: int, after=None):
+    where = "float_id = :float_id"
+    params = {'float_id': float_id}
+    if after is not None:
+        where += " AND (profile_time, cycle_number) > (:after_time, :after_cycle)"
+        params.update(after_time=after[0], after_cycle=after[1])
+    return where, params
+
+
+def get_profile_page_bounds(db: Session, float_id: int, after=None, limit: int = None):
+    """
+    (has_rows, next_cursor) for the page of `limit` profiles after `after`.
+    Reads two keys from the index, so headers can be sent before the rows.
+    A database error reads as an empty page, like get_profiles_by_float.
+    """
+    where, params = _float_page_filter(float_id, after)
+    params['offset'] = (limit or 1) - 1
+    try:
+        keys = db.execute(text(f"""
+            SELECT profile_time, cycle_number
+            FROM argo_profiles
+            WHERE {where}
+            ORDER BY profile_time, cycle_number
+            LIMIT 2 OFFSET :offset
+        """), params).fetchall()
+        if not keys:
+            # The page is shorter than `limit` (or empty); check it has any rows.
+            has_rows = db.execute(text(f"SELECT EXISTS (SELECT 1 FROM argo_profiles WHERE {where})"),
+                                  params).scalar()
+            return bool(has_rows), None
+    except Exception as e:
+        print(f"Database error: {e}")
+        db.rollback()
+        return False, None
+    # A key after the page's last row means there is another page.
+    next_cursor = encode_profile_cursor(*keys[0]) if limit is not None and len(keys) == 2 else None
+    return True, next_cursor
+
+
+def iter_float_profiles(db: Session, float_id: int, after=None, limit: int = None,
+                        batch_rows: int = PROFILE_STREAM_BATCH_ROWS):
+    """
+    Yields a float's profiles as plain dicts in (profile_time, cycle_number)
+    order through a server-side cursor, `batch_rows` rows at a time, so memory
+    stays flat however many cycles the float has.
+    """
+    where, params = _float_page_filter(float_id, after)
+    limit_clause = ""
+    if limit is not None:
+        limit_clause = "LIMIT :limit"
+        params['limit'] = limit
+    result = db.execute(
+        text(f"""
+            SELECT cycle_number, profile_time, latitude, longitude,
+                   pressure_dbar, temperature_celsius, salinity_psu
+            FROM argo_profiles
+            WHERE {where}
+            ORDER BY profile_time, cycle_number
+            {limit_clause}
+        """).execution_options(stream_results=True, yield_per=batch_rows),
+        params,
+    )
+    for row in result:
+        yield dict(row._mapping)
+
+
 def get_all_float_locations(db: Session):
     """
     Retrieves the most recent location for every unique float.
     """
     try:
-        # Use raw SQL to get the latest location for each platform
+        # One row per float, kept current by the ingest
         result = db.execute(text("""
-            SELECT DISTINCT ON (platform_id) 
-                platform_id as float_id,
-                latitude,
-                longitude,
-                timestamp as profile_time
-            FROM argo_profiles 
-            ORDER BY platform_id, timestamp DESC
+            SELECT float_id, latitude, longitude, profile_time
+            FROM argo_float_latest
+            ORDER BY float_id
         """))
         return [{
             'float_id': row.float_id,
@@ -42,18 +130,178 @@ def get_all_float_locations(db: Session):
         return []
 
 
+# --- Spatial / temporal search ---
+KM_PER_DEGREE = 111.32
+
+
+def _envelope_condition(min_lon, min_lat, max_lon, max_lat, params, column='geom'):
+    """
+    `column && envelope`, which the GiST index on geom answers. A box with
+    min_lon > max_lon crosses the antimeridian and is split in two.
+    """
+    params.update(min_lon=min_lon, min_lat=min_lat, max_lon=max_lon, max_lat=max_lat)
+    if min_lon <= max_lon:
+        return f"{column} && ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, 4326)"
+    return (f"({column} && ST_MakeEnvelope(:min_lon, :min_lat, 180, :max_lat, 4326) "
+            f"OR {column} && ST_MakeEnvelope(-180, :min_lat, :max_lon, :max_lat, 4326))")
+
+
+def _radius_conditions(lat, lon, radius_km, params, column='geom'):
+    """
+    An index-friendly bounding box around the circle, then the exact
+    great-circle distance check on the few rows inside it.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(lat))
+    lon_delta = 180.0 if cos_lat < 1e-6 else min(180.0, radius_km / (KM_PER_DEGREE * cos_lat))
+    min_lat, max_lat = max(-90.0, lat - lat_delta), min(90.0, lat + lat_delta)
+    if lon_delta >= 180.0 or max_lat >= 90.0 or min_lat <= -90.0:
+        box = _envelope_condition(-180.0, min_lat, 180.0, max_lat, params, column)
+    else:
+        min_lon = (lon - lon_delta + 180.0) % 360.0 - 180.0
+        max_lon = (lon + lon_delta + 180.0) % 360.0 - 180.0
+        box = _envelope_condition(min_lon, min_lat, max_lon, max_lat, params, column)
+    params.update(center_lat=lat, center_lon=lon, radius_m=radius_km * 1000.0)
+    return [box, f"ST_DWithin({column}::geography, "
+                 f"ST_SetSRID(ST_MakePoint(:center_lon, :center_lat), 4326)::geography, :radius_m)"]
+
+
+def _search_conditions(bbox=None, center=None, radius_km=None, start=None, end=None, column='geom'):
+    conditions, params = [], {}
+    if bbox is not None:
+        conditions.append(_envelope_condition(*bbox, params, column))
+    if center is not None:
+        conditions.extend(_radius_conditions(center[0], center[1], radius_km, params, column))
+    if start is not None:
+        conditions.append("profile_time >= :start")
+        params['start'] = start
+    if end is not None:
+        conditions.append("profile_time < :end")
+        params['end'] = end
+    return conditions, params
+
+
+def search_profiles(db: Session, bbox=None, center=None, radius_km=None, start=None, end=None,
+                    limit: int = 1000, include_measurements: bool = False):
+    """
+    Profiles inside a bounding box (min_lon, min_lat, max_lon, max_lat) or
+    within `radius_km` of center (lat, lon), optionally limited to
+    [start, end). Newest first.
+    """
+    try:
+        conditions, params = _search_conditions(bbox, center, radius_km, start, end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        measurements = ", pressure_dbar, temperature_celsius, salinity_psu" if include_measurements else ""
+        params['limit'] = limit
+        result = db.execute(text(f"""
+            SELECT float_id, cycle_number, profile_time, latitude, longitude{measurements}
+            FROM argo_profiles
+            {where}
+            ORDER BY profile_time DESC
+            LIMIT :limit
+        """), params)
+        return [dict(row._mapping) for row in result]
+    except Exception as e:
+        print(f"Database error: {e}")
+        return []
+
+
+# --- Standard pressure levels ---
+# Profiles are interpolated onto the levels in argo_standard_levels at ingest
+# (data/scripts/standard_levels.py) and stored in temperature_std/salinity_std,
+# so a depth slice reads one array slot per profile. The index is looked up by
+# pressure once per statement and joined in as `lvl.i`.
+_LEVEL_INDEX_SQL = "(SELECT level_index FROM argo_standard_levels WHERE pressure_dbar = :pressure)"
+
+
+def get_standard_levels(db: Session):
+    """The standard pressure levels (dbar), shallowest first; [] before the first ingest."""
+    try:
+        result = db.execute(text("SELECT pressure_dbar FROM argo_standard_levels ORDER BY level_index"))
+        return [float(row.pressure_dbar) for row in result]
+    except Exception as e:
+        print(f"Database error: {e}")
+        db.rollback()
+        return []
+
+
+def get_depth_slice(db: Session, pressure: float, bbox=None, center=None, radius_km=None,
+                    start=None, end=None, limit: int = 1000):
+    """
+    Temperature and salinity of each matching profile at standard level
+    `pressure`, newest first. Area and time filters are those of search_profiles.
+    """
+    try:
+        conditions, params = _search_conditions(bbox, center, radius_km, start, end)
+        conditions.append("(temperature_std[lvl.i] IS NOT NULL OR salinity_std[lvl.i] IS NOT NULL)")
+        params.update(pressure=pressure, limit=limit)
+        result = db.execute(text(f"""
+            SELECT
+                float_id, cycle_number, profile_time, latitude, longitude,
+                CAST(temperature_std[lvl.i] AS FLOAT) AS temperature,
+                CAST(salinity_std[lvl.i] AS FLOAT) AS salinity
+            FROM argo_profiles, (SELECT {_LEVEL_INDEX_SQL} AS i) lvl
+            WHERE {' AND '.join(conditions)}
+            ORDER BY profile_time DESC
+            LIMIT :limit
+        """), params)
+        return [dict(row._mapping) for row in result]
+    except Exception as e:
+        print(f"Database error: {e}")
+        return []
+
+
+def cluster_profiles(db: Session, zoom: int, bbox=None, start=None, end=None):
+    """
+    Grid clusters for the map at coarse zoom: positions are snapped to cells
+    of 180 / 2**zoom degrees and each cell reports its mean position and
+    counts. Without a time window the floats' latest positions are clustered
+    (from argo_float_latest); with one, the profiles taken in that window.
+    """
+    try:
+        conditions, params = _search_conditions(bbox, None, None, start, end)
+        if start is None and end is None:
+            source, count = "argo_float_latest", "COUNT(*) AS float_count, SUM(profile_count) AS profile_count"
+        else:
+            source, count = "argo_profiles", "COUNT(DISTINCT float_id) AS float_count, COUNT(*) AS profile_count"
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params['cell'] = 180.0 / (2 ** zoom)
+        result = db.execute(text(f"""
+            SELECT
+                AVG(latitude) AS latitude,
+                AVG(longitude) AS longitude,
+                {count},
+                MAX(profile_time) AS last_profile_time
+            FROM {source}
+            {where}
+            GROUP BY ST_SnapToGrid(geom, :cell)
+        """), params)
+        return [{
+            'latitude': float(row.latitude),
+            'longitude': float(row.longitude),
+            'float_count': int(row.float_count),
+            'profile_count': int(row.profile_count),
+            'last_profile_time': row.last_profile_time,
+        } for row in result]
+    except Exception as e:
+        print(f"Database error: {e}")
+        return []
+
+
 def get_float_summary(db: Session):
     """Get summary of all floats with status and profile counts"""
     try:
+        # Latest position and profile count per float, maintained at ingest.
+        # Status depends on the current time, so it is worked out below.
         result = db.execute(text("""
-            SELECT 
-                platform_id,
-                COUNT(*) as profile_count,
-                MAX(timestamp) as last_update,
-                MAX(latitude) as latitude,
-                MAX(longitude) as longitude
-            FROM argo_profiles 
-            GROUP BY platform_id
+            SELECT
+                float_id as platform_id,
+                profile_count,
+                profile_time as last_update,
+                latitude,
+                longitude
+            FROM argo_float_latest
+            ORDER BY float_id
         """))
         
         floats = []
@@ -73,26 +321,74 @@ def get_float_summary(db: Session):
         return floats
     except Exception as e:
         print(f"Database error: {e}")
-        return []
+        db.rollback()
+        return None
+
+
+# Standard level the dashboard reports as "surface".
+SURFACE_PRESSURE_DBAR = 10.0
+
+
+def _standard_level_averages(db: Session, pressure: float):
+    """
+    Averages at one standard level; None if the interpolated arrays are not
+    there yet. Every value sits at `pressure` itself, so there is no measured
+    pressure to average and avg_pressure is NULL; total_measurements counts
+    the profiles with a temperature at that level.
+    """
+    try:
+        row = db.execute(text(f"""
+            SELECT
+                AVG(CAST(temperature_std[lvl.i] AS FLOAT)) as avg_temp,
+                AVG(CAST(salinity_std[lvl.i] AS FLOAT)) as avg_salinity,
+                CAST(NULL AS FLOAT) as avg_pressure,
+                COUNT(temperature_std[lvl.i]) as total_measurements
+            FROM argo_profiles, (SELECT {_LEVEL_INDEX_SQL} AS i) lvl
+        """), {'pressure': pressure}).fetchone()
+    except Exception as e:
+        print(f"Database error: {e}")
+        db.rollback()
+        return None
+    return row if row and row.total_measurements > 0 else None
+
+
+def _surface_averages(db: Session):
+    """
+    Surface averages: the 10 dbar standard level when profiles have been
+    interpolated, else levels shallower than 10 dbar, from the Parquet store
+    when it has been built. Only the latter two average the measured pressure,
+    and their total_measurements counts levels rather than profiles.
+    """
+    row = _standard_level_averages(db, SURFACE_PRESSURE_DBAR)
+    if row is not None:
+        return row
+
+    if analytics_store.is_available():
+        try:
+            return SimpleNamespace(**analytics_store.surface_averages(max_pressure=10.0))
+        except Exception as e:
+            analytics_store.log_fallback("surface averages", e)
+
+    result = db.execute(text("""
+        SELECT 
+            AVG(CAST(l.temperature AS FLOAT)) as avg_temp,
+            AVG(CAST(l.salinity AS FLOAT)) as avg_salinity,
+            AVG(CAST(l.pressure AS FLOAT)) as avg_pressure,
+            COUNT(*) as total_measurements
+        FROM argo_profiles p
+        CROSS JOIN LATERAL unnest(p.pressure_dbar, p.temperature_celsius, p.salinity_psu)
+            AS l(pressure, temperature, salinity)
+        WHERE l.temperature IS NOT NULL 
+        AND l.salinity IS NOT NULL 
+        AND l.pressure < 10
+    """))
+    return result.fetchone()
 
 
 def get_ocean_metrics(db: Session):
     """Calculate current ocean metrics from recent data"""
     try:
-        result = db.execute(text("""
-            SELECT 
-                AVG(CAST(temperature AS FLOAT)) as avg_temp,
-                AVG(CAST(salinity AS FLOAT)) as avg_salinity,
-                AVG(CAST(pressure AS FLOAT)) as avg_pressure,
-                COUNT(*) as total_measurements
-            FROM argo_profiles 
-            WHERE temperature IS NOT NULL 
-            AND salinity IS NOT NULL 
-            AND pressure IS NOT NULL
-            AND pressure < 10
-        """))
-        
-        row = result.fetchone()
+        row = _surface_averages(db)
         metrics = []
         
         if row and row.total_measurements > 0:
@@ -112,6 +408,7 @@ def get_ocean_metrics(db: Session):
                     'change': '±0.1'
                 })
             
+            # Only shown when measured; the standard level has none (see _standard_level_averages).
             if row.avg_pressure:
                 metrics.append({
                     'label': 'Pressure (dbar)',
@@ -123,37 +420,241 @@ def get_ocean_metrics(db: Session):
         return metrics
     except Exception as e:
         print(f"Database error: {e}")
-        return []
+        db.rollback()
+        return None
 
 
-def get_recent_alerts(db: Session):
-    """Generate alerts based on recent data patterns"""
+def get_ingest_totals(db: Session):
+    """
+    Floats, profiles and levels stored, plus profiles from the last 24 hours,
+    read from the totals the ingest maintains (data/scripts/argo_stats.py)
+    instead of counting argo_profiles. Profiles are counted per UTC day, so
+    yesterday's count is pro-rated by how much of it is still within 24 hours.
+    Returns None when the totals table is not there yet.
+    """
+    try:
+        totals = db.execute(text(
+            "SELECT float_count, profile_count, level_count, updated_at FROM argo_stats"
+        )).fetchone()
+        now = datetime.now(timezone.utc)
+        today = now.date()
+        days = {row.day: row.profile_count for row in db.execute(text(
+            "SELECT day, profile_count FROM argo_daily_stats WHERE day IN (:today, :yesterday)"
+        ), {'today': today, 'yesterday': today - timedelta(days=1)})}
+    except Exception as e:
+        print(f"Database error: {e}")
+        db.rollback()
+        return None
+    if totals is None:
+        return None
+
+    elapsed = (now - datetime.combine(today, time.min, tzinfo=timezone.utc)).total_seconds() / 86400
+    daily_profiles = days.get(today, 0) + round(days.get(today - timedelta(days=1), 0) * (1 - elapsed))
+    return SimpleNamespace(total_floats=totals.float_count, total_records=totals.profile_count,
+                           total_points=totals.level_count, daily_profiles=daily_profiles,
+                           updated_at=totals.updated_at)
+
+
+# Dashboard icon per alert kind; kinds are written by data/scripts/alerts.py.
+ALERT_TYPES = {
+    'temperature_anomaly': 'warning',
+    'salinity_anomaly': 'warning',
+    'position_jump': 'warning',
+    'stalled_float': 'info',
+}
+
+
+def _time_ago(moment):
+    if moment is None:
+        return ''
+    diff = datetime.now(timezone.utc) - moment
+    if diff.days > 0:
+        return f"{diff.days}d ago"
+    if diff.seconds >= 3600:
+        return f"{diff.seconds // 3600}h ago"
+    return f"{diff.seconds // 60}m ago" if diff.seconds >= 60 else "just now"
+
+
+def get_recent_alerts(db: Session, limit: int = 5, before: int = None, kind: str = None):
+    """
+    Anomaly alerts detected at ingest, newest first. Pages are keyed on the
+    alert id: pass the last id of a page as `before` for the next one.
+    When there is nothing to report, the first page summarises the data instead.
+    Returns None on a database error, so the response cache does not keep it.
+    """
+    try:
+        conditions, params = [], {'limit': limit}
+        if before is not None:
+            conditions.append("id < :before")
+            params['before'] = before
+        if kind is not None:
+            conditions.append("kind = :kind")
+            params['kind'] = kind
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        result = db.execute(text(f"""
+            SELECT id, kind, float_id, cycle_number, profile_time, latitude, longitude,
+                   pressure_dbar, value, message, detected_at
+            FROM argo_alerts
+            {where}
+            ORDER BY id DESC
+            LIMIT :limit
+        """), params)
+        alerts = [{
+            'id': row.id,
+            'type': ALERT_TYPES.get(row.kind, 'info'),
+            'kind': row.kind,
+            'message': row.message,
+            'time': _time_ago(row.detected_at),
+            'float_id': row.float_id,
+            'cycle_number': row.cycle_number,
+            'profile_time': row.profile_time,
+            'latitude': row.latitude,
+            'longitude': row.longitude,
+            'pressure_dbar': row.pressure_dbar,
+            'value': row.value,
+        } for row in result]
+    except Exception as e:
+        print(f"Database error: {e}")
+        db.rollback()
+        return None
+    if alerts or before is not None:
+        return alerts
+
     try:
-        alerts = []
-        
         # Get total records and floats
-        result = db.execute(text("""
-            SELECT 
-                COUNT(*) as total_records,
-                COUNT(DISTINCT platform_id) as total_floats
-            FROM argo_profiles
-        """))
-        row = result.fetchone()
+        row = get_ingest_totals(db)
+        if row is None:
+            result = db.execute(text("""
+                SELECT 
+                    COUNT(*) as total_records,
+                    COUNT(DISTINCT float_id) as total_floats
+                FROM argo_profiles
+            """))
+            row = result.fetchone()
         
         if row:
             alerts.append({
                 'type': 'success',
-                'message': f'{row.total_records:,} profiles from {row.total_floats} active floats',
-                'time': '1h ago'
-            })
-            
-            alerts.append({
-                'type': 'info',
-                'message': 'ARGO data ingestion completed successfully',
-                'time': '2h ago'
+                'message': f'{row.total_records:,} profiles from {row.total_floats} active floats, no anomalies detected',
+                'time': _time_ago(getattr(row, 'updated_at', None))
             })
         
         return alerts
     except Exception as e:
         print(f"Database error: {e}")
-        return []
\ No newline at end of file
+        db.rollback()
+        return None
+
+def get_home_stats(db: Session):
+    """Get real-time stats for home page"""
+    try:
+        totals = get_ingest_totals(db)
+        if totals is not None:
+            active_floats, daily_profiles, total_points = (
+                totals.total_floats, totals.daily_profiles, totals.total_points
+            )
+        else:
+            floats_result = db.execute(text("SELECT COUNT(DISTINCT float_id) FROM argo_profiles"))
+            active_floats = floats_result.scalar() or 0
+
+            daily_result = db.execute(text("SELECT COUNT(*) FROM argo_profiles WHERE profile_time >= NOW() - INTERVAL '1 day'"))
+            daily_profiles = daily_result.scalar() or 0
+
+            # Each profile row holds one measurement per depth level
+            total_result = db.execute(text("SELECT COALESCE(SUM(cardinality(pressure_dbar)), 0) FROM argo_profiles"))
+            total_points = total_result.scalar() or 0
+        
+        def format_number(num):
+            if num >= 1000000:
+                return f"{num/1000000:.1f}M"
+            elif num >= 1000:
+                return f"{num/1000:.0f}K" if num >= 10000 else f"{num/1000:.1f}K"
+            return str(num)
+        
+        return [
+            {"label": "Active Floats", "value": format_number(active_floats), "change": "+12% this month"},
+            {"label": "Daily Profiles", "value": format_number(daily_profiles), "change": "+8% this month"},
+            {"label": "Ocean Coverage", "value": "87%", "change": "+3% this month"},
+            {"label": "Data Points", "value": format_number(total_points), "change": "+25% this month"}
+        ]
+    except Exception as e:
+        print(f"Database error: {e}")
+        db.rollback()
+        return None
+
+# --- Temperature-salinity summaries ---
+# Base bin sizes of argo_ts_histogram; must match data/scripts/ts_summary.py.
+TS_TEMPERATURE_BIN = 0.1
+TS_SALINITY_BIN = 0.01
+
+
+def get_ts_sample(db: Session, limit: int = 500, max_pressure: float = None):
+    """
+    T-S points from the stratified sample maintained at ingest. Rank 1 of
+    every (float, depth band, month) stratum comes first, in hash order, so
+    any limit is spread evenly across floats, depths and time.
+    Returns None when the sample has not been built, so callers can fall back.
+    """
+    try:
+        where = "WHERE pressure < :max_pressure" if max_pressure is not None else ""
+        result = db.execute(text(f"""
+            SELECT
+                CAST(temperature AS FLOAT) as temperature,
+                CAST(salinity AS FLOAT) as salinity,
+                CAST(pressure AS FLOAT) as pressure,
+                float_id as platform_id
+            FROM argo_ts_sample
+            {where}
+            ORDER BY sample_rank, priority
+            LIMIT :limit
+        """), {'limit': limit, 'max_pressure': max_pressure})
+        points = [dict(row._mapping) for row in result]
+        if not points and not db.execute(text("SELECT EXISTS (SELECT 1 FROM argo_ts_sample)")).scalar():
+            return None
+        return points
+    except Exception as e:
+        print(f"Database error: {e}")
+        db.rollback()
+        return None
+
+
+def get_ts_density(db: Session, temperature_bin: float = 0.5, salinity_bin: float = 0.05,
+                   max_pressure: float = None):
+    """
+    2D T-S histogram from argo_ts_histogram, re-binned to the requested sizes
+    (rounded to whole multiples of the base bins). With max_pressure only the
+    depth bands lying entirely above it are counted. Columnar: one entry per
+    non-empty cell, keyed by the cell's lower temperature and salinity edges.
+    Returns None when the histogram has not been built.
+    """
+    t_step = max(1, round(temperature_bin / TS_TEMPERATURE_BIN))
+    s_step = max(1, round(salinity_bin / TS_SALINITY_BIN))
+    try:
+        where = "AND b.max_dbar <= :max_pressure" if max_pressure is not None else ""
+        result = db.execute(text(f"""
+            SELECT
+                floor(h.t_bin::float8 / :t_step)::int AS t_cell,
+                floor(h.s_bin::float8 / :s_step)::int AS s_cell,
+                SUM(h.count) AS count
+            FROM argo_ts_histogram h
+            JOIN argo_depth_bands b USING (depth_band)
+            WHERE h.count > 0 {where}
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+        """), {'t_step': t_step, 's_step': s_step, 'max_pressure': max_pressure}).fetchall()
+        if not result and not db.execute(text("SELECT EXISTS (SELECT 1 FROM argo_ts_histogram)")).scalar():
+            return None
+        t_size = t_step * TS_TEMPERATURE_BIN
+        s_size = s_step * TS_SALINITY_BIN
+        return {
+            'temperature_bin': round(t_size, 6),
+            'salinity_bin': round(s_size, 6),
+            'max_pressure': max_pressure,
+            'temperature': [round(row.t_cell * t_size, 6) for row in result],
+            'salinity': [round(row.s_cell * s_size, 6) for row in result],
+            'count': [int(row.count) for row in result],
+        }
+    except Exception as e:
+        print(f"Database error: {e}")
+        db.rollback()
+        return None
\ No newline at end of file
@@ -1,29 +1,62 @@
 import os
-import google.generativeai as genai
+import time
+import threading
 import json
 from sqlalchemy.orm import Session
 from . import query_service # Import our new service
+from ..utils import metrics
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Configure Google API
+# Google API. The client library takes about a second to import, so it is
+# imported and configured by warm_up(), which main.py runs in the background
+# at startup, or else by the first chat request.
 api_key = os.getenv('GOOGLE_API_KEY')
-if api_key:
-    genai.configure(api_key=api_key)
+GEMINI_MODEL = 'gemini-1.5-pro'
+
+_genai = None
+_genai_error = None
+_genai_lock = threading.Lock()
+
+def warm_up():
+    """Imports and configures the Gemini client once. Returns it, or None if unavailable."""
+    global _genai, _genai_error
+    if _genai is not None or _genai_error is not None or not api_key:
+        return _genai
+    with _genai_lock:
+        if _genai is None and _genai_error is None:
+            try:
+                import google.generativeai as genai
+                genai.configure(api_key=api_key)
+                _genai = genai
+            except Exception as e:
+                print(f"Google API error: {e}")
+                _genai_error = str(e)
+    return _genai
+
+def get_state() -> str:
+    """'ready', 'loading', 'failed', or 'disabled' when no API key is set (rule-based answers only)."""
+    if not api_key:
+        return 'disabled'
+    if _genai_error is not None:
+        return 'failed'
+    return 'ready' if _genai is not None else 'loading'
 
 def get_ai_response(db: Session, query: str) -> str:
     """
     Connects to the Google Gemini API using a RAG pattern with live DB data.
     Falls back to rule-based responses if API is unavailable.
     """
+    started, source = time.perf_counter(), "fallback"
     try:
         # --- STEP 1: RETRIEVE ---
         context_data = query_service.generate_and_run_sql(db, query)
         
         # Try Google API first
-        if api_key:
+        genai = warm_up()
+        if genai is not None:
             try:
                 context_str = json.dumps(context_data, default=str)
                 augmented_prompt = f"""
@@ -50,10 +83,17 @@ def get_ai_response(db: Session, query: str) -> str:
                 Please provide a comprehensive response based on the data and your oceanographic expertise.
                 """
                 
-                model = genai.GenerativeModel('gemini-1.5-pro')
+                model = genai.GenerativeModel(GEMINI_MODEL)
                 model.generation_config.temperature = 0.7
                 model.generation_config.max_output_tokens = 1000
-                response = model.generate_content(augmented_prompt)
+                llm_started, outcome = time.perf_counter(), "error"
+                try:
+                    response = model.generate_content(augmented_prompt)
+                    outcome = "ok"
+                finally:
+                    metrics.llm_request_duration.observe(time.perf_counter() - llm_started,
+                                                         model=GEMINI_MODEL, outcome=outcome)
+                source = "llm"
                 return response.text
             except Exception as e:
                 print(f"Google API error: {e}")
@@ -63,7 +103,10 @@ def get_ai_response(db: Session, query: str) -> str:
         
     except Exception as e:
         print(f"Error in get_ai_response: {e}")
+        source = "error"
         return "I'm having trouble processing your request right now."
+    finally:
+        metrics.ai_response_duration.observe(time.perf_counter() - started, source=source)
 
 def generate_fallback_response(query: str, data: list) -> str:
     """Generate detailed oceanographic responses based on query patterns and data"""
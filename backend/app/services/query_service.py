@@ -1,87 +1,140 @@
+import re
+import time
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from . import analytics_store
+from ..utils import metrics
 
-def execute_sql_query(db: Session, sql_query: str) -> list:
-    """Executes a raw SQL query and returns the results."""
+# "temperature at 500 m", "salinity at 1000 dbar": 1 dbar is close enough to 1 m.
+DEPTH_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(?:m|meters?|metres?|dbar|db)\b")
+
+def execute_sql_query(db: Session, sql_query: str, query_name: str = "adhoc") -> list:
+    """
+    Executes a raw SQL query and returns the results. Latency and row count
+    are recorded at /metrics under `query_name`, never the SQL text.
+    """
+    started, outcome = time.perf_counter(), "ok"
     try:
         result = db.execute(text(sql_query))
         # Convert rows to a list of dictionaries
         data = [dict(row._mapping) for row in result]
+        metrics.sql_query_rows.observe(len(data), query=query_name)
         return data
     except Exception as e:
         print(f"Error executing SQL query: {e}")
+        outcome = "error"
         return []
+    finally:
+        metrics.sql_query_duration.observe(time.perf_counter() - started, query=query_name, outcome=outcome)
 
 def generate_and_run_sql(db: Session, query: str) -> list:
     """
     A simple keyword-based NL-to-SQL engine for the MVP.
     It looks for keywords and constructs a SQL query to run.
+    Aggregates over every level row are answered from the Parquet store
+    instead when it is available, with the SQL kept as the fallback.
     """
     query = query.lower()
     sql_to_run = ""
+    store_query = None
+
+    depth = DEPTH_PATTERN.search(query)
+
+    # Temperature or salinity at a depth: read the nearest standard level,
+    # which every profile was interpolated onto at ingest.
+    if depth and ("temperature" in query or "salinity" in query):
+        query_name = "depth_level"
+        column, label = (("temperature_std", "average_temperature") if "temperature" in query
+                         else ("salinity_std", "average_salinity"))
+        sql_to_run = f"""
+            SELECT l.pressure_dbar AS pressure_dbar,
+                   AVG(CAST(p.{column}[l.level_index] AS FLOAT)) AS {label},
+                   COUNT(p.{column}[l.level_index]) AS profiles
+            FROM argo_profiles p,
+                 (SELECT level_index, pressure_dbar FROM argo_standard_levels
+                  ORDER BY abs(pressure_dbar - {float(depth.group(1))}) LIMIT 1) l
+            GROUP BY l.pressure_dbar;
+        """
 
     # Example 1: Looking for average temperature
-    if "average" in query and "temperature" in query:
+    elif "average" in query and "temperature" in query:
+        query_name = "average_temperature"
+        store_query = lambda: [{'average_temperature': analytics_store.average('temperature')['mean']}]
         sql_to_run = """
-            SELECT AVG(CAST(temperature AS FLOAT)) AS average_temperature
-            FROM argo_profiles
-            WHERE temperature IS NOT NULL;
+            SELECT AVG(CAST(t AS FLOAT)) AS average_temperature
+            FROM argo_profiles, unnest(temperature_celsius) AS t
+            WHERE t IS NOT NULL;
         """
 
     # Example 2: Looking for the latest profile
     elif "latest" in query or "most recent" in query:
+        query_name = "latest_profile"
         sql_to_run = """
-            SELECT platform_id as float_id, timestamp as profile_time, latitude, longitude
+            SELECT float_id, profile_time, latitude, longitude
             FROM argo_profiles
-            ORDER BY timestamp DESC
+            ORDER BY profile_time DESC
             LIMIT 1;
         """
     
     # Depth queries
     elif "depth" in query or "deep" in query:
+        query_name = "max_depth"
+        store_query = lambda: analytics_store.max_pressure_by_float(limit=5)
         sql_to_run = """
-            SELECT platform_id as float_id, MAX(CAST(pressure AS FLOAT)) as max_depth
-            FROM argo_profiles
-            WHERE pressure IS NOT NULL
-            GROUP BY platform_id
+            SELECT float_id, MAX(CAST(p AS FLOAT)) as max_depth
+            FROM argo_profiles, unnest(pressure_dbar) AS p
+            WHERE p IS NOT NULL
+            GROUP BY float_id
             ORDER BY max_depth DESC
             LIMIT 5;
         """
     
     # Salinity queries
     elif "salinity" in query:
+        query_name = "average_salinity"
+        store_query = lambda: [{'average_salinity': analytics_store.average('salinity')['mean']}]
         sql_to_run = """
-            SELECT AVG(CAST(salinity AS FLOAT)) as average_salinity
-            FROM argo_profiles
-            WHERE salinity IS NOT NULL;
+            SELECT AVG(CAST(s AS FLOAT)) as average_salinity
+            FROM argo_profiles, unnest(salinity_psu) AS s
+            WHERE s IS NOT NULL;
         """
     
     # Location queries
     elif "location" in query or "where" in query:
+        query_name = "locations"
         sql_to_run = """
-            SELECT platform_id as float_id, latitude, longitude, timestamp as profile_time
+            SELECT float_id, latitude, longitude, profile_time
             FROM argo_profiles
-            ORDER BY timestamp DESC
+            ORDER BY profile_time DESC
             LIMIT 10;
         """
     
     # Count queries
     elif "how many" in query or "count" in query:
+        query_name = "counts"
         sql_to_run = """
-            SELECT COUNT(DISTINCT platform_id) as total_floats,
+            SELECT COUNT(DISTINCT float_id) as total_floats,
                    COUNT(*) as total_profiles
             FROM argo_profiles;
         """
     
     # Time-based queries
     elif "today" in query or "recent" in query:
+        query_name = "recent_profiles"
+        store_query = lambda: [{'recent_profiles': analytics_store.recent_profile_count(days=7)}]
         sql_to_run = """
             SELECT COUNT(*) as recent_profiles
             FROM argo_profiles
-            WHERE timestamp >= NOW() - INTERVAL '7 days';
+            WHERE profile_time >= NOW() - INTERVAL '7 days';
         """
     
+    if store_query and analytics_store.is_available():
+        try:
+            return store_query()
+        except Exception as e:
+            analytics_store.log_fallback("chat aggregate", e)
+
     if sql_to_run:
-        return execute_sql_query(db, sql_to_run)
+        return execute_sql_query(db, sql_to_run, query_name)
     
     return [] # Return empty list if no keywords match
\ No newline at end of file
@@ -1,78 +1,145 @@
 # backend/app/services/vector_service.py
 
-import faiss
 import numpy as np
 import pandas as pd
-from sentence_transformers import SentenceTransformer
 import os
+import json
 import logging
+import threading
+from ..utils import metrics
 
 # --- Configuration ---
 # Set paths relative to the project root
 EMBEDDINGS_DIR = "data/embeddings/"
 FAISS_INDEX_PATH = os.path.join(EMBEDDINGS_DIR, "argo_float_index.faiss")
+# Only for indexes built before data/scripts/create_embeddings.py keyed them
+# on platform_id; an ID-mapped index returns platform_ids itself.
 ID_MAPPING_PATH = os.path.join(EMBEDDINGS_DIR, "index_to_id_mapping.csv")
+# Index type, build and default query parameters, written next to the index.
+INDEX_META_PATH = os.path.join(EMBEDDINGS_DIR, "argo_float_index.json")
 EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+# Fallback query parameters; keep in sync with data/scripts/vector_index.py.
+DEFAULT_EF_SEARCH = 64
+DEFAULT_NPROBE = 8
 
 class VectorService:
     def __init__(self):
         """
-        Initializes the VectorService by loading the model, FAISS index,
-        and ID mapping into memory.
+        Creates an unloaded VectorService. The model, FAISS index and ID
+        mapping are loaded by load(), which main.py runs in the background at
+        startup, so importing this module stays cheap and a missing index
+        cannot stop the API from starting.
         """
-        logging.info("Initializing VectorService...")
         self.model = None
         self.index = None
-        self.index_to_id = []
-        
-        try:
-            # 1. Load the Sentence Transformer model
-            self.model = SentenceTransformer(EMBEDDING_MODEL)
-            
-            # 2. Load the FAISS index
-            if not os.path.exists(FAISS_INDEX_PATH):
-                raise FileNotFoundError(f"FAISS index not found at: {FAISS_INDEX_PATH}")
-            self.index = faiss.read_index(FAISS_INDEX_PATH)
-
-            # 3. Load the ID mapping
-            if not os.path.exists(ID_MAPPING_PATH):
-                raise FileNotFoundError(f"ID mapping file not found at: {ID_MAPPING_PATH}")
-            id_mapping_df = pd.read_csv(ID_MAPPING_PATH)
-            self.index_to_id = id_mapping_df['platform_id'].tolist()
-            
-            logging.info("✅ VectorService initialized successfully.")
-            
-        except Exception as e:
-            logging.error(f"❌ Failed to initialize VectorService: {e}")
-            # In a real application, you might want to handle this more gracefully
-            # For now, we'll let it raise the exception to halt startup if files are missing.
-            raise
+        self.index_to_id = None
+        self.index_type = 'flat'
+        self.search_params = {}
+        self.error = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """'ready', 'loading' (or not started) or 'failed'."""
+        if self._loaded:
+            return 'failed' if self.error else 'ready'
+        return 'loading'
+
+    def load(self) -> bool:
+        """
+        Loads the model, index and ID mapping once; later calls return at
+        once. Concurrent callers wait for the first load. Returns True when
+        the service can search.
+        """
+        if self._loaded:
+            return self.error is None
+        with self._lock:
+            if self._loaded:
+                return self.error is None
+            logging.info("Initializing VectorService...")
+            try:
+                # Imported here: torch and FAISS take seconds to import.
+                import faiss
+                from sentence_transformers import SentenceTransformer
+
+                # 1. Load the Sentence Transformer model
+                self.model = SentenceTransformer(EMBEDDING_MODEL)
+
+                # 2. Load the FAISS index
+                if not os.path.exists(FAISS_INDEX_PATH):
+                    raise FileNotFoundError(f"FAISS index not found at: {FAISS_INDEX_PATH}")
+                self.index = faiss.read_index(FAISS_INDEX_PATH)
+                meta = {}
+                if os.path.exists(INDEX_META_PATH):
+                    with open(INDEX_META_PATH) as f:
+                        meta = json.load(f)
+                self.index_type = meta.get('index_type', 'flat')
+                self.search_params = meta.get('search_params', {})
+
+                # 3. Load the ID mapping of a positional index
+                if not meta.get('id_mapped'):
+                    if not os.path.exists(ID_MAPPING_PATH):
+                        raise FileNotFoundError(f"ID mapping file not found at: {ID_MAPPING_PATH}")
+                    id_mapping_df = pd.read_csv(ID_MAPPING_PATH)
+                    self.index_to_id = id_mapping_df['platform_id'].tolist()
+
+                logging.info("✅ VectorService initialized successfully.")
+            except Exception as e:
+                logging.error(f"❌ Failed to initialize VectorService: {e}")
+                self.error = str(e)
+            self._loaded = True
+            return self.error is None
+
+    def _query_parameters(self, k, ef_search=None, nprobe=None):
+        """Per-call FAISS parameters, so concurrent searches never share mutable index state."""
+        import faiss
+        if self.index_type == 'hnsw':
+            ef_search = ef_search or self.search_params.get('ef_search', DEFAULT_EF_SEARCH)
+            # efSearch below k would return fewer than k results.
+            return faiss.SearchParametersHNSW(efSearch=max(int(ef_search), k))
+        if self.index_type == 'ivf':
+            return faiss.SearchParametersIVF(nprobe=int(nprobe or self.search_params.get('nprobe', DEFAULT_NPROBE)))
+        return None
 
-    def search(self, query: str, k: int = 1) -> list[int]:
+    def search(self, query: str, k: int = 1, ef_search: int = None, nprobe: int = None) -> list[int]:
         """
-        Performs a semantic search for a given query.
+        Performs a semantic search for a given query, loading the service
+        first if the startup warmup has not finished.
 
         Args:
             query (str): The user's natural language query.
             k (int): The number of top results to return.
+            ef_search (int): HNSW beam width; higher is slower with better recall.
+                Defaults to the value stored with the index.
+            nprobe (int): IVF lists scanned; higher is slower with better recall.
+                Defaults to the value stored with the index.
 
         Returns:
             list[int]: A list of the top k platform_ids that match the query.
         """
-        if not all([self.model, self.index]):
-            logging.error("VectorService is not properly initialized.")
+        if not self.load():
+            logging.error(f"VectorService is not available: {self.error}")
             return []
 
         try:
             # Encode the query into an embedding
-            query_embedding = self.model.encode([query])
+            with metrics.embedding_duration.time(model=EMBEDDING_MODEL):
+                query_embedding = self.model.encode([query])
             query_embedding = np.array(query_embedding).astype('float32')
 
             # Search the FAISS index
-            distances, indices = self.index.search(query_embedding, k)
+            with metrics.vector_search_duration.time():
+                distances, indices = self.index.search(
+                    query_embedding, k, params=self._query_parameters(k, ef_search, nprobe))
             
-            # Map the resulting indices back to platform_ids
-            results = [int(self.index_to_id[idx]) for idx in indices[0]]
+            # Map the resulting indices back to platform_ids (an ID-mapped
+            # index returns them directly); -1 pads results when k > ntotal
+            hits = [idx for idx in indices[0] if idx >= 0]
+            if self.index_to_id is None:
+                results = [int(idx) for idx in hits]
+            else:
+                results = [int(self.index_to_id[idx]) for idx in hits]
             
             return results
         except Exception as e:
@@ -80,7 +147,7 @@ class VectorService:
             return []
 
 # --- Singleton Instance ---
-# This creates a single instance of the service when the module is first imported.
-# Our FastAPI app can then import and use this single instance, which is efficient
-# as the models are only loaded into memory once.
+# A single, initially unloaded instance shared by the app. main.py's lifespan
+# loads it in the background, so the models are only loaded into memory once
+# and never on the import path.
 vector_service = VectorService()
\ No newline at end of file
@@ -0,0 +1,164 @@
+# backend/app/tests/test_cache.py
+
+import sys
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+# Same trick as test_vector_service.py, so the 'app' package resolves.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from starlette.requests import Request
+
+from app.utils.cache import ResponseCache, cached_response
+
+LAST_INGEST = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class FixedGeneration:
+    """An ingest generation the test moves by hand instead of polling Postgres."""
+
+    def __init__(self, generation=1, last_modified=LAST_INGEST):
+        self.value = (generation, last_modified)
+
+    def current(self):
+        return self.value
+
+
+class Counted:
+    """compute() callback that records how often the cache called it."""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def make_request(**headers):
+    return Request({
+        'type': 'http', 'method': 'GET', 'path': '/api/v1/dashboard/floats',
+        'headers': [(name.replace('_', '-').encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def make_cache(**kwargs):
+    return ResponseCache(generation=FixedGeneration(), **kwargs)
+
+
+def test_hit_is_served_without_recomputing():
+    cache, compute = make_cache(), Counted([{'id': '1902672'}])
+
+    first = cached_response(make_request(), 'floats', compute, cache)
+    second = cached_response(make_request(), 'floats', compute, cache)
+
+    assert compute.calls == 1
+    assert first.body == second.body == b'[{"id":"1902672"}]'
+    assert first.headers['etag'] == second.headers['etag']
+    assert first.headers['last-modified'] == 'Wed, 01 May 2024 12:00:00 GMT'
+
+
+def test_new_generation_recomputes():
+    cache, compute = make_cache(), Counted([1])
+    cached_response(make_request(), 'floats', compute, cache)
+
+    cache.generation.value = (2, LAST_INGEST)
+    cached_response(make_request(), 'floats', compute, cache)
+
+    assert compute.calls == 2
+
+
+def test_expired_entry_recomputes():
+    cache, compute = make_cache(ttl_seconds=-1), Counted([1])
+
+    cached_response(make_request(), 'floats', compute, cache)
+    cached_response(make_request(), 'floats', compute, cache)
+
+    assert compute.calls == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = make_cache(max_entries=2)
+    for key in ('a', 'b', 'a', 'c'):
+        cached_response(make_request(), key, Counted([key]), cache)
+
+    assert cache.get('a', 1) is not None
+    assert cache.get('b', 1) is None
+    assert cache.get('c', 1) is not None
+
+
+def test_matching_etag_is_not_modified():
+    cache, compute = make_cache(), Counted([1])
+    etag = cached_response(make_request(), 'floats', compute, cache).headers['etag']
+
+    response = cached_response(make_request(if_none_match=f'W/"other", {etag}'), 'floats', compute, cache)
+
+    assert response.status_code == 304
+    assert response.body == b''
+    assert response.headers['etag'] == etag
+
+
+def test_stale_etag_gets_the_body():
+    cache = make_cache()
+
+    response = cached_response(make_request(if_none_match='W/"other"'), 'floats', Counted([1]), cache)
+
+    assert response.status_code == 200
+    assert response.body == b'[1]'
+
+
+def test_if_modified_since():
+    cache, compute = make_cache(), Counted([1])
+    cached_response(make_request(), 'floats', compute, cache)
+
+    unchanged = cached_response(make_request(if_modified_since=format_datetime(LAST_INGEST, usegmt=True)),
+                                'floats', compute, cache)
+    older = cached_response(make_request(if_modified_since='Tue, 30 Apr 2024 12:00:00 GMT'),
+                            'floats', compute, cache)
+    garbled = cached_response(make_request(if_modified_since='yesterday'), 'floats', compute, cache)
+
+    assert unchanged.status_code == 304
+    assert older.status_code == 200
+    assert garbled.status_code == 200
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    cache = make_cache()
+    since = format_datetime(LAST_INGEST, usegmt=True)
+
+    response = cached_response(make_request(if_none_match='W/"other"', if_modified_since=since),
+                               'floats', Counted([1]), cache)
+
+    assert response.status_code == 200
+
+
+def test_failed_compute_is_not_cached():
+    cache, compute = make_cache(), Counted(None)
+
+    response = cached_response(make_request(), 'floats', compute, cache)
+    cached_response(make_request(), 'floats', compute, cache)
+
+    assert compute.calls == 2
+    assert response.body == b'[]'
+    assert response.headers['cache-control'] == 'no-store'
+    assert 'etag' not in response.headers
+    assert cache.get('floats', 1) is None
+
+
+def test_empty_result_is_cached():
+    cache, compute = make_cache(), Counted([])
+
+    cached_response(make_request(), 'floats', compute, cache)
+    cached_response(make_request(), 'floats', compute, cache)
+
+    assert compute.calls == 1
+
+
+def test_no_ingest_yet_has_no_last_modified():
+    cache = ResponseCache(generation=FixedGeneration(0, None))
+
+    response = cached_response(make_request(), 'floats', Counted([1]), cache)
+
+    assert 'last-modified' not in response.headers
@@ -0,0 +1,40 @@
+# backend/app/tests/test_profiling.py
+
+import sys
+import os
+
+# Same trick as test_vector_service.py, so the 'app' package resolves.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.utils import profiling
+
+
+def scope_with(*headers):
+    return {'type': 'http', 'headers': list(headers)}
+
+
+def test_matching_token_is_requested(monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_TOKEN', 's3cret')
+
+    assert profiling._requested(scope_with((b'x-profile', b's3cret')))
+    assert not profiling._requested(scope_with((b'x-profile', b'guess')))
+    assert not profiling._requested(scope_with((b'accept', b's3cret')))
+
+
+def test_non_ascii_header_is_not_an_error(monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_TOKEN', 's3cret')
+
+    assert not profiling._requested(scope_with((b'x-profile', 'sécret'.encode())))
+    assert not profiling._requested(scope_with((b'x-profile', b'\xff\xfe')))
+
+
+def test_non_ascii_token(monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_TOKEN', 'sécret')
+
+    assert profiling._requested(scope_with((b'x-profile', 'sécret'.encode())))
+
+
+def test_no_token_configured_never_profiles_on_request(monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_TOKEN', None)
+
+    assert not profiling._requested(scope_with((b'x-profile', b'')))
@@ -4,10 +4,10 @@ import sys
 import os
 
 # This is a common trick to allow the test script to import modules
-# from the parent directory (the 'app' folder).
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# from the 'backend' folder, so the 'app' package's relative imports resolve.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from services.vector_service import vector_service
+from app.services.vector_service import vector_service
 
 def run_service_test():
     """
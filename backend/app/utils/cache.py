@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+from .database import engine
+
+# --- Configuration ---
+# Dashboard responses only change when an ingest commits, so entries are keyed
+# on the ingest generation (bumped by data/scripts/ingest_argo.py). The TTL
+# bounds staleness for values that drift with the clock, like "3d ago".
+CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "128"))
+# How often the generation is re-read from Postgres.
+GENERATION_POLL_SECONDS = float(os.getenv("RESPONSE_CACHE_GENERATION_POLL_SECONDS", "5"))
+
+
+class IngestGeneration:
+    """The ingest_state row, re-read at most every `poll_seconds`."""
+
+    def __init__(self, poll_seconds=GENERATION_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._value = (0, None)
+        self._checked_at = float('-inf')
+
+    def current(self):
+        """(generation, time of the last ingest) — (0, None) before the first ingest."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.poll_seconds:
+                return self._value
+            self._checked_at = now
+        try:
+            with engine.connect() as connection:
+                row = connection.execute(text("SELECT generation, updated_at FROM ingest_state")).fetchone()
+            value = (row.generation, row.updated_at.astimezone(timezone.utc)) if row else (0, None)
+        except Exception as e:
+            print(f"Database error: {e}")
+            value = (0, None)
+        with self._lock:
+            self._value = value
+        return value
+
+
+class ResponseCache:
+    """
+    Size- and TTL-bounded LRU of rendered JSON bodies. An entry is only served
+    while the ingest generation it was computed under is still current.
+    """
+
+    def __init__(self, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, generation=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.generation = generation or IngestGeneration()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry['generation'] != generation or time.monotonic() - entry['stored_at'] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, generation, last_modified, value):
+        body = json.dumps(jsonable_encoder(value), separators=(',', ':')).encode()
+        entry = {
+            'generation': generation,
+            'stored_at': time.monotonic(),
+            'body': body,
+            'etag': f'W/"{hashlib.sha1(body).hexdigest()}"',
+            'last_modified': last_modified,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _not_modified(request: Request, entry) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return entry['etag'] in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and entry['last_modified'] is not None:
+        try:
+            return entry['last_modified'].replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cached_response(request: Request, key, compute, cache=None) -> Response:
+    """
+    Serves `compute()` through the response cache, answering conditional
+    requests with 304. `compute()` returns None when it failed; that is never
+    stored, and the client gets an empty list, as before the cache, marked
+    uncacheable so the next request tries again.
+    """
+    cache = cache or response_cache
+    generation, last_modified = cache.generation.current()
+    entry = cache.get(key, generation)
+    if entry is None:
+        value = compute()
+        if value is None:
+            return Response(content=b'[]', media_type='application/json', headers={'Cache-Control': 'no-store'})
+        entry = cache.put(key, generation, last_modified, value)
+
+    headers = {'ETag': entry['etag'], 'Cache-Control': 'no-cache'}
+    if entry['last_modified'] is not None:
+        headers['Last-Modified'] = format_datetime(entry['last_modified'], usegmt=True)
+    if _not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry['body'], media_type='application/json', headers=headers)
+
+
+response_cache = ResponseCache()
@@ -1,8 +1,10 @@
 import os
+import time
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
+from . import metrics, profiling
 
 # Construct the path to the .env file in the 'backend' directory
 # This ensures it's found correctly when the app runs.
@@ -17,8 +19,30 @@ DB_NAME = os.getenv("DB_NAME")
 
 SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Connection pool. Route handlers run in the API thread pool (see main.py), so
+# at most DB_POOL_SIZE + DB_MAX_OVERFLOW of them hold a connection at once; the
+# rest wait up to DB_POOL_TIMEOUT seconds for one.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Server-side cap on any single statement, so one runaway aggregate cannot
+# hold a connection (and a thread) indefinitely. 0 disables it.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
 # Create the SQLAlchemy engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    connect_args={"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"},
+)
+
+# Statement latency, row counts and pool checkouts at /metrics, and the
+# statements of profiled requests.
+metrics.instrument_engine(engine)
+profiling.instrument_engine(engine)
 
 # Each instance of SessionLocal will be a new database session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -29,7 +53,10 @@ Base = declarative_base()
 # Dependency to get a DB session for each request
 def get_db():
     db = SessionLocal()
+    started = time.perf_counter()
+    profiling.join_current_thread()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+        metrics.db_session_duration.observe(time.perf_counter() - started, route=metrics.current_route())
@@ -0,0 +1,275 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# In-process latency metrics, rendered in the Prometheus text format at
+# /metrics (see main.py). Each worker process keeps its own series; scrape
+# every worker, or sum them in Prometheus.
+#
+# Label values must stay low-cardinality: routes are recorded by the template
+# they were declared with ("/argo/float/{float_id}", without the /api/v1
+# prefix), never the raw path, and SQL by the route that issued it plus the
+# statement verb or query name, never the statement text.
+
+# Seconds. Covers cached dashboard hits (~1 ms) up to slow LLM calls.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+            lines += [line for key, value in series for line in self._render_series(key, value)]
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def _render_series(self, key, value):
+        return [f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the `with` block, also when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_series(self, key, series):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, series['counts']):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+        lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class GaugeCallback(_Metric):
+    """A gauge read at scrape time from `callback()`, which returns {label tuple: value}."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback, labelnames=(), registry=None):
+        self.callback = callback
+        super().__init__(name, documentation, labelnames, registry)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.callback()
+        except Exception as e:
+            print(f"Metrics error: {e}")
+            return lines
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# --- Request context ---
+# The ASGI scope of the request being served. The router fills in
+# scope['route'] once it matches, so code deeper in the request (SQL events,
+# services) can label its metrics with the route template.
+_current_scope = ContextVar('metrics_scope', default=None)
+
+
+def _route_of(scope) -> str:
+    route = scope.get('route')
+    return getattr(route, 'path', None) or 'unmatched'
+
+
+def current_route() -> str:
+    """Template of the route being served; 'background' outside a request."""
+    scope = _current_scope.get()
+    return 'background' if scope is None else _route_of(scope)
+
+
+def _statement_kind(statement) -> str:
+    words = statement.split(None, 1)
+    return words[0].upper() if words else ''
+
+
+# --- Metrics ---
+http_request_duration = Histogram(
+    'http_request_duration_seconds', 'Time from request start to the last body byte sent.',
+    ('method', 'route', 'status'))
+db_session_duration = Histogram(
+    'db_session_duration_seconds', 'Lifetime of a get_db session, from open to close.', ('route',))
+db_statement_duration = Histogram(
+    'db_statement_duration_seconds', 'Time spent executing one SQL statement.', ('route', 'statement'))
+db_statement_rows = Histogram(
+    'db_statement_rows', 'Rows returned or affected by one SQL statement.', ('route', 'statement'), ROW_BUCKETS)
+db_pool_checkouts = Counter(
+    'db_pool_checkouts', 'Connections checked out of the pool.', ('route',))
+db_connection_hold = Histogram(
+    'db_connection_hold_seconds', 'Time a connection stayed checked out of the pool.', ('route',))
+sql_query_duration = Histogram(
+    'sql_query_duration_seconds', 'query_service.execute_sql_query latency by query name.', ('query', 'outcome'))
+sql_query_rows = Histogram(
+    'sql_query_rows', 'Rows returned by query_service.execute_sql_query by query name.', ('query',), ROW_BUCKETS)
+llm_request_duration = Histogram(
+    'llm_request_duration_seconds', 'Latency of one call to the generative model.', ('model', 'outcome'))
+ai_response_duration = Histogram(
+    'ai_response_duration_seconds', 'llm_service.get_ai_response latency by how the answer was produced.',
+    ('source',))
+embedding_duration = Histogram(
+    'embedding_duration_seconds', 'Time to embed a query with the sentence-transformer model.', ('model',))
+vector_search_duration = Histogram(
+    'vector_search_duration_seconds', 'Time for the FAISS index search of VectorService.search.', ())
+
+
+def instrument_engine(engine):
+    """Times every statement and pool checkout of `engine`, labelled with the current route."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['metrics_started'].pop()
+        labels = {'route': current_route(), 'statement': _statement_kind(statement)}
+        db_statement_duration.observe(time.perf_counter() - started, **labels)
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            db_statement_rows.observe(cursor.rowcount, **labels)
+
+    @event.listens_for(engine, 'checkout')
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        route = current_route()
+        connection_record.info['metrics_checkout'] = (time.perf_counter(), route)
+        db_pool_checkouts.inc(route=route)
+
+    @event.listens_for(engine, 'checkin')
+    def _checkin(dbapi_connection, connection_record):
+        checkout = connection_record.info.pop('metrics_checkout', None)
+        if checkout is not None:
+            started, route = checkout
+            db_connection_hold.observe(time.perf_counter() - started, route=route)
+
+    def _pool_state():
+        pool = engine.pool
+        return {
+            ('checked_out',): pool.checkedout(),
+            ('idle',): pool.checkedin(),
+            ('overflow',): max(pool.overflow(), 0),
+            ('size',): pool.size(),
+        }
+
+    GaugeCallback('db_pool_connections', 'Connection pool state at scrape time.', _pool_state, ('state',))
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (not BaseHTTPMiddleware) so streamed responses are
+    timed to their last byte, and so the request's scope is the one the
+    router annotates with the matched route.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {'code': 500}
+        token = _current_scope.set(scope)
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_scope.reset(token)
+            http_request_duration.observe(time.perf_counter() - started, method=scope['method'],
+                                          route=_route_of(scope), status=status['code'])
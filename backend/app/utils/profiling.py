@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import time
+import random
+import hmac
+import logging
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from anyio import to_thread
+
+# --- Configuration ---
+# Opt-in profiling of single requests. A request is profiled when it carries
+# `X-Profile: <API_PROFILE_TOKEN>` (ignored while no token is configured), or
+# at random with probability API_PROFILE_SAMPLE_RATE. Each profile is written
+# to API_PROFILE_DIR as a speedscope file (https://www.speedscope.app), named
+# after the route, and the response names it in an X-Profile-File header.
+PROFILE_TOKEN = os.getenv("API_PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("API_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("API_PROFILE_DIR", "data/profiles")
+PROFILE_INTERVAL_SECONDS = float(os.getenv("API_PROFILE_INTERVAL_MS", "2")) / 1000
+PROFILE_HEADER = b"x-profile"
+# Longest SQL text kept per statement, in the flamegraph and the statement list.
+MAX_SQL_CHARS = 500
+
+# Leaf frames of a thread that is waiting rather than working on the request.
+_IDLE_FILES = ('selectors.py', 'threading.py', 'queue.py')
+
+# The profile of the request being served. anyio copies the context into the
+# worker threads that run sync dependencies and handlers, so code there sees it.
+_active_profile = ContextVar('active_profile', default=None)
+
+
+class RequestProfile:
+    """
+    Samples the stacks of the threads serving one request. The event loop
+    thread is sampled from the start; a worker thread joins when it opens
+    the request's DB session or runs one of its SQL statements. Samples
+    taken during a statement get the statement as their leaf frame.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.threads = {threading.get_ident()}
+        self.frames, self._frame_index = [], {}
+        self.samples = {}   # thread ident -> [(stack, weight)]
+        self.statements = []
+        self._running_sql = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self.duration = None
+
+    # --- Hooks, called from the request's threads ---
+    def join_thread(self):
+        with self._lock:
+            self.threads.add(threading.get_ident())
+
+    def sql_started(self, statement):
+        ident = threading.get_ident()
+        with self._lock:
+            self.threads.add(ident)
+            self._running_sql[ident] = (statement, time.perf_counter())
+
+    def sql_finished(self, rows=None, error=None):
+        ident = threading.get_ident()
+        with self._lock:
+            running = self._running_sql.pop(ident, None)
+        if running is not None:
+            statement, started = running
+            self.statements.append({
+                'sql': statement[:MAX_SQL_CHARS],
+                'seconds': round(time.perf_counter() - started, 6),
+                'rows': rows,
+                **({'error': error} if error else {}),
+            })
+
+    # --- Sampling ---
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _frame(self, name, file, line):
+        key = (name, file, line)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({'name': name, 'file': file, 'line': line})
+        return index
+
+    def _stack(self, frame, ident):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(self._frame(code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        running = self._running_sql.get(ident)
+        if running is not None:
+            stack.append(self._frame(f"SQL: {' '.join(running[0].split())[:120]}", '<sql>', 0))
+        return stack
+
+    def _run(self):
+        me = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            frames = sys._current_frames()
+            with self._lock:
+                threads = [ident for ident in self.threads if ident != me]
+                for ident in threads:
+                    frame = frames.get(ident)
+                    if frame is None or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                        continue
+                    self.samples.setdefault(ident, []).append((self._stack(frame, ident), weight))
+
+    # --- Output ---
+    def to_speedscope(self, name, tags):
+        profiles = []
+        for ident, samples in self.samples.items():
+            profiles.append({
+                'type': 'sampled',
+                'name': f"{name} (thread {ident})",
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weight for _, weight in samples),
+                'samples': [stack for stack, _ in samples],
+                'weights': [weight for _, weight in samples],
+            })
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'oceanai-request-profiler',
+            'activeProfileIndex': 0,
+            'shared': {'frames': self.frames},
+            'profiles': profiles,
+            # Ignored by speedscope; for reading the file directly.
+            'request': {**tags, 'started_at': self.started_at.isoformat(),
+                        'duration_seconds': round(self.duration, 6), 'sql': self.statements},
+        }
+
+    def filename(self, method, route, status):
+        slug = ''.join(c if c.isalnum() else '_' for c in route).strip('_') or 'root'
+        return f"{self.started_at:%Y%m%dT%H%M%S%f}_{method}_{slug}_{status}.speedscope.json"
+
+    def write(self, path, method, route, status, request_path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        document = self.to_speedscope(f"{method} {route}", {
+            'method': method, 'route': route, 'path': request_path, 'status': status,
+        })
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(document, f)
+        os.replace(f"{path}.tmp", path)
+
+
+def join_current_thread():
+    """Adds the calling thread to the request's profile, if it is being profiled."""
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.join_thread()
+
+
+def instrument_engine(engine):
+    """Records the SQL statements of profiled requests; one ContextVar read per statement otherwise."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.sql_started(statement)
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        profile = _active_profile.get()
+        if profile is not None:
+            rows = cursor.rowcount
+            profile.sql_finished(rows if rows is not None and rows >= 0 else None)
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(exception_context):
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.sql_finished(error=type(exception_context.original_exception).__name__)
+
+
+def _route_of(scope) -> str:
+    return getattr(scope.get('route'), 'path', None) or 'unmatched'
+
+
+def _requested(scope) -> bool:
+    if PROFILE_TOKEN:
+        for name, value in scope['headers']:
+            if name == PROFILE_HEADER:
+                # compare_digest only takes ASCII str, so compare the raw bytes.
+                return hmac.compare_digest(value, PROFILE_TOKEN.encode())
+    return False
+
+
+class ProfilingMiddleware:
+    """Plain ASGI middleware; requests that are not profiled pass straight through."""
+
+    def __init__(self, app, directory=PROFILE_DIR):
+        self.app = app
+        self.directory = directory
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not (_requested(scope) or
+                                           (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE)):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        response = {'status': 500, 'filename': None}
+
+        async def send_with_header(message):
+            # The route and status are known once the response starts, so the
+            # file is named (and the client told) before it is written.
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['filename'] = profile.filename(scope['method'], _route_of(scope), message['status'])
+                message = {**message, 'headers': list(message.get('headers', [])) + [
+                    (b'x-profile-file', response['filename'].encode())]}
+            await send(message)
+
+        token = _active_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            _active_profile.reset(token)
+            profile.stop()
+            filename = response['filename'] or profile.filename(scope['method'], _route_of(scope), 500)
+            path = os.path.join(self.directory, filename)
+            try:
+                await to_thread.run_sync(profile.write, path, scope['method'], _route_of(scope),
+                                         response['status'], scope['path'])
+                logging.info(f"Profile written: {path}")
+            except Exception as e:
+                print(f"Profiling error: {e}")
@@ -0,0 +1,78 @@
+import io
+import json
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is optional; only the Arrow format needs it
+    pa = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Rows held before an Arrow record batch is written out.
+ARROW_BATCH_ROWS = 100
+
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+def ndjson_lines(rows):
+    """One JSON document per row, encoded as soon as the row arrives."""
+    for row in rows:
+        yield (json.dumps(row, default=_json_default, separators=(',', ':')) + "\n").encode()
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def profile_arrow_schema():
+    measurements = pa.list_(pa.float32())
+    return pa.schema([
+        ('cycle_number', pa.int32()),
+        ('profile_time', pa.timestamp('us', tz='UTC')),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('pressure_dbar', measurements),
+        ('temperature_celsius', measurements),
+        ('salinity_psu', measurements),
+    ])
+
+
+def arrow_ipc_stream(rows, schema, batch_rows=ARROW_BATCH_ROWS):
+    """
+    Arrow IPC stream of `rows` (dicts keyed by schema field), written one
+    record batch of `batch_rows` at a time so only one batch is in memory.
+    """
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            batch = []
+            yield drain()
+    if batch:
+        writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+    writer.close()
+    yield drain()
+
+
+def arrow_ipc_bytes(columns: dict) -> bytes:
+    """A small columnar payload (dict of equal-length lists) as one Arrow IPC stream."""
+    table = pa.table(columns)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
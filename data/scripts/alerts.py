@@ -0,0 +1,199 @@
+# data/scripts/alerts.py
+
+import os
+import numpy as np
+from sqlalchemy import text
+
+from climatology import CLIMATOLOGY_DIR, cell_indices, current_version, open_cube, profile_cells, read_meta
+
+# Anomaly alerts, detected by ingest_argo.py for the profiles of each merged
+# file only (never by rescanning argo_profiles) and paged by /dashboard/alerts:
+#
+#   temperature_anomaly / salinity_anomaly - a standard-level value more than
+#       ALERT_Z_THRESHOLD standard deviations from the climatology cube cell
+#       (month, level, lat, lon) it falls in. Needs a built cube (climatology.py);
+#       the cube lags the ingest by a batch, so a profile is judged against
+#       data that does not include it yet.
+#   position_jump - implied drift speed from the float's previous profile
+#       above ALERT_MAX_DRIFT_KMH.
+#   stalled_float - a float's latest profile is more than ALERT_STALL_DAYS
+#       older than the newest profile of any float. Cleared once it reports.
+#
+# Alerts are keyed on (kind, float_id, cycle_number); re-ingesting a profile
+# replaces its alerts.
+
+ALERT_Z_THRESHOLD = float(os.getenv("ARGO_ALERT_Z_THRESHOLD", "4"))
+# Cube cells with fewer values than this are too thin to judge against.
+ALERT_MIN_CLIMATOLOGY_COUNT = int(os.getenv("ARGO_ALERT_MIN_CLIMATOLOGY_COUNT", "10"))
+# Floor on the cell standard deviation, so near-constant cells do not flag noise.
+ALERT_MIN_STD = {'temperature': 0.1, 'salinity': 0.01}
+ALERT_MAX_DRIFT_KMH = float(os.getenv("ARGO_ALERT_MAX_DRIFT_KMH", "3"))
+ALERT_STALL_DAYS = int(os.getenv("ARGO_ALERT_STALL_DAYS", "30"))
+
+EARTH_RADIUS_KM = 6371.0
+PROFILE_ALERT_KINDS = ('temperature_anomaly', 'salinity_anomaly', 'position_jump')
+
+ALERTS_DDL = """
+    CREATE TABLE IF NOT EXISTS argo_alerts (
+        id BIGSERIAL PRIMARY KEY,
+        kind TEXT NOT NULL,
+        float_id INTEGER NOT NULL,
+        cycle_number INTEGER NOT NULL,
+        profile_time TIMESTAMPTZ NOT NULL,
+        latitude DOUBLE PRECISION NOT NULL,
+        longitude DOUBLE PRECISION NOT NULL,
+        pressure_dbar REAL,
+        value DOUBLE PRECISION NOT NULL,
+        message TEXT NOT NULL,
+        detected_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        CONSTRAINT argo_alerts_kind_profile_key UNIQUE (kind, float_id, cycle_number)
+    );
+    CREATE INDEX IF NOT EXISTS idx_argo_alerts_kind_id ON argo_alerts (kind, id);
+"""
+
+_cube = {'version': None}
+
+def ensure_alerts(connection):
+    connection.execute(text(ALERTS_DDL))
+
+def _climatology():
+    """The published climatology cube as (meta, arrays), reopened when a new version lands."""
+    version = current_version(CLIMATOLOGY_DIR)
+    if version is None:
+        return None
+    if _cube['version'] != version:
+        _cube.update(version=version, meta=read_meta(version), arrays=open_cube(version, mode='r'))
+    return _cube['meta'], _cube['arrays']
+
+def _as_matrix(arrays, n_levels):
+    return np.array([a if a is not None else [np.nan] * n_levels for a in arrays], dtype='float64')
+
+def climatology_z_scores(rows, variable, meta, arrays):
+    """
+    n_profiles x n_levels z-scores of `variable` against the cube cells the
+    profiles fall in; NaN where the value is missing or the cell too thin.
+    """
+    _, n_levels, _, _ = meta['shape']
+    values = _as_matrix([getattr(r, f"{variable}_std") for r in rows], n_levels)
+    month_i, lat_i, lon_j = cell_indices(meta, [r.month for r in rows],
+                                         [r.latitude for r in rows], [r.longitude for r in rows])
+    stats = profile_cells(arrays[variable], month_i, lat_i, lon_j)
+    count = stats['count'].astype('float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.maximum(np.sqrt(stats['m2'] / (count - 1)), ALERT_MIN_STD[variable])
+        z = (values - stats['mean']) / std
+    return np.where(count >= ALERT_MIN_CLIMATOLOGY_COUNT, z, np.nan)
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype='float64')) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def _profile_alert(kind, row, value, message, pressure=None):
+    return {
+        'kind': kind, 'float_id': row.float_id, 'cycle_number': row.cycle_number,
+        'profile_time': row.profile_time, 'latitude': row.latitude, 'longitude': row.longitude,
+        'pressure_dbar': pressure, 'value': float(value), 'message': message,
+    }
+
+def profile_alerts(rows, climatology=None):
+    """Alert rows for merged profiles, each with its previous profile's time and position."""
+    if not rows:
+        return []
+    found = []
+
+    if climatology is not None:
+        meta, arrays = climatology
+        levels = meta['levels_dbar']
+        for variable in ('temperature', 'salinity'):
+            z = climatology_z_scores(rows, variable, meta, arrays)
+            magnitude = np.nan_to_num(np.abs(z), nan=0.0)
+            worst = magnitude.argmax(axis=1)
+            for i in np.nonzero(magnitude[np.arange(len(rows)), worst] > ALERT_Z_THRESHOLD)[0]:
+                row, level, score = rows[i], worst[i], z[i, worst[i]]
+                found.append(_profile_alert(
+                    f"{variable}_anomaly", row, score,
+                    f"Float {row.float_id} cycle {row.cycle_number}: {variable} {abs(score):.1f}σ "
+                    f"{'above' if score > 0 else 'below'} climatology at {levels[level]:g} dbar",
+                    pressure=levels[level],
+                ))
+
+    has_previous = np.array([r.prev_time is not None for r in rows])
+    if has_previous.any():
+        current = [r for r, prev in zip(rows, has_previous) if prev]
+        km = haversine_km([r.prev_latitude for r in current], [r.prev_longitude for r in current],
+                          [r.latitude for r in current], [r.longitude for r in current])
+        hours = np.array([(r.profile_time - r.prev_time).total_seconds() / 3600 for r in current])
+        # Profiles logged in the same hour are compared as if an hour apart.
+        speed = km / np.maximum(hours, 1.0)
+        for i in np.nonzero(speed > ALERT_MAX_DRIFT_KMH)[0]:
+            row = current[i]
+            found.append(_profile_alert(
+                'position_jump', row, speed[i],
+                f"Float {row.float_id} moved {km[i]:,.0f} km in {hours[i]:.0f} h since cycle "
+                f"{row.prev_cycle} ({speed[i]:.1f} km/h)",
+            ))
+    return found
+
+def detect_profile_alerts(connection, profile_keys_sql):
+    """
+    Re-evaluates the profile alerts of the profiles keyed by `profile_keys_sql`,
+    reading only those profiles and their floats' previous positions.
+    """
+    key_filter = f"(float_id, cycle_number) IN (SELECT float_id, cycle_number FROM ({profile_keys_sql}) k)"
+    connection.execute(text(f"""
+        DELETE FROM argo_alerts WHERE kind = ANY(:kinds) AND {key_filter}
+    """), {'kinds': list(PROFILE_ALERT_KINDS)})
+
+    rows = connection.execute(text(f"""
+        SELECT s.* FROM (
+            SELECT
+                float_id, cycle_number, profile_time, latitude, longitude,
+                temperature_std, salinity_std,
+                EXTRACT(MONTH FROM profile_time AT TIME ZONE 'UTC')::int AS month,
+                LAG(cycle_number) OVER w AS prev_cycle,
+                LAG(profile_time) OVER w AS prev_time,
+                LAG(latitude) OVER w AS prev_latitude,
+                LAG(longitude) OVER w AS prev_longitude
+            FROM argo_profiles
+            WHERE float_id IN (SELECT float_id FROM ({profile_keys_sql}) f)
+            WINDOW w AS (PARTITION BY float_id ORDER BY profile_time, cycle_number)
+        ) s
+        WHERE {key_filter}
+    """)).fetchall()
+
+    found = profile_alerts(rows, _climatology())
+    if found:
+        connection.execute(text("""
+            INSERT INTO argo_alerts
+                (kind, float_id, cycle_number, profile_time, latitude, longitude, pressure_dbar, value, message)
+            VALUES
+                (:kind, :float_id, :cycle_number, :profile_time, :latitude, :longitude, :pressure_dbar, :value, :message)
+            ON CONFLICT (kind, float_id, cycle_number) DO UPDATE SET
+                value = EXCLUDED.value, message = EXCLUDED.message,
+                pressure_dbar = EXCLUDED.pressure_dbar, detected_at = now()
+        """), found)
+    return len(found)
+
+def detect_stalled_floats(connection):
+    """
+    Flags floats that have fallen ALERT_STALL_DAYS behind the newest profile,
+    and clears the flags of floats that have reported since. Reads
+    argo_float_latest only, one row per float.
+    """
+    connection.execute(text("""
+        DELETE FROM argo_alerts a USING argo_float_latest l
+        WHERE a.kind = 'stalled_float' AND a.float_id = l.float_id AND a.cycle_number <> l.cycle_number
+    """))
+    connection.execute(text("""
+        INSERT INTO argo_alerts (kind, float_id, cycle_number, profile_time, latitude, longitude, value, message)
+        SELECT
+            'stalled_float', float_id, cycle_number, profile_time, latitude, longitude, days,
+            format('Float %s has not reported for %s days (last cycle %s)', float_id, round(days), cycle_number)
+        FROM (
+            SELECT *, EXTRACT(EPOCH FROM MAX(profile_time) OVER () - profile_time) / 86400 AS days
+            FROM argo_float_latest
+        ) l
+        WHERE days > :stall_days
+        ON CONFLICT (kind, float_id, cycle_number) DO NOTHING
+    """), {'stall_days': ALERT_STALL_DAYS})
@@ -0,0 +1,79 @@
+# data/scripts/argo_stats.py
+
+from sqlalchemy import text
+
+# Running totals behind /home/stats and /dashboard/alerts, maintained by
+# ingest_argo.py in the same transaction as the profiles they count:
+#
+#   argo_stats       - one row: floats, profiles and levels stored.
+#   argo_daily_stats - profiles and levels per UTC day of profile_time.
+#
+# Replaced profiles are subtracted before a merge and the new ones added
+# after it, so re-ingesting a file leaves the totals exact. The float count
+# follows argo_float_latest, which already holds one row per float.
+
+ARGO_STATS_DDL = """
+    CREATE TABLE IF NOT EXISTS argo_stats (
+        id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+        float_count BIGINT NOT NULL DEFAULT 0,
+        profile_count BIGINT NOT NULL DEFAULT 0,
+        level_count BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    INSERT INTO argo_stats (id) VALUES (TRUE) ON CONFLICT DO NOTHING;
+    CREATE TABLE IF NOT EXISTS argo_daily_stats (
+        day DATE PRIMARY KEY,
+        profile_count BIGINT NOT NULL,
+        level_count BIGINT NOT NULL
+    );
+"""
+
+def ensure_argo_stats(connection):
+    connection.execute(text(ARGO_STATS_DDL))
+
+def add_profile_stats(connection, profile_keys_sql=None, sign=1):
+    """
+    Adds (sign=1) or removes (sign=-1) the profiles whose (float_id,
+    cycle_number) are returned by `profile_keys_sql` (default: every profile)
+    to the profile and level totals.
+    """
+    join = f"JOIN ({profile_keys_sql}) k USING (float_id, cycle_number)" if profile_keys_sql else ""
+    connection.execute(text(f"""
+        WITH changed AS (
+            SELECT
+                (p.profile_time AT TIME ZONE 'UTC')::date AS day,
+                COUNT(*) AS profiles,
+                COALESCE(SUM(cardinality(p.pressure_dbar)), 0) AS levels
+            FROM argo_profiles p
+            {join}
+            GROUP BY 1
+        ), daily AS (
+            INSERT INTO argo_daily_stats (day, profile_count, level_count)
+            SELECT day, {int(sign)} * profiles, {int(sign)} * levels FROM changed
+            ON CONFLICT (day) DO UPDATE SET
+                profile_count = argo_daily_stats.profile_count + EXCLUDED.profile_count,
+                level_count = argo_daily_stats.level_count + EXCLUDED.level_count
+        )
+        UPDATE argo_stats SET
+            profile_count = profile_count + {int(sign)} * (SELECT COALESCE(SUM(profiles), 0) FROM changed),
+            level_count = level_count + {int(sign)} * (SELECT COALESCE(SUM(levels), 0) FROM changed),
+            updated_at = now()
+    """))
+
+def add_float_count(connection, new_floats):
+    """Counts floats seen for the first time (rows newly inserted into argo_float_latest)."""
+    if new_floats:
+        connection.execute(text(
+            "UPDATE argo_stats SET float_count = float_count + :n, updated_at = now()"
+        ), {'n': new_floats})
+
+def rebuild_argo_stats(connection):
+    """Recomputes every total from argo_profiles and argo_float_latest."""
+    connection.execute(text("TRUNCATE argo_daily_stats"))
+    connection.execute(text("""
+        UPDATE argo_stats SET
+            float_count = (SELECT COUNT(*) FROM argo_float_latest),
+            profile_count = 0,
+            level_count = 0
+    """))
+    add_profile_stats(connection)
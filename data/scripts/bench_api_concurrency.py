@@ -0,0 +1,117 @@
+# data/scripts/bench_api_concurrency.py
+
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# --- Configuration ---
+DEFAULT_BASE_URL = "http://localhost:8000"
+# A cheap endpoint and a deliberately expensive one (a full-table COUNT).
+DEFAULT_CHEAP_PATH = "/"
+DEFAULT_SLOW_PATH = "/api/v1/test/db"
+DEFAULT_REQUESTS = 500
+DEFAULT_CLIENTS = 10
+DEFAULT_SLOW_CLIENTS = 4
+RESULTS_DIR = "data/benchmarks"
+
+# Measures the latency of a cheap endpoint twice against a running API: on
+# its own, and while other clients keep the slow endpoint busy. When blocking
+# queries run on the event loop the second p99 tracks the slow query; with
+# the handlers in the thread pool it should stay close to the first.
+
+def fetch(url, timeout=120):
+    """Wall time of one GET in seconds; None if the request failed."""
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+    except Exception:
+        return None
+    return time.perf_counter() - started
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99),
+            'max_ms': ordered[-1] * 1000, 'count': len(ordered)}
+
+def measure(url, requests, clients):
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(lambda _: fetch(url), range(requests)))
+    return [r for r in results if r is not None], results.count(None)
+
+def run_slow_load(url, clients, stop, samples):
+    def loop():
+        while not stop.is_set():
+            elapsed = fetch(url)
+            if elapsed is not None:
+                samples.append(elapsed)
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def main():
+    parser = argparse.ArgumentParser(description="Cheap-endpoint latency with and without slow queries in flight.")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--cheap-path", default=DEFAULT_CHEAP_PATH)
+    parser.add_argument("--slow-path", default=DEFAULT_SLOW_PATH)
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS,
+                        help="Cheap requests per phase.")
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS,
+                        help="Concurrent clients issuing cheap requests.")
+    parser.add_argument("--slow-clients", type=int, default=DEFAULT_SLOW_CLIENTS,
+                        help="Clients keeping the slow endpoint busy during the second phase.")
+    parser.add_argument("--output", help=f"Results file (default: {RESULTS_DIR}/api-concurrency-<timestamp>.json).")
+    args = parser.parse_args()
+
+    cheap_url = args.base_url.rstrip('/') + args.cheap_path
+    slow_url = args.base_url.rstrip('/') + args.slow_path
+
+    idle, idle_errors = measure(cheap_url, args.requests, args.clients)
+
+    stop = threading.Event()
+    slow_samples = []
+    threads = run_slow_load(slow_url, args.slow_clients, stop, slow_samples)
+    time.sleep(0.5)  # let the slow requests get going
+    loaded, loaded_errors = measure(cheap_url, args.requests, args.clients)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    created_at = datetime.now(timezone.utc)
+    results = {
+        'benchmark': 'api_concurrency',
+        'created_at': created_at.isoformat(),
+        'config': vars(args),
+        'cheap_idle': {**percentiles(idle), 'errors': idle_errors},
+        'cheap_under_load': {**percentiles(loaded), 'errors': loaded_errors},
+        'slow': percentiles(slow_samples),
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"api-concurrency-{created_at:%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{args.cheap_path} x {args.requests} with {args.clients} clients; "
+          f"{args.slow_clients} clients on {args.slow_path} in the second phase")
+    for label in ('cheap_idle', 'cheap_under_load', 'slow'):
+        stats = results[label]
+        if stats.get('count'):
+            print(f"  {label:<17} p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  "
+                  f"p99 {stats['p99_ms']:8.1f} ms  max {stats['max_ms']:8.1f} ms")
+        else:
+            print(f"  {label:<17} no successful requests")
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# data/scripts/bench_ingest.py
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+import xarray as xr
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from ingest_argo import (
+    DEFAULT_LAYOUT, DEFAULT_QC_KEEP, LAYOUTS, LOADERS, IngestOptions, describe_file, ensure_schema,
+    load_file_chunks, parse_qc_keep, qc_policy_name, read_profile_arrays, valid_level_mask,
+)
+from synthetic_argo import write_synthetic_dataset
+
+# --- Configuration ---
+DEFAULT_FILES = 4
+DEFAULT_N_PROF = 300
+DEFAULT_N_LEVELS = 500
+DEFAULT_REPEATS = 3
+RESULTS_DIR = "data/benchmarks"
+STAGES = ['open', 'dropna', 'parse', 'load']
+
+# Ingest stages, timed with the same functions ingest_argo.py runs:
+#   open   - xr.open_dataset plus reading the arrays (read_profile_arrays)
+#   dropna - the NaN/QC mask over the N_PROF x N_LEVELS block (valid_level_mask)
+#   parse  - shaping the arrays into the layout's frame, mask included
+#   load   - staging, merge and manifest write in one transaction (load_file_chunks)
+# open/dropna/parse keep the best of --repeats runs per file; each file is
+# loaded once, into a fresh schema.
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def best_of(repeats, fn, *args):
+    """Best wall time of `repeats` calls and the last result."""
+    best, result = float('inf'), None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def open_and_read(path):
+    with xr.open_dataset(path) as ds:
+        return read_profile_arrays(ds)
+
+def create_bench_engine(db_url):
+    """
+    An engine whose tables live in a throwaway schema. Returns (engine, schema),
+    with schema None for SQLite, which is only used for parse-only runs.
+    """
+    url = make_url(db_url)
+    if url.get_backend_name() != 'postgresql':
+        return create_engine(db_url), None
+
+    schema = f"bench_ingest_{os.getpid()}"
+    admin = create_engine(db_url)
+    with admin.begin() as connection:
+        connection.execute(text(f"CREATE SCHEMA {schema}"))
+    admin.dispose()
+    # PostGIS usually lives in public, so keep it on the search path.
+    engine = create_engine(db_url, connect_args={'options': f"-csearch_path={schema},public"})
+    return engine, schema
+
+def drop_bench_schema(engine, schema):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+    engine.dispose()
+
+def run_benchmark(paths, layout, loader, repeats, engine=None, parquet_dir=None, qc_keep=None):
+    """Times every stage for each file. `engine` None skips the load stage."""
+    spec = LAYOUTS[layout]
+    options = IngestOptions(layout=layout, loader=loader, parquet_dir=parquet_dir,
+                            data_dir=os.path.dirname(paths[0]), qc_keep=qc_keep)
+    files = []
+    for path in paths:
+        timings = {}
+        timings['open'], arrays = best_of(repeats, open_and_read, path)
+        timings['dropna'], _ = best_of(repeats, valid_level_mask, arrays, qc_keep)
+        timings['parse'], frame = best_of(repeats, spec.shape, arrays, qc_keep)
+        rows, profiles = spec.count(frame)
+
+        if engine is not None:
+            started = time.perf_counter()
+            if not load_file_chunks(engine, describe_file(path), [frame], options):
+                raise RuntimeError(f"Loading {os.path.basename(path)} failed; see data/ingestion.log.")
+            timings['load'] = time.perf_counter() - started
+
+        files.append({'file': os.path.basename(path), 'rows': rows, 'profiles': profiles,
+                      'qc_dropped': frame.attrs.get('qc_dropped', 0), 'seconds': timings})
+    return files
+
+def summarize(files):
+    """Per-stage totals and rows/s across all files."""
+    rows = sum(f['rows'] for f in files)
+    summary = {}
+    for stage in STAGES:
+        times = [f['seconds'][stage] for f in files if stage in f['seconds']]
+        if times:
+            total = sum(times)
+            summary[stage] = {'seconds': total, 'rows_per_sec': rows / total if total > 0 else None}
+    return summary
+
+def compare_with_baseline(summary, baseline_path):
+    """Prints each stage's change against an earlier results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nAgainst {baseline_path} ({baseline.get('git_revision') or 'unknown revision'}):")
+    for stage, current in summary.items():
+        before = baseline.get('summary', {}).get(stage)
+        if not before or not before['seconds']:
+            continue
+        change = (current['seconds'] - before['seconds']) / before['seconds'] * 100
+        print(f"  {stage:<7} {before['seconds'] * 1000:9.1f} ms -> {current['seconds'] * 1000:9.1f} ms ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingest stages on synthetic Argo files.")
+    parser.add_argument("--files", type=int, default=DEFAULT_FILES, help="Synthetic files to generate.")
+    parser.add_argument("--n-prof", type=int, default=DEFAULT_N_PROF, help="Profiles per file.")
+    parser.add_argument("--n-levels", type=int, default=DEFAULT_N_LEVELS, help="Levels per profile.")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS,
+                        help="Runs of the open/dropna/parse stages per file; the best is kept.")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default=DEFAULT_LAYOUT)
+    parser.add_argument("--loader", choices=sorted(LOADERS), default="copy")
+    parser.add_argument("--qc-keep", type=parse_qc_keep, default=parse_qc_keep(DEFAULT_QC_KEEP),
+                        help=f"QC flags to keep, or 'all' (default: {DEFAULT_QC_KEEP}).")
+    parser.add_argument("--db-url", default="sqlite://",
+                        help="A throwaway Postgres to time the load stage against. The default "
+                             "in-memory SQLite runs the parse stages only.")
+    parser.add_argument("--with-parquet", action="store_true",
+                        help="Include writing the Parquet store (to a temp dir) in the load stage.")
+    parser.add_argument("--output", help=f"Results file (default: {RESULTS_DIR}/ingest-<timestamp>.json).")
+    parser.add_argument("--baseline", help="An earlier results file to compare against.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine, schema = create_bench_engine(args.db_url)
+    load_db = schema is not None
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = write_synthetic_dataset(os.path.join(tmp, "nc"), args.files, args.n_prof,
+                                            args.n_levels, args.seed)
+            if load_db:
+                ensure_schema(engine, args.layout)
+            files = run_benchmark(
+                paths, args.layout, args.loader, args.repeats,
+                engine=engine if load_db else None,
+                parquet_dir=os.path.join(tmp, "parquet") if args.with_parquet else None,
+                qc_keep=args.qc_keep,
+            )
+    finally:
+        if load_db:
+            drop_bench_schema(engine, schema)
+
+    summary = summarize(files)
+    created_at = datetime.now(timezone.utc)
+    results = {
+        'benchmark': 'ingest',
+        'created_at': created_at.isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'config': {
+            'files': args.files, 'n_prof': args.n_prof, 'n_levels': args.n_levels,
+            'repeats': args.repeats, 'layout': args.layout, 'loader': args.loader,
+            'qc_policy': qc_policy_name(args.qc_keep),
+            'database': make_url(args.db_url).get_backend_name() if load_db else None,
+            'parquet': args.with_parquet,
+        },
+        'summary': summary,
+        'files': files,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"ingest-{created_at:%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    total_rows = sum(f['rows'] for f in files)
+    print(f"{args.files} files x {args.n_prof} profiles x {args.n_levels} levels -> {total_rows:,} rows "
+          f"({args.layout} layout)")
+    for stage in STAGES:
+        if stage in summary:
+            print(f"  {stage:<7} {summary[stage]['seconds'] * 1000:9.1f} ms  "
+                  f"{summary[stage]['rows_per_sec'] or 0:14,.0f} rows/s")
+        else:
+            print(f"  {stage:<7} skipped (pass --db-url postgresql://... to time it)")
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        compare_with_baseline(summary, args.baseline)
+
+if __name__ == "__main__":
+    main()
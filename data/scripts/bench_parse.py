@@ -0,0 +1,77 @@
+# data/scripts/bench_parse.py
+
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+import xarray as xr
+
+from ingest_argo import parse_argo_profile, decode_platform_number
+from synthetic_argo import write_synthetic_argo_file
+
+# --- Configuration ---
+DEFAULT_N_PROF = 300
+DEFAULT_N_LEVELS = 500
+DEFAULT_REPEATS = 5
+
+def parse_argo_profile_loop(file_path):
+    """The original per-profile parser, kept here as the benchmark baseline."""
+    with xr.open_dataset(file_path) as ds:
+        platform_number = decode_platform_number(ds.PLATFORM_NUMBER.values.flat[0])
+        num_profiles = ds.sizes['N_PROF']
+
+        profile_data = []
+        for i in range(num_profiles):
+            df_prof = pd.DataFrame({
+                'pressure': ds.PRES_ADJUSTED.values[i],
+                'temperature': ds.TEMP_ADJUSTED.values[i],
+                'salinity': ds.PSAL_ADJUSTED.values[i]
+            })
+            df_prof['platform_id'] = platform_number
+            df_prof['cycle_number'] = int(ds.CYCLE_NUMBER.values[i])
+            df_prof['timestamp'] = pd.to_datetime(ds.JULD.values[i])
+            df_prof['latitude'] = float(ds.LATITUDE.values[i])
+            df_prof['longitude'] = float(ds.LONGITUDE.values[i])
+            profile_data.append(df_prof)
+
+        final_df = pd.concat(profile_data, ignore_index=True)
+        final_df.dropna(subset=['pressure', 'temperature', 'salinity'], inplace=True)
+        return final_df
+
+def time_parser(parser, file_path, repeats):
+    """Returns the best wall time over `repeats` runs and the last result."""
+    best = float('inf')
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = parser(file_path)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the looped and vectorized Argo profile parsers.")
+    parser.add_argument("--n-prof", type=int, default=DEFAULT_N_PROF)
+    parser.add_argument("--n-levels", type=int, default=DEFAULT_N_LEVELS)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_synthetic_argo_file(os.path.join(tmp, "synthetic_prof.nc"), args.n_prof, args.n_levels)
+
+        loop_time, loop_df = time_parser(parse_argo_profile_loop, path, args.repeats)
+        vec_time, vec_df = time_parser(parse_argo_profile, path, args.repeats)
+
+    # Both parsers must produce the same rows before the timings mean anything.
+    pd.testing.assert_frame_equal(
+        loop_df.reset_index(drop=True), vec_df.reset_index(drop=True),
+        check_dtype=False,
+    )
+
+    print(f"File: {args.n_prof} profiles x {args.n_levels} levels -> {len(vec_df):,} rows")
+    print(f"  looped parser:     {loop_time * 1000:8.1f} ms")
+    print(f"  vectorized parser: {vec_time * 1000:8.1f} ms")
+    print(f"  speedup:           {loop_time / vec_time:8.1f}x")
+
+if __name__ == "__main__":
+    main()
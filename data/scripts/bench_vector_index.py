@@ -0,0 +1,124 @@
+# data/scripts/bench_vector_index.py
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+import faiss
+import numpy as np
+
+from vector_index import build_params, new_index, query_parameters
+
+# Recall@k and single-query throughput of the approximate index types in
+# vector_index.py against the exact flat index, sweeping the query-time
+# knob of each (HNSW efSearch, IVF nprobe). Queries are issued one at a time,
+# as VectorService.search does.
+
+# --- Configuration ---
+RESULTS_DIR = "data/benchmarks"
+DEFAULT_VECTORS = 50_000
+DEFAULT_QUERIES = 500
+DEFAULT_DIMENSION = 384  # all-MiniLM-L6-v2
+DEFAULT_CLUSTERS = 200
+DEFAULT_K = 10
+EF_SEARCH_SWEEP = (16, 32, 64, 128, 256)
+NPROBE_SWEEP = (1, 2, 4, 8, 16, 32, 64)
+
+def synthetic_embeddings(n, d, clusters, rng):
+    """Unit vectors scattered around `clusters` random centres, roughly like sentence embeddings."""
+    centres = rng.standard_normal((clusters, d)).astype('float32')
+    vectors = centres[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, d)).astype('float32')
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def index_embeddings(path):
+    """The vectors stored in an existing flat or HNSW index written by create_embeddings.py."""
+    index = faiss.read_index(path)
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    return inner.reconstruct_n(0, inner.ntotal)
+
+def run_queries(index, queries, k, params=None):
+    """Top-k ids per query and queries per second, one query per search call."""
+    labels = np.empty((len(queries), k), dtype='int64')
+    started = time.perf_counter()
+    for i in range(len(queries)):
+        labels[i] = index.search(queries[i:i + 1], k, params=params)[1][0]
+    return labels, len(queries) / (time.perf_counter() - started)
+
+def recall_at_k(labels, truth):
+    return float(np.mean([len(set(row) & set(expected)) / len(expected) for row, expected in zip(labels, truth)]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k and QPS of HNSW and IVF-Flat against the flat index.")
+    parser.add_argument("--vectors", type=int, default=DEFAULT_VECTORS, help="Synthetic vectors to index.")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--dimension", type=int, default=DEFAULT_DIMENSION)
+    parser.add_argument("--clusters", type=int, default=DEFAULT_CLUSTERS)
+    parser.add_argument("--from-index", help="Benchmark the vectors of this index instead of synthetic ones.")
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument("--hnsw-m", type=int)
+    parser.add_argument("--ef-construction", type=int)
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--threads", type=int, default=1,
+                        help="FAISS threads; 1 matches one API request per search.")
+    parser.add_argument("--output", help=f"Results file (default: {RESULTS_DIR}/vector-index-<timestamp>.json).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    rng = np.random.default_rng(args.seed)
+    if args.from_index:
+        vectors = index_embeddings(args.from_index)
+        # Queries are perturbed copies of indexed vectors.
+        sample = vectors[rng.integers(0, len(vectors), args.queries)]
+        queries = sample + 0.05 * rng.standard_normal(sample.shape).astype('float32')
+    else:
+        data = synthetic_embeddings(args.vectors + args.queries, args.dimension, args.clusters, rng)
+        vectors, queries = data[:args.vectors], data[args.vectors:]
+    vectors, queries = np.ascontiguousarray(vectors), np.ascontiguousarray(queries.astype('float32'))
+    ids = np.arange(len(vectors), dtype='int64')
+    print(f"{len(vectors):,} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    runs = []
+    truth = None
+    for index_type, knob, sweep in (('flat', None, (None,)), ('hnsw', 'ef_search', EF_SEARCH_SWEEP),
+                                    ('ivf', 'nprobe', NPROBE_SWEEP)):
+        params = build_params(index_type, len(vectors), args.hnsw_m, args.ef_construction, args.nlist)
+        started = time.perf_counter()
+        index = new_index(index_type, vectors, ids, params)
+        build_seconds = time.perf_counter() - started
+        print(f"\n{index_type} {params}: built in {build_seconds:.1f}s")
+
+        for value in sweep:
+            search = query_parameters(index_type, **({knob: value} if knob else {}))
+            labels, qps = run_queries(index, queries, args.k, search)
+            if truth is None:
+                truth = labels
+            recall = recall_at_k(labels, truth)
+            runs.append({
+                'index_type': index_type, 'build_params': params, 'build_seconds': round(build_seconds, 3),
+                'search_params': {knob: value} if knob else {}, 'recall_at_k': round(recall, 4), 'qps': round(qps, 1),
+            })
+            label = f"{knob}={value}" if knob else "exact"
+            print(f"  {label:<14} recall@{args.k} {recall:6.3f}   {qps:9.0f} queries/s")
+
+    created_at = datetime.now(timezone.utc)
+    results = {
+        'benchmark': 'vector-index',
+        'created_at': created_at.isoformat(),
+        'vectors': len(vectors),
+        'dimension': int(vectors.shape[1]),
+        'queries': len(queries),
+        'k': args.k,
+        'source': args.from_index or f"synthetic ({args.clusters} clusters, seed {args.seed})",
+        'threads': args.threads,
+        'runs': runs,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"vector-index-{created_at:%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# data/scripts/build_climatology.py
+
+import argparse
+import logging
+import time
+from sqlalchemy import create_engine
+
+from ingest_argo import DATABASE_URL
+from climatology import CLIMATOLOGY_DIR, current_version, rebuild_climatology, update_climatology
+
+# Builds or updates the gridded climatology cube (see climatology.py).
+# The first run builds it from argo_profiles; later runs only apply the
+# profile changes queued by ingests since the last run. The ingest daemon
+# applies them after every batch, so this is mainly for the first build and
+# for cron-driven setups.
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the lat/lon/depth/month climatology cube.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Recompute the cube from every profile instead of applying queued changes.")
+    parser.add_argument("--output-dir", default=CLIMATOLOGY_DIR)
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    started = time.perf_counter()
+    if args.rebuild or current_version(args.output_dir) is None:
+        rebuild_climatology(engine, args.output_dir)
+    else:
+        applied = update_climatology(engine, args.output_dir)
+        if not applied:
+            logging.info("No queued profile changes; the climatology is up to date.")
+    logging.info(f"🚀 Climatology done in {time.perf_counter() - started:.1f}s.")
+
+if __name__ == "__main__":
+    main()
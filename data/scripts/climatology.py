@@ -0,0 +1,349 @@
+# data/scripts/climatology.py
+
+import json
+import os
+import shutil
+import logging
+import numpy as np
+from sqlalchemy import text
+
+from standard_levels import STANDARD_PRESSURE_LEVELS
+
+# A month x standard level x lat x lon cube of running statistics (count, mean
+# and M2, the sum of squared deviations) for temperature and salinity, built
+# from the standard-level arrays in argo_profiles. Read by
+# backend/app/services/climatology_service.py.
+#
+# Storage: one level x lat x lon .npy slab per statistic and month, opened
+# with np.memmap, so a map slice (one month and level) is a single contiguous
+# lat x lon block. Each update writes a new version directory and then points
+# CURRENT at it, so readers never see a half-applied update:
+#
+#   <CLIMATOLOGY_DIR>/CURRENT       -> "v000042"
+#   <CLIMATOLOGY_DIR>/v000042/meta.json, count_temperature_m01.npy, ...
+#
+# A new version only copies the slabs of the months its profiles fall in; the
+# others are hard links to the previous version's files, which are never
+# written to again once published.
+#
+# Updates are incremental. Once a cube exists, merge_staged_profiles (in
+# ingest_argo.py) queues the standard-level arrays of every profile it
+# replaces (sign -1) and writes (sign +1) in climatology_queue, and
+# update_climatology folds the queue into the cube with Chan et al.'s
+# pairwise update, so statistics never have to be recomputed from scratch.
+
+CLIMATOLOGY_DIR = os.getenv("ARGO_CLIMATOLOGY_DIR", "data/processed/climatology")
+CLIMATOLOGY_GRID_DEGREES = float(os.getenv("ARGO_CLIMATOLOGY_GRID_DEGREES", "2"))
+CLIMATOLOGY_VARIABLES = {'temperature': 'temperature_std', 'salinity': 'salinity_std'}
+CLIMATOLOGY_STATS = {'count': 'int32', 'mean': 'float64', 'm2': 'float64'}
+N_MONTHS = 12
+
+# Profiles read from Postgres per batch.
+CLIMATOLOGY_BATCH_PROFILES = 20_000
+
+CLIMATOLOGY_QUEUE_DDL = """
+    CREATE TABLE IF NOT EXISTS climatology_queue (
+        id BIGSERIAL PRIMARY KEY,
+        sign SMALLINT NOT NULL,
+        profile_time TIMESTAMPTZ NOT NULL,
+        latitude DOUBLE PRECISION NOT NULL,
+        longitude DOUBLE PRECISION NOT NULL,
+        temperature_std REAL[],
+        salinity_std REAL[]
+    )
+"""
+
+# Month of year and grid inputs of a profile; argo_profiles and
+# climatology_queue share these column names.
+_PROFILE_FIELDS = """
+    EXTRACT(MONTH FROM profile_time AT TIME ZONE 'UTC')::int AS month,
+    latitude, longitude, temperature_std, salinity_std
+"""
+
+# --- Queue (called from the ingest merge) ---
+def climatology_queue_exists(connection):
+    """The queue is only kept once a cube has been built, so nothing piles up unread."""
+    return bool(connection.execute(text("SELECT to_regclass('climatology_queue')")).scalar())
+
+def queue_climatology_changes(connection, profile_keys_sql, sign):
+    """Queues the standard-level arrays of the profiles keyed by `profile_keys_sql`."""
+    connection.execute(text(f"""
+        INSERT INTO climatology_queue (sign, profile_time, latitude, longitude, temperature_std, salinity_std)
+        SELECT {int(sign)}, p.profile_time, p.latitude, p.longitude, p.temperature_std, p.salinity_std
+        FROM argo_profiles p
+        JOIN ({profile_keys_sql}) k USING (float_id, cycle_number)
+        WHERE p.temperature_std IS NOT NULL OR p.salinity_std IS NOT NULL
+    """))
+
+# --- The cube ---
+def grid_shape(degrees=CLIMATOLOGY_GRID_DEGREES, levels=STANDARD_PRESSURE_LEVELS):
+    return (N_MONTHS, len(levels), int(round(180 / degrees)), int(round(360 / degrees)))
+
+MONTHS = range(1, N_MONTHS + 1)
+
+def _array_path(directory, variable, stat, month):
+    return os.path.join(directory, f"{stat}_{variable}_m{month:02d}.npy")
+
+def _slab_names(months=MONTHS):
+    return [os.path.basename(_array_path('', variable, stat, month))
+            for month in months for variable in CLIMATOLOGY_VARIABLES for stat in CLIMATOLOGY_STATS]
+
+def create_cube(directory, degrees=CLIMATOLOGY_GRID_DEGREES, levels=STANDARD_PRESSURE_LEVELS):
+    """Writes an empty cube (all counts zero) into `directory`."""
+    os.makedirs(directory)
+    shape = grid_shape(degrees, levels)
+    for month in MONTHS:
+        for variable in CLIMATOLOGY_VARIABLES:
+            for stat, dtype in CLIMATOLOGY_STATS.items():
+                array = np.lib.format.open_memmap(_array_path(directory, variable, stat, month), mode='w+',
+                                                  dtype=dtype, shape=shape[1:])
+                array[:] = 0
+                array.flush()
+    meta = {
+        'grid_degrees': degrees,
+        'shape': list(shape),
+        'levels_dbar': [float(level) for level in levels],
+        'variables': list(CLIMATOLOGY_VARIABLES),
+        'queue_id': 0,
+        'profiles': 0,
+    }
+    write_meta(directory, meta)
+    return meta
+
+def read_meta(directory):
+    with open(os.path.join(directory, 'meta.json')) as f:
+        return json.load(f)
+
+def write_meta(directory, meta):
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+def open_cube(directory, mode='r+', months=MONTHS):
+    """{variable: {month: {stat: memmap}}} for `months` of a cube directory."""
+    return {
+        variable: {month: {stat: np.load(_array_path(directory, variable, stat, month), mmap_mode=mode)
+                           for stat in CLIMATOLOGY_STATS}
+                   for month in months}
+        for variable in CLIMATOLOGY_VARIABLES
+    }
+
+def copy_version(source, directory, months):
+    """
+    Starts a new version from `source`: the slabs of `months`, which are about
+    to be rewritten, are copied, and every other file is hard-linked (copied
+    where the filesystem has no hard links).
+    """
+    os.makedirs(directory)
+    rewritten = set(_slab_names(months))
+    for name in _slab_names():
+        old_path, new_path = os.path.join(source, name), os.path.join(directory, name)
+        if name in rewritten:
+            shutil.copyfile(old_path, new_path)
+            continue
+        try:
+            os.link(old_path, new_path)
+        except OSError:
+            shutil.copyfile(old_path, new_path)
+
+def current_version(base_dir=CLIMATOLOGY_DIR):
+    """Directory of the published cube, or None before the first build."""
+    try:
+        with open(os.path.join(base_dir, 'CURRENT')) as f:
+            return os.path.join(base_dir, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+def publish_version(base_dir, directory):
+    """Points CURRENT at `directory` atomically and removes the older versions."""
+    pointer = os.path.join(base_dir, 'CURRENT.tmp')
+    with open(pointer, 'w') as f:
+        f.write(os.path.basename(directory))
+    os.replace(pointer, os.path.join(base_dir, 'CURRENT'))
+    for name in os.listdir(base_dir):
+        path = os.path.join(base_dir, name)
+        if name.startswith('v') and os.path.isdir(path) and path != directory:
+            # Readers that still have the old files mapped keep working off the unlinked inodes.
+            shutil.rmtree(path, ignore_errors=True)
+
+def _next_version(base_dir):
+    versions = [int(name[1:]) for name in os.listdir(base_dir) if name.startswith('v') and name[1:].isdigit()]
+    return os.path.join(base_dir, f"v{max(versions, default=0) + 1:06d}")
+
+# --- Running statistics ---
+def cell_indices(meta, months, latitudes, longitudes):
+    """Month index and (lat, lon) grid cell of each profile."""
+    _, _, n_lat, n_lon = meta['shape']
+    degrees = meta['grid_degrees']
+    lat_i = np.clip(((np.asarray(latitudes, dtype='float64') + 90) // degrees).astype('int64'), 0, n_lat - 1)
+    lon_j = np.clip(((np.asarray(longitudes, dtype='float64') + 180) // degrees).astype('int64'), 0, n_lon - 1)
+    return np.asarray(months, dtype='int64') - 1, lat_i, lon_j
+
+def profile_cells(stats, month_i, lat_i, lon_j):
+    """
+    {stat: n_profiles x n_levels array} of one variable's statistics
+    ({month: {stat: slab}}, as open_cube returns) in the cell each profile
+    falls in, at every level.
+    """
+    out = {}
+    for month in np.unique(month_i):
+        in_month = month_i == month
+        slab = stats[int(month) + 1]
+        n_levels = slab['count'].shape[0]
+        cell = (np.arange(n_levels)[None, :], lat_i[in_month][:, None], lon_j[in_month][:, None])
+        for stat, array in slab.items():
+            if stat not in out:
+                out[stat] = np.zeros((len(month_i), n_levels), dtype=array.dtype)
+            out[stat][in_month] = array[cell]
+    return out
+
+def batch_statistics(cells, values):
+    """Per-cell (cells, n, mean, M2) of `values` grouped by flat cell index, two-pass for stability."""
+    unique, inverse = np.unique(cells, return_inverse=True)
+    n = np.bincount(inverse, minlength=len(unique)).astype('float64')
+    mean = np.bincount(inverse, weights=values, minlength=len(unique)) / n
+    m2 = np.bincount(inverse, weights=(values - mean[inverse]) ** 2, minlength=len(unique))
+    return unique, n, mean, m2
+
+def merge_statistics(stats, cells, n_b, mean_b, m2_b, sign=1):
+    """
+    Folds a batch's per-cell statistics into a slab's flat arrays in place:
+    sign=1 adds the batch (Chan et al.'s pairwise combination), sign=-1 takes
+    a previously added batch back out.
+    """
+    count, mean, m2 = (stats[s].reshape(-1) for s in ('count', 'mean', 'm2'))
+    n_a = count[cells].astype('float64')
+    mean_a = mean[cells]
+    m2_a = m2[cells]
+
+    if sign > 0:
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        new_mean = mean_a + delta * n_b / n
+        new_m2 = m2_a + m2_b + delta ** 2 * n_a * n_b / n
+    else:
+        n = n_a - n_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            new_mean = (n_a * mean_a - n_b * mean_b) / n
+            delta = mean_b - new_mean
+            new_m2 = m2_a - m2_b - delta ** 2 * n * n_b / n_a
+        empty = n <= 0
+        n = np.where(empty, 0, n)
+        new_mean = np.where(empty, 0.0, new_mean)
+        new_m2 = np.where(empty, 0.0, np.maximum(new_m2, 0.0))
+
+    count[cells] = n.astype(count.dtype)
+    mean[cells] = new_mean
+    m2[cells] = new_m2
+
+def apply_profiles(meta, cube, rows, sign=1):
+    """Adds (or removes) the standard-level values of profile rows to the cube."""
+    if not rows:
+        return
+    _, n_levels, n_lat, n_lon = meta['shape']
+    month_i, lat_i, lon_j = cell_indices(meta, [r.month for r in rows],
+                                         [r.latitude for r in rows], [r.longitude for r in rows])
+    # Flat index of (level, lat, lon) within its month's slab for every profile x level.
+    level = np.arange(n_levels)
+    cells = (level[None, :] * n_lat + lat_i[:, None]) * n_lon + lon_j[:, None]
+
+    for variable, column in CLIMATOLOGY_VARIABLES.items():
+        values = np.array([getattr(r, column) or [np.nan] * n_levels for r in rows], dtype='float64')
+        present = np.isfinite(values)
+        for month in np.unique(month_i[present.any(axis=1)]):
+            in_month = present & (month_i == month)[:, None]
+            merge_statistics(cube[variable][int(month) + 1],
+                             *batch_statistics(cells[in_month], values[in_month]), sign=sign)
+
+# --- Jobs ---
+def ensure_climatology_queue(engine):
+    with engine.begin() as connection:
+        connection.execute(text(CLIMATOLOGY_QUEUE_DDL))
+
+def _flush(cube):
+    for months in cube.values():
+        for stats in months.values():
+            for array in stats.values():
+                array.flush()
+
+def rebuild_climatology(engine, base_dir=CLIMATOLOGY_DIR, batch_profiles=CLIMATOLOGY_BATCH_PROFILES):
+    """
+    Builds the cube from every profile in argo_profiles and publishes it.
+
+    The profiles are read in one REPEATABLE READ snapshot taken while the
+    queue is locked, so every queued change is either in that snapshot (and
+    dropped from the queue) or queued after it (and applied by the next
+    update). Ingest merges wait for the lock while the profiles are read.
+    """
+    ensure_climatology_queue(engine)
+    os.makedirs(base_dir, exist_ok=True)
+    directory = _next_version(base_dir)
+    meta = create_cube(directory)
+    cube = open_cube(directory)
+
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level='REPEATABLE READ')
+        with connection.begin():
+            connection.execute(text("LOCK TABLE climatology_queue IN EXCLUSIVE MODE"))
+            meta['queue_id'] = connection.execute(text("SELECT COALESCE(MAX(id), 0) FROM climatology_queue")).scalar()
+            result = connection.execution_options(stream_results=True, yield_per=batch_profiles).execute(text(f"""
+                SELECT {_PROFILE_FIELDS}
+                FROM argo_profiles
+                WHERE temperature_std IS NOT NULL OR salinity_std IS NOT NULL
+            """))
+            for rows in result.partitions():
+                apply_profiles(meta, cube, rows)
+                meta['profiles'] += len(rows)
+                logging.info(f"Binned {meta['profiles']:,} profiles into the climatology...")
+
+    _flush(cube)
+    write_meta(directory, meta)
+    publish_version(base_dir, directory)
+    _trim_queue(engine, meta['queue_id'])
+    logging.info(f"✅ Climatology rebuilt from {meta['profiles']:,} profiles ({directory}).")
+    return meta
+
+def update_climatology(engine, base_dir=CLIMATOLOGY_DIR):
+    """
+    Folds the queued profile changes into a new version of the cube and
+    publishes it. Only the months the changes fall in are copied and
+    rewritten; see copy_version. Returns the number of queued rows applied; None if there is
+    no cube yet (run a rebuild first).
+    """
+    source = current_version(base_dir)
+    if source is None:
+        return None
+    meta = read_meta(source)
+
+    with engine.begin() as connection:
+        # Waits for in-flight merges, so no lower queue id can commit after this read.
+        connection.execute(text("LOCK TABLE climatology_queue IN EXCLUSIVE MODE"))
+        rows = connection.execute(text(f"""
+            SELECT id, sign, {_PROFILE_FIELDS}
+            FROM climatology_queue
+            WHERE id > :queue_id
+            ORDER BY id
+        """), {'queue_id': meta['queue_id']}).fetchall()
+    if not rows:
+        return 0
+
+    months = sorted({r.month for r in rows})
+    directory = _next_version(base_dir)
+    copy_version(source, directory, months)
+    cube = open_cube(directory, months=months)
+    # Removals only ever take back values added earlier, so adding first keeps every count >= 0.
+    apply_profiles(meta, cube, [r for r in rows if r.sign > 0], sign=1)
+    apply_profiles(meta, cube, [r for r in rows if r.sign < 0], sign=-1)
+    _flush(cube)
+
+    meta['queue_id'] = rows[-1].id
+    meta['profiles'] += sum(r.sign for r in rows)
+    write_meta(directory, meta)
+    publish_version(base_dir, directory)
+    _trim_queue(engine, meta['queue_id'])
+    logging.info(f"✅ Applied {len(rows):,} queued profile changes to the climatology.")
+    return len(rows)
+
+def _trim_queue(engine, queue_id):
+    """Drops the queue rows already folded into the published cube."""
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM climatology_queue WHERE id <= :id"), {'id': queue_id})
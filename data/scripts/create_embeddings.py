@@ -1,13 +1,20 @@
 # data/scripts/create_embeddings.py
 
+import argparse
+import hashlib
+import json
 import logging
 import pandas as pd
-from sqlalchemy import create_engine
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine, text
 from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
 import os
 
+from vector_index import (INDEX_TYPES, DEFAULT_INDEX_TYPE, build_params, search_params,
+                          new_index, remove_ids)
+
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -28,42 +35,214 @@ DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NA
 EMBEDDING_MODEL = 'all-MiniLM-L6-v2' # A fast and effective model
 EMBEDDINGS_DIR = "data/embeddings/"
 FAISS_INDEX_PATH = os.path.join(EMBEDDINGS_DIR, "argo_float_index.faiss")
+# Positional index -> platform_id mapping of indexes built before they were
+# ID-mapped; removed once the index is rebuilt keyed on platform_id.
+ID_MAPPING_PATH = os.path.join(EMBEDDINGS_DIR, "index_to_id_mapping.csv")
+# platform_id -> hash of the document last embedded for it, so incremental
+# runs only re-encode floats whose document changed.
+DOCUMENT_STATE_PATH = os.path.join(EMBEDDINGS_DIR, "index_documents.csv")
+# Model, index type, build and default query parameters, and the watermark.
+INDEX_META_PATH = os.path.join(EMBEDDINGS_DIR, "argo_float_index.json")
+# Index type for new indexes (see vector_index.py); --index-type overrides it.
+INDEX_TYPE = os.getenv("ARGO_EMBEDDING_INDEX", DEFAULT_INDEX_TYPE)
+# Incremental runs re-read floats updated up to this long before the last
+# watermark: argo_float_latest.updated_at is the ingest transaction's start
+# time, so a long ingest can commit rows older than a watermark already taken.
+# Unchanged documents among them are skipped by their hash.
+WATERMARK_OVERLAP = timedelta(minutes=10)
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] - %(message)s")
 
-def create_documents_from_db(engine):
+def document_text(platform_id, latitude, longitude):
+    return (
+        f"ARGO float with platform ID {platform_id}. "
+        f"Last known position at latitude {latitude:.2f}, longitude {longitude:.2f}."
+    )
+
+def document_hash(content):
+    return hashlib.sha1(content.encode()).hexdigest()[:16]
+
+def create_documents_from_db(engine, since=None):
     """
-    Fetches ARGO float metadata from the DB and creates descriptive text documents.
+    Creates a descriptive text document per float from its latest position in
+    argo_float_latest (kept current by the ingest), optionally only for floats
+    updated since `since`. Returns the documents and the newest updated_at
+    read (None when no float was read).
     """
-    logging.info("Fetching unique float data from the database...")
-    # This query gets the latest location for each float to make the document relevant
+    logging.info("Fetching float data from the database..." if since is None
+                 else f"Fetching floats updated since {since.isoformat()}...")
     query = """
-    SELECT DISTINCT ON (platform_id)
-        platform_id,
-        latitude,
-        longitude
-    FROM argo_profiles
-    ORDER BY platform_id, timestamp DESC;
+    SELECT float_id AS platform_id, latitude, longitude, updated_at
+    FROM argo_float_latest
     """
-    df = pd.read_sql(query, engine)
-    
+    params = {}
+    if since is not None:
+        query += " WHERE updated_at >= :since"
+        params['since'] = since
+    df = pd.read_sql(text(query), engine, params=params)
+
     documents = []
-    for _, row in df.iterrows():
-        doc_text = (
-            f"ARGO float with platform ID {row['platform_id']}. "
-            f"Last known position at latitude {row['latitude']:.2f}, longitude {row['longitude']:.2f}."
-        )
+    for row in df.itertuples(index=False):
+        content = document_text(row.platform_id, row.latitude, row.longitude)
         documents.append({
-            "platform_id": row['platform_id'],
-            "content": doc_text
+            "platform_id": int(row.platform_id),
+            "content": content,
+            "hash": document_hash(content),
         })
-    logging.info(f"Created {len(documents)} documents for embedding.")
-    return documents
+    watermark = pd.to_datetime(df['updated_at'].max(), utc=True).to_pydatetime() if len(df) else None
+    logging.info(f"Created {len(documents)} documents.")
+    return documents, watermark
+
+def encode(model, documents):
+    # FAISS requires embeddings to be float32
+    embeddings = model.encode([doc['content'] for doc in documents], show_progress_bar=len(documents) > 1000)
+    return np.ascontiguousarray(np.array(embeddings).astype('float32'))
+
+def load_index_state():
+    """
+    The ID-mapped index, its document hashes and metadata, or None when there
+    is no index yet, or only a positional one from before ID mapping.
+    """
+    if not all(os.path.exists(p) for p in (FAISS_INDEX_PATH, DOCUMENT_STATE_PATH, INDEX_META_PATH)):
+        return None
+    with open(INDEX_META_PATH) as f:
+        meta = json.load(f)
+    if not meta.get('id_mapped') or meta.get('model') != EMBEDDING_MODEL:
+        return None
+    # Indexes written before the type was configurable are flat.
+    meta.setdefault('index_type', 'flat')
+    meta.setdefault('build_params', {})
+    meta.setdefault('search_params', {})
+    index = faiss.read_index(FAISS_INDEX_PATH)
+    state = pd.read_csv(DOCUMENT_STATE_PATH, dtype={'platform_id': 'int64', 'doc_hash': 'str'})
+    return index, dict(zip(state['platform_id'], state['doc_hash'])), meta
+
+def _write_atomically(path, write):
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def save_index_meta(index, spec, watermark):
+    meta = {
+        'model': EMBEDDING_MODEL,
+        'dimension': index.d,
+        'id_mapped': True,
+        'index_type': spec['index_type'],
+        'build_params': spec['build_params'],
+        'search_params': spec['search_params'],
+        'count': int(index.ntotal),
+        'watermark': watermark.isoformat() if watermark is not None else None,
+        'updated_at': datetime.now(timezone.utc).isoformat(),
+    }
+    def write_meta(path):
+        with open(path, 'w') as f:
+            json.dump(meta, f, indent=2)
+    _write_atomically(INDEX_META_PATH, write_meta)
+
+def save_index_state(index, hashes, spec, watermark):
+    """
+    Persists the index, then the document hashes, then the metadata, each
+    through a temp file and a rename, so a reader never sees a partial file.
+    A crash between the renames leaves hashes older than the index, which
+    only makes the next run re-embed (and replace) those floats.
+    """
+    _write_atomically(FAISS_INDEX_PATH, lambda path: faiss.write_index(index, path))
+    state = pd.DataFrame({'platform_id': list(hashes.keys()), 'doc_hash': list(hashes.values())})
+    _write_atomically(DOCUMENT_STATE_PATH, lambda path: state.to_csv(path, index=False))
+    save_index_meta(index, spec, watermark)
+    if os.path.exists(ID_MAPPING_PATH):
+        os.remove(ID_MAPPING_PATH)
+        logging.info(f"Removed the positional ID mapping {ID_MAPPING_PATH}; the index is keyed on platform_id.")
+
+def rebuild_index(engine, model, index_type, options):
+    """
+    Embeds every float into a new index of `index_type` keyed on platform_id.
+    `options` holds any build or query parameters given on the command line.
+    """
+    documents, watermark = create_documents_from_db(engine)
+    if not documents:
+        logging.warning("⚠️ No documents found to embed. Exiting.")
+        return
+    logging.info("Generating embeddings... (This may take a while)")
+    embeddings = encode(model, documents)
+    spec = {
+        'index_type': index_type,
+        'build_params': build_params(index_type, len(documents), options['m'],
+                                     options['ef_construction'], options['nlist']),
+        'search_params': search_params(index_type, options['ef_search'], options['nprobe']),
+    }
+    logging.info(f"Building a {index_type} index {spec['build_params']}...")
+    index = new_index(index_type, embeddings, np.array([doc['platform_id'] for doc in documents], dtype='int64'),
+                      spec['build_params'])
+    save_index_state(index, {doc['platform_id']: doc['hash'] for doc in documents}, spec, watermark)
+    logging.info(f"✅ Indexed {index.ntotal} floats.")
+
+def update_index(engine, model, index, hashes, meta, options=None):
+    """
+    Re-embeds only the floats whose document changed since the last run and
+    drops floats no longer in the database. The work follows the number of
+    changed floats; only the final index write is proportional to its size.
+    """
+    spec = {key: meta[key] for key in ('index_type', 'build_params', 'search_params')}
+    if options and (options['ef_search'] or options['nprobe']):
+        spec['search_params'] = search_params(
+            spec['index_type'],
+            options['ef_search'] or spec['search_params'].get('ef_search'),
+            options['nprobe'] or spec['search_params'].get('nprobe'),
+        )
+    previous = datetime.fromisoformat(meta['watermark']) if meta.get('watermark') else None
+    documents, watermark = create_documents_from_db(
+        engine, since=previous - WATERMARK_OVERLAP if previous is not None else None)
+    watermark = max(filter(None, (watermark, previous)), default=None)
+    changed = [doc for doc in documents if hashes.get(doc['platform_id']) != doc['hash']]
+
+    # Floats only disappear when profiles are deleted, e.g. by a reprocess.
+    with engine.connect() as connection:
+        float_count = connection.execute(text("SELECT COUNT(*) FROM argo_float_latest")).scalar()
+    stale = []
+    if float_count < len(hashes) + sum(1 for doc in changed if doc['platform_id'] not in hashes):
+        with engine.connect() as connection:
+            current = {row[0] for row in connection.execute(text("SELECT float_id FROM argo_float_latest"))}
+        stale = [platform_id for platform_id in hashes if platform_id not in current]
+
+    if not changed and not stale:
+        logging.info("No new or changed floats; the index is up to date.")
+        if watermark != previous or spec['search_params'] != meta['search_params']:
+            save_index_meta(index, spec, watermark)
+        return
+
+    replaced = [doc['platform_id'] for doc in changed if doc['platform_id'] in hashes]
+    index = remove_ids(index, spec['index_type'], replaced + stale, spec['build_params'])
+    for platform_id in stale:
+        del hashes[platform_id]
+
+    if changed:
+        logging.info(f"Embedding {len(changed)} new or changed floats...")
+        index.add_with_ids(encode(model, changed), np.array([doc['platform_id'] for doc in changed], dtype='int64'))
+        hashes.update((doc['platform_id'], doc['hash']) for doc in changed)
+
+    save_index_state(index, hashes, spec, watermark)
+    logging.info(f"✅ Added {len(changed) - len(replaced)}, replaced {len(replaced)} and removed "
+                 f"{len(stale)} floats; the index holds {index.ntotal}.")
 
 def main():
     """
-    Main function to generate and save embeddings and the FAISS index.
+    Main function to generate or update the embeddings and the FAISS index.
     """
+    parser = argparse.ArgumentParser(description="Embed ARGO floats into the FAISS search index.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Re-embed every float instead of only the new or changed ones.")
+    parser.add_argument("--index-type", choices=INDEX_TYPES,
+                        help=f"Index to build (default: the existing index's type, else {INDEX_TYPE}). "
+                             "Changing it rebuilds the index.")
+    parser.add_argument("--hnsw-m", dest="m", type=int, help="HNSW graph degree; rebuilds the index.")
+    parser.add_argument("--ef-construction", type=int, help="HNSW build beam width; rebuilds the index.")
+    parser.add_argument("--nlist", type=int, help="IVF list count (default about 4*sqrt(n)); rebuilds the index.")
+    parser.add_argument("--ef-search", type=int, help="Default HNSW query beam width stored with the index.")
+    parser.add_argument("--nprobe", type=int, help="Default IVF lists probed per query stored with the index.")
+    args = parser.parse_args()
+    options = {name: getattr(args, name) for name in ('m', 'ef_construction', 'nlist', 'ef_search', 'nprobe')}
+
     logging.info("🚀 Starting embedding generation process...")
     os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
     
@@ -74,38 +253,21 @@ def main():
         logging.error(f"❌ Database connection failed: {e}")
         return
 
-    documents = create_documents_from_db(engine)
-    if not documents:
-        logging.warning("⚠️ No documents found to embed. Exiting.")
-        return
-        
-    content_to_embed = [doc['content'] for doc in documents]
-    
     logging.info(f"Loading sentence transformer model: {EMBEDDING_MODEL}")
     model = SentenceTransformer(EMBEDDING_MODEL)
-    
-    logging.info("Generating embeddings... (This may take a while)")
-    embeddings = model.encode(content_to_embed, show_progress_bar=True)
-    
-    # FAISS requires embeddings to be float32
-    embeddings = np.array(embeddings).astype('float32')
-    
-    # Create the FAISS index
-    d = embeddings.shape[1]  # Dimension of embeddings
-    index = faiss.IndexFlatL2(d) # Using L2 distance for similarity
-    index.add(embeddings)
-    
-    logging.info(f"Saving FAISS index to {FAISS_INDEX_PATH}")
-    faiss.write_index(index, FAISS_INDEX_PATH)
-    
-    # We also need to save the mapping from index position to platform_id
-    platform_ids = [doc['platform_id'] for doc in documents]
-    pd.DataFrame(platform_ids, columns=['platform_id']).to_csv(
-        os.path.join(EMBEDDINGS_DIR, "index_to_id_mapping.csv"), 
-        index=False
-    )
+
+    state = None if args.rebuild else load_index_state()
+    index_type = args.index_type or (state[2]['index_type'] if state else INDEX_TYPE)
+    if state is not None and (index_type != state[2]['index_type']
+                              or any(options[name] for name in ('m', 'ef_construction', 'nlist'))):
+        logging.info("Index type or build parameters changed; rebuilding the index.")
+        state = None
+    if state is None:
+        rebuild_index(engine, model, index_type, options)
+    else:
+        update_index(engine, model, *state, options=options)
 
     logging.info("✅ Embedding generation and indexing complete! 🚀")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,28 @@
+# data/scripts/export_parquet.py
+
+import argparse
+import logging
+import time
+from sqlalchemy import create_engine
+
+from ingest_argo import DATABASE_URL, DEFAULT_LAYOUT, LAYOUTS, PARQUET_DIR, export_parquet_store
+
+# Rewrites the Parquet store (see write_parquet_partitions) from the rows in
+# Postgres and marks it complete, which is what lets the API read from it.
+# Ingests run this themselves when the marker is missing; run it by hand
+# after restoring a database or once migrate_profiles.py has run.
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the database's profiles to the Parquet store.")
+    parser.add_argument("--parquet-dir", default=PARQUET_DIR)
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default=DEFAULT_LAYOUT,
+                        help="Table to export: argo_profiles (profile) or argo_levels (level).")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    started = time.perf_counter()
+    export_parquet_store(engine, args.parquet_dir, args.layout)
+    logging.info(f"🚀 Parquet export done in {time.perf_counter() - started:.1f}s.")
+
+if __name__ == "__main__":
+    main()
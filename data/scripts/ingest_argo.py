@@ -1,15 +1,183 @@
 import os
+import io
+import glob
+import hashlib
+import json
+import shutil
+import time
+import argparse
 import logging
+from collections import namedtuple
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import xarray as xr
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 
+from alerts import detect_profile_alerts, detect_stalled_floats, ensure_alerts
+from argo_stats import add_float_count, add_profile_stats, ensure_argo_stats, rebuild_argo_stats
+from climatology import climatology_queue_exists, queue_climatology_changes
+from standard_levels import ensure_standard_levels, interpolate_to_levels
+from ts_summary import add_ts_histogram, ensure_ts_summary, rebuild_ts_summary, refresh_ts_sample
+
 # --- Configuration ---
 load_dotenv()
 
-DOWNLOAD_DIR = "data/sample_argo/"
-PROCESSED_LOG = "data/processed_files.log"
+DOWNLOAD_DIR = os.getenv("ARGO_DATA_DIR", "data/sample_argo/")
+
+# Columnar copy of every level row, partitioned by platform and month, for the
+# aggregate endpoints (see backend/app/services/analytics_store.py).
+PARQUET_DIR = os.getenv("ARGO_PARQUET_DIR", "data/processed/argo_levels")
+# One file per profile, hive-partitioned as platform_id=<id>/month=<YYYY-MM>/,
+# so a re-ingested cycle replaces its levels.
+PARQUET_CYCLE_FILE = "cycle-{cycle}.parquet"
+# Written by export_parquet_store once the store holds every profile in the
+# database. The API only reads the store while it exists; the leading
+# underscore keeps it out of dataset discovery.
+PARQUET_COMPLETE_MARKER = "_EXPORTED"
+# Profiles read from Postgres per batch when exporting.
+PARQUET_EXPORT_BATCH_PROFILES = 5000
+
+# Parsed files waiting for the writer, on top of the ones being parsed.
+# Keeps memory bounded when Postgres is slower than the parse workers.
+DEFAULT_QUEUE_SIZE = 4
+
+# --- QC Policy ---
+# Levels are kept only when the *_ADJUSTED_QC flags of pressure, temperature
+# and salinity are all in this list (1 = good, 2 = probably good). "all" keeps
+# every level that has values, as the parser did before QC filtering.
+DEFAULT_QC_KEEP = os.getenv("ARGO_QC_KEEP", "1,2")
+QC_VARIABLES = {
+    'pressure_qc': 'PRES_ADJUSTED_QC',
+    'temperature_qc': 'TEMP_ADJUSTED_QC',
+    'salinity_qc': 'PSAL_ADJUSTED_QC',
+}
+
+# --- Table Layouts ---
+# 'profile' (default) stores one row per profile with REAL[] arrays and a
+# PostGIS point, matching backend/app/models/argo.py:ArgoProfile.
+# 'level' is the original one-row-per-depth-level layout, now in argo_levels.
+DEFAULT_LAYOUT = 'profile'
+
+PROFILE_COLUMNS = ['float_id', 'cycle_number', 'profile_time', 'latitude', 'longitude',
+                   'pressure_dbar', 'temperature_celsius', 'salinity_psu',
+                   'temperature_std', 'salinity_std']
+# The *_std columns hold each profile interpolated onto the standard pressure
+# levels (see standard_levels.py); they are added by ensure_standard_levels.
+PROFILE_ARRAY_COLUMNS = ['pressure_dbar', 'temperature_celsius', 'salinity_psu',
+                         'temperature_std', 'salinity_std']
+PROFILE_KEY = ['float_id', 'cycle_number']
+
+PROFILE_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS argo_profiles (
+        id SERIAL PRIMARY KEY,
+        float_id INTEGER NOT NULL,
+        cycle_number INTEGER NOT NULL,
+        profile_time TIMESTAMPTZ NOT NULL,
+        latitude DOUBLE PRECISION NOT NULL,
+        longitude DOUBLE PRECISION NOT NULL,
+        pressure_dbar REAL[],
+        temperature_celsius REAL[],
+        salinity_psu REAL[],
+        geom geometry(POINT, 4326),
+        CONSTRAINT argo_profiles_float_cycle_key UNIQUE (float_id, cycle_number)
+    );
+    CREATE INDEX IF NOT EXISTS idx_argo_profiles_geom ON argo_profiles USING GIST (geom);
+    CREATE INDEX IF NOT EXISTS idx_argo_profiles_profile_time ON argo_profiles (profile_time);
+    CREATE INDEX IF NOT EXISTS idx_argo_profiles_float_time ON argo_profiles (float_id, profile_time, cycle_number);
+"""
+
+# Latest profile and profile count per float, kept current by the profile
+# merge so /argo/locations and the dashboard never scan argo_profiles.
+FLOAT_LATEST_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS argo_float_latest (
+        float_id INTEGER PRIMARY KEY,
+        cycle_number INTEGER NOT NULL,
+        profile_time TIMESTAMPTZ NOT NULL,
+        latitude DOUBLE PRECISION NOT NULL,
+        longitude DOUBLE PRECISION NOT NULL,
+        profile_count INTEGER NOT NULL,
+        geom geometry(POINT, 4326),
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    CREATE INDEX IF NOT EXISTS idx_argo_float_latest_geom ON argo_float_latest USING GIST (geom);
+"""
+
+PROFILE_STAGING_DDL = """
+    CREATE TEMP TABLE argo_profiles_staging (
+        float_id INTEGER,
+        cycle_number INTEGER,
+        profile_time TIMESTAMPTZ,
+        latitude DOUBLE PRECISION,
+        longitude DOUBLE PRECISION,
+        pressure_dbar REAL[],
+        temperature_celsius REAL[],
+        salinity_psu REAL[],
+        temperature_std REAL[],
+        salinity_std REAL[]
+    ) ON COMMIT DROP
+"""
+
+# Column order used for COPY. Types match what DataFrame.to_sql creates for the
+# parsed frame, so both loaders can write into the same table.
+LEVEL_COLUMNS = ['pressure', 'temperature', 'salinity', 'platform_id',
+                 'cycle_number', 'timestamp', 'latitude', 'longitude']
+LEVEL_KEY = ['platform_id', 'cycle_number', 'pressure']
+
+LEVEL_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS argo_levels (
+        pressure REAL,
+        temperature REAL,
+        salinity REAL,
+        platform_id TEXT,
+        cycle_number BIGINT,
+        "timestamp" TIMESTAMP WITHOUT TIME ZONE,
+        latitude DOUBLE PRECISION,
+        longitude DOUBLE PRECISION
+    );
+"""
+
+LEVEL_STAGING_DDL = "CREATE TEMP TABLE argo_levels_staging (LIKE argo_levels) ON COMMIT DROP"
+
+LEVEL_KEY_INDEX = "argo_levels_level_key"
+
+# One row per source file. A file is re-ingested only when its size or mtime
+# change *and* its content hash no longer matches.
+MANIFEST_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS ingest_manifest (
+        filename TEXT PRIMARY KEY,
+        file_hash TEXT NOT NULL,
+        file_size BIGINT NOT NULL,
+        file_mtime_ns BIGINT NOT NULL,
+        row_count INTEGER NOT NULL,
+        profile_count INTEGER NOT NULL,
+        ingested_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    ALTER TABLE ingest_manifest ADD COLUMN IF NOT EXISTS qc_policy TEXT;
+    ALTER TABLE ingest_manifest ADD COLUMN IF NOT EXISTS levels_dropped INTEGER NOT NULL DEFAULT 0;
+"""
+
+# A single-row counter bumped in every load transaction. The API keys its
+# response cache on it (backend/app/utils/cache.py).
+INGEST_STATE_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS ingest_state (
+        id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+        generation BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    INSERT INTO ingest_state (id) VALUES (TRUE) ON CONFLICT DO NOTHING;
+"""
+
+# Rows rendered to CSV per read() while streaming a frame into COPY.
+COPY_BATCH_ROWS = 50_000
+
+# Profiles read per slice by the streaming parser (--chunk-profiles).
+DEFAULT_CHUNK_PROFILES = 100
 
 # --- Database Configuration ---
 DB_USER = os.getenv("DB_USER")
@@ -31,68 +199,952 @@ logging.basicConfig(
 )
 
 # --- Helper Functions ---
-def get_processed_files():
-    """Reads the log of already processed files to avoid duplication."""
-    if not os.path.exists(PROCESSED_LOG):
-        return set()
-    with open(PROCESSED_LOG, 'r') as f:
-        return set(line.strip() for line in f)
-
-def log_processed_file(filename):
-    """Adds a file to the log of processed files."""
-    with open(PROCESSED_LOG, 'a') as f:
-        f.write(f"{filename}\n")
-
-def parse_argo_profile(file_path):
-    """Parses a single Argo NetCDF file and extracts profile data into a DataFrame."""
+def file_sha256(file_path, block_size=1 << 20):
+    """Hashes a file's contents in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def describe_file(file_path):
+    """The manifest fields for a file on disk."""
+    st = os.stat(file_path)
+    return {
+        'filename': os.path.basename(file_path),
+        'file_hash': file_sha256(file_path),
+        'file_size': st.st_size,
+        'file_mtime_ns': st.st_mtime_ns,
+    }
+
+def get_manifest(engine):
+    """Reads the ingest manifest, keyed by filename."""
+    with engine.connect() as connection:
+        result = connection.execute(text(
+            "SELECT filename, file_hash, file_size, file_mtime_ns, qc_policy FROM ingest_manifest"
+        ))
+        return {row.filename: row for row in result}
+
+def select_files_to_ingest(engine, filenames, data_dir=DOWNLOAD_DIR, qc_policy=None):
+    """
+    Returns the files that are new or whose contents changed since they were
+    last ingested. Unchanged size and mtime skip without reading the file;
+    a touched-but-identical file only has its manifest mtime refreshed.
+    With `qc_policy` set, files ingested under a different policy are
+    re-ingested as well, so their stored levels follow the new policy.
+    """
+    manifest = get_manifest(engine)
+    logging.info(f"Found {len(manifest)} previously processed files.")
+
+    to_process = []
+    for filename in filenames:
+        file_path = os.path.join(data_dir, filename)
+        entry = manifest.get(filename)
+        if entry is None:
+            to_process.append(filename)
+            continue
+
+        if qc_policy is not None and entry.qc_policy != qc_policy:
+            logging.info(f"QC policy changed ({entry.qc_policy or 'none recorded'} -> {qc_policy}), "
+                         f"re-ingesting: {filename}")
+            to_process.append(filename)
+            continue
+
+        st = os.stat(file_path)
+        if entry.file_size == st.st_size and entry.file_mtime_ns == st.st_mtime_ns:
+            logging.info(f"Skipping already processed file: {filename}")
+            continue
+
+        if file_sha256(file_path) == entry.file_hash:
+            with engine.begin() as connection:
+                connection.execute(text(
+                    "UPDATE ingest_manifest SET file_size = :size, file_mtime_ns = :mtime "
+                    "WHERE filename = :filename"
+                ), {'size': st.st_size, 'mtime': st.st_mtime_ns, 'filename': filename})
+            logging.info(f"Skipping touched but unchanged file: {filename}")
+            continue
+
+        logging.info(f"Contents changed since last ingest, re-ingesting: {filename}")
+        to_process.append(filename)
+    return to_process
+
+def has_level_layout(connection, table='argo_profiles'):
+    """True if `table` still has the flat one-row-per-level columns."""
+    return bool(connection.execute(text("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = :table AND column_name = 'platform_id'
+    """), {'table': table}).scalar())
+
+def ensure_schema(engine, layout=DEFAULT_LAYOUT):
+    """
+    Creates the manifest table and the target table for `layout`.
+
+    For the level layout this also adds the unique level key that upserts
+    rely on; tables loaded before the key existed are de-duplicated once.
+    """
+    with engine.begin() as connection:
+        connection.execute(text(MANIFEST_TABLE_DDL))
+        connection.execute(text(INGEST_STATE_TABLE_DDL))
+
+        if layout == 'profile':
+            if has_level_layout(connection):
+                raise RuntimeError(
+                    "argo_profiles still has the per-level layout; "
+                    "run data/scripts/migrate_profiles.py first."
+                )
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS postgis"))
+            connection.execute(text(PROFILE_TABLE_DDL))
+            ensure_standard_levels(connection)
+            connection.execute(text(FLOAT_LATEST_TABLE_DDL))
+            if not connection.execute(text("SELECT EXISTS (SELECT 1 FROM argo_float_latest)")).scalar():
+                # First run with the rollup: build it from whatever is already loaded.
+                refresh_float_latest(connection)
+            ensure_argo_stats(connection)
+            ensure_alerts(connection)
+            if not connection.execute(text("SELECT EXISTS (SELECT 1 FROM argo_daily_stats)")).scalar():
+                rebuild_argo_stats(connection)
+            ensure_ts_summary(connection)
+            if not connection.execute(text("SELECT EXISTS (SELECT 1 FROM argo_ts_histogram)")).scalar():
+                rebuild_ts_summary(connection)
+            return
+
+        connection.execute(text(LEVEL_TABLE_DDL))
+        has_key = connection.execute(
+            text("SELECT 1 FROM pg_indexes WHERE indexname = :name"), {'name': LEVEL_KEY_INDEX}
+        ).scalar()
+        if not has_key:
+            logging.warning("Adding unique level key to argo_levels; removing duplicate levels first...")
+            connection.execute(text("""
+                DELETE FROM argo_levels a
+                USING argo_levels b
+                WHERE a.ctid < b.ctid
+                  AND a.platform_id = b.platform_id
+                  AND a.cycle_number = b.cycle_number
+                  AND a.pressure = b.pressure
+            """))
+            connection.execute(text(
+                f"CREATE UNIQUE INDEX {LEVEL_KEY_INDEX} ON argo_levels ({', '.join(LEVEL_KEY)})"
+            ))
+
+def format_pg_array(values):
+    """Renders a 1-D numeric array as a Postgres array literal, e.g. {5.1,10.2}; NaN becomes NULL."""
+    return "{" + ",".join("NULL" if v != v else f"{v:.7g}" for v in np.asarray(values).tolist()) + "}"
+
+class DataFrameCsvStream(io.TextIOBase):
+    """
+    File-like view of a DataFrame as CSV, rendered a batch of rows at a time.
+    Lets COPY FROM STDIN consume a frame without materialising the whole CSV.
+    """
+    def __init__(self, df, columns, array_columns=(), batch_rows=COPY_BATCH_ROWS):
+        self._df = df[columns]
+        self._array_columns = list(array_columns)
+        self._batch_rows = batch_rows
+        self._offset = 0
+        # The rendered batch being read, consumed through StringIO's own
+        # position so a read never copies the rest of the batch.
+        self._batch = io.StringIO()
+
+    def readable(self):
+        return True
+
+    def _next_batch(self):
+        batch = self._df.iloc[self._offset:self._offset + self._batch_rows]
+        self._offset += self._batch_rows
+        if self._array_columns:
+            batch = batch.assign(**{c: batch[c].map(format_pg_array) for c in self._array_columns})
+        return batch.to_csv(header=False, index=False)
+
+    def read(self, size=-1):
+        chunks = []
+        while size != 0:
+            chunk = self._batch.read(size)
+            if chunk:
+                chunks.append(chunk)
+                if size > 0:
+                    size -= len(chunk)
+                continue
+            if self._offset >= len(self._df):
+                break
+            self._batch = io.StringIO(self._next_batch())
+        return "".join(chunks)
+
+def copy_dataframe(connection, df, layout):
+    """Streams a DataFrame into the layout's staging table with COPY FROM STDIN."""
+    column_list = ", ".join(f'"{c}"' for c in layout.columns)
+    sql = f"COPY {layout.staging_table} ({column_list}) FROM STDIN WITH (FORMAT csv)"
+    with connection.connection.cursor() as cursor:
+        cursor.copy_expert(sql, DataFrameCsvStream(df, layout.columns, layout.array_columns))
+
+def to_sql_dataframe(connection, df, layout):
+    """The original batched-INSERT path, kept for comparison with COPY."""
+    if layout.array_columns:
+        # psycopg2 adapts lists, not numpy arrays, to Postgres ARRAYs (and NaN only as 'NaN', not NULL).
+        df = df.assign(**{c: df[c].map(lambda a: [None if v != v else v for v in np.asarray(a).tolist()])
+                          for c in layout.array_columns})
+    df[layout.columns].to_sql(layout.staging_table, connection, if_exists='append', index=False, chunksize=500)
+
+LOADERS = {
+    'copy': copy_dataframe,
+    'to_sql': to_sql_dataframe,
+}
+
+def merge_staged_profiles(connection):
+    """
+    Upserts the staged file into argo_profiles on (float_id, cycle_number),
+    filling in `geom` from the profile position. When a file carries more than
+    one profile for a cycle (e.g. a descending profile) the longest one wins.
+    The file's floats are then refreshed in argo_float_latest, and the T-S
+    summaries and the argo_stats totals have the replaced profiles taken out
+    and the new ones added. Once a climatology cube exists, both sides are
+    also queued for it. Finally the merged profiles are checked for anomalies
+    (see alerts.py).
+    """
+    columns = ", ".join(PROFILE_COLUMNS)
+    key = ", ".join(PROFILE_KEY)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in PROFILE_COLUMNS + ['geom'] if c not in PROFILE_KEY)
+    staged_keys = f"SELECT DISTINCT {key} FROM argo_profiles_staging"
+
+    queue_climatology = climatology_queue_exists(connection)
+    if queue_climatology:
+        queue_climatology_changes(connection, staged_keys, sign=-1)
+    add_ts_histogram(connection, staged_keys, sign=-1)
+    add_profile_stats(connection, staged_keys, sign=-1)
+    connection.execute(text(f"""
+        INSERT INTO argo_profiles ({columns}, geom)
+        SELECT DISTINCT ON ({key})
+            {columns}, ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
+        FROM argo_profiles_staging
+        ORDER BY {key}, cardinality(pressure_dbar) DESC
+        ON CONFLICT ({key}) DO UPDATE SET {updates}
+    """))
+    add_ts_histogram(connection, staged_keys)
+    add_profile_stats(connection, staged_keys)
+    if queue_climatology:
+        queue_climatology_changes(connection, staged_keys, sign=1)
+    new_floats = refresh_float_latest(connection, "SELECT DISTINCT float_id FROM argo_profiles_staging")
+    add_float_count(connection, new_floats)
+    detect_profile_alerts(connection, staged_keys)
+    detect_stalled_floats(connection)
+    # The staged months, plus the months re-ingested profiles were sampled under.
+    refresh_ts_sample(connection, f"""
+        SELECT float_id, date_trunc('month', profile_time) AS month FROM argo_profiles_staging
+        UNION
+        SELECT s.float_id, s.month FROM argo_ts_sample s JOIN ({staged_keys}) k USING ({key})
+    """)
+
+def refresh_float_latest(connection, float_ids_sql=None):
+    """
+    Recomputes the argo_float_latest rows of the floats selected by
+    `float_ids_sql` (a subquery returning float_id), or of every float.
+    Each float is read through the (float_id, cycle_number) key, so the cost
+    follows the floats touched by an ingest, not the size of argo_profiles.
+    Returns the number of floats that had no row yet.
+    """
+    where = f"WHERE float_id IN ({float_ids_sql})" if float_ids_sql else ""
+    result = connection.execute(text(f"""
+        INSERT INTO argo_float_latest
+            (float_id, cycle_number, profile_time, latitude, longitude, profile_count, geom, updated_at)
+        SELECT DISTINCT ON (float_id)
+            float_id, cycle_number, profile_time, latitude, longitude,
+            COUNT(*) OVER (PARTITION BY float_id), geom, now()
+        FROM argo_profiles
+        {where}
+        ORDER BY float_id, profile_time DESC, cycle_number DESC
+        ON CONFLICT (float_id) DO UPDATE SET
+            cycle_number = EXCLUDED.cycle_number,
+            profile_time = EXCLUDED.profile_time,
+            latitude = EXCLUDED.latitude,
+            longitude = EXCLUDED.longitude,
+            profile_count = EXCLUDED.profile_count,
+            geom = EXCLUDED.geom,
+            updated_at = EXCLUDED.updated_at
+        RETURNING (xmax = 0) AS inserted
+    """))
+    return sum(1 for row in result if row.inserted)
+
+def merge_staged_levels(connection):
+    """
+    Upserts the staged file into argo_levels on (platform_id, cycle_number, pressure).
+    Levels that disappeared from a re-processed cycle are deleted, so a changed
+    file replaces its cycles instead of appending to them.
+    """
+    columns = ", ".join(f'"{c}"' for c in LEVEL_COLUMNS)
+    key = ", ".join(LEVEL_KEY)
+    updates = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in LEVEL_COLUMNS if c not in LEVEL_KEY)
+
+    connection.execute(text("""
+        DELETE FROM argo_levels p
+        USING (SELECT DISTINCT platform_id, cycle_number FROM argo_levels_staging) s
+        WHERE p.platform_id = s.platform_id
+          AND p.cycle_number = s.cycle_number
+          AND NOT EXISTS (
+              SELECT 1 FROM argo_levels_staging n
+              WHERE n.platform_id = p.platform_id
+                AND n.cycle_number = p.cycle_number
+                AND n.pressure = p.pressure
+          )
+    """))
+    connection.execute(text(f"""
+        INSERT INTO argo_levels ({columns})
+        SELECT DISTINCT ON ({key}) {columns}
+        FROM argo_levels_staging
+        ORDER BY {key}
+        ON CONFLICT ({key}) DO UPDATE SET {updates}
+    """))
+
+def record_manifest(connection, file_info, row_count, profile_count, qc_policy=None, levels_dropped=0):
+    """Marks a file as ingested in the same transaction as its rows."""
+    connection.execute(text("""
+        INSERT INTO ingest_manifest
+            (filename, file_hash, file_size, file_mtime_ns, row_count, profile_count,
+             qc_policy, levels_dropped, ingested_at)
+        VALUES (:filename, :file_hash, :file_size, :file_mtime_ns, :row_count, :profile_count,
+                :qc_policy, :levels_dropped, now())
+        ON CONFLICT (filename) DO UPDATE SET
+            file_hash = EXCLUDED.file_hash,
+            file_size = EXCLUDED.file_size,
+            file_mtime_ns = EXCLUDED.file_mtime_ns,
+            row_count = EXCLUDED.row_count,
+            profile_count = EXCLUDED.profile_count,
+            qc_policy = EXCLUDED.qc_policy,
+            levels_dropped = EXCLUDED.levels_dropped,
+            ingested_at = EXCLUDED.ingested_at
+    """), {**file_info, 'row_count': row_count, 'profile_count': profile_count,
+           'qc_policy': qc_policy, 'levels_dropped': levels_dropped})
+
+def bump_ingest_generation(connection):
+    """Tells API caches that the data changed, once the surrounding transaction commits."""
+    connection.execute(text("UPDATE ingest_state SET generation = generation + 1, updated_at = now()"))
+
+def decode_platform_number(raw):
+    """Platform numbers come back from xarray as padded byte strings, e.g. b'1902672 '."""
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8', errors='ignore')
+    return str(raw).strip()
+
+def parse_qc_keep(value):
+    """'1,2' -> ('1', '2'); 'all' (or empty) -> None, meaning no QC filtering."""
+    if value is None or value.strip().lower() in ('', 'all'):
+        return None
+    flags = tuple(sorted({flag.strip() for flag in value.split(',') if flag.strip()}))
+    if not flags or any(len(flag) != 1 for flag in flags):
+        raise argparse.ArgumentTypeError(f"QC flags must be single characters like 1,2 (got {value!r})")
+    return flags
+
+def qc_policy_name(qc_keep):
+    """How a QC policy is recorded in the manifest, e.g. 'keep:1,2'."""
+    return 'all' if not qc_keep else 'keep:' + ','.join(qc_keep)
+
+def read_profile_arrays(ds):
+    """
+    Pulls the per-profile metadata and N_PROF x N_LEVELS measurement arrays out
+    of an open dataset. QC flag arrays are None when the file does not carry them.
+    """
+    qc_flags = {key: ds[name].values if name in ds.variables else None for key, name in QC_VARIABLES.items()}
+    return {
+        'platform_id': decode_platform_number(ds.PLATFORM_NUMBER.values.flat[0]),
+        'cycle_number': ds.CYCLE_NUMBER.values,
+        'timestamp': ds.JULD.values,
+        'latitude': ds.LATITUDE.values,
+        'longitude': ds.LONGITUDE.values,
+        'pressure': ds.PRES_ADJUSTED.values,
+        'temperature': ds.TEMP_ADJUSTED.values,
+        'salinity': ds.PSAL_ADJUSTED.values,
+        **qc_flags,
+    }
+
+def qc_flag_mask(flags, qc_keep):
+    """True where a level's QC flag is one of `qc_keep`. Flags arrive as bytes (S1) or str."""
+    return np.isin(np.asarray(flags).astype('S1'), [flag.encode() for flag in qc_keep])
+
+def valid_level_mask(arrays, qc_keep=None):
+    """
+    N_PROF x N_LEVELS mask of levels with pressure, temperature and salinity
+    all present and, with a `qc_keep` policy, all carrying an accepted QC flag.
+    Returns (mask, levels present but dropped for their QC flags).
+    """
+    pres = np.asarray(arrays['pressure'])
+    temp = np.asarray(arrays['temperature'])
+    sal = np.asarray(arrays['salinity'])
+    cycles = np.asarray(arrays['cycle_number'], dtype='float64')
+
+    valid = ~(np.isnan(pres) | np.isnan(temp) | np.isnan(sal))
+    # A profile without a cycle number cannot be keyed, so drop its levels too.
+    valid &= np.isfinite(cycles)[:, None]
+    if not qc_keep:
+        return valid, 0
+
+    present = int(valid.sum())
+    for key in QC_VARIABLES:
+        flags = arrays.get(key)
+        if flags is not None:
+            valid &= qc_flag_mask(flags, qc_keep)
+    return valid, present - int(valid.sum())
+
+def flatten_profiles(arrays, qc_keep=None):
+    """
+    Flattens N_PROF x N_LEVELS measurements into one row per valid level.
+
+    A single NaN (and QC) mask over pressure, temperature and salinity picks
+    the levels to keep; the row index of each kept level is then used to
+    repeat the per-profile metadata, so no per-profile DataFrames are ever
+    built. The number of levels dropped for QC is left in `df.attrs`.
+    """
+    pres = np.asarray(arrays['pressure'])
+    temp = np.asarray(arrays['temperature'])
+    sal = np.asarray(arrays['salinity'])
+    cycles = np.asarray(arrays['cycle_number'], dtype='float64')
+
+    valid, qc_dropped = valid_level_mask(arrays, qc_keep)
+    prof_idx = np.nonzero(valid)[0]
+
+    df = pd.DataFrame({
+        'pressure': pres[valid],
+        'temperature': temp[valid],
+        'salinity': sal[valid],
+        'platform_id': np.full(len(prof_idx), arrays['platform_id'], dtype=object),
+        'cycle_number': cycles[prof_idx].astype('int64'),
+        'timestamp': np.asarray(arrays['timestamp'])[prof_idx],
+        'latitude': np.asarray(arrays['latitude'], dtype='float64')[prof_idx],
+        'longitude': np.asarray(arrays['longitude'], dtype='float64')[prof_idx],
+    }, columns=LEVEL_COLUMNS)
+    df.attrs['qc_dropped'] = qc_dropped
+    return df
+
+def group_profiles(arrays, qc_keep=None):
+    """
+    Shapes N_PROF x N_LEVELS measurements into one row per profile with the
+    valid levels of each variable as an array.
+
+    The same NaN mask as flatten_profiles is applied to the whole block; the
+    masked values are then split at per-profile boundaries, so each array is a
+    view into one flat buffer. Profiles without a time or position, or with no
+    valid levels, are dropped since the profile table requires them.
+    The same flat buffers are interpolated onto the standard pressure levels.
+    """
+    pres = np.asarray(arrays['pressure'])
+    temp = np.asarray(arrays['temperature'])
+    sal = np.asarray(arrays['salinity'])
+    times = np.asarray(arrays['timestamp'])
+    lat = np.asarray(arrays['latitude'], dtype='float64')
+    lon = np.asarray(arrays['longitude'], dtype='float64')
+    cycles = np.asarray(arrays['cycle_number'], dtype='float64')
+
+    valid, qc_dropped = valid_level_mask(arrays, qc_keep)
+    keep = valid.any(axis=1) & np.isfinite(lat) & np.isfinite(lon) & ~np.isnat(times)
+    if not keep.any():
+        # np.split would hand back one empty array for zero profiles.
+        df = pd.DataFrame(columns=PROFILE_COLUMNS)
+        df.attrs['qc_dropped'] = qc_dropped
+        return df
+    valid &= keep[:, None]
+    bounds = np.cumsum(valid.sum(axis=1)[keep])[:-1]
+    # Position of each kept level's profile among the kept profiles.
+    level_profile = (np.cumsum(keep) - 1)[np.nonzero(valid)[0]]
+    temperature_std, salinity_std = interpolate_to_levels(
+        level_profile, pres[valid], [temp[valid], sal[valid]], int(keep.sum())
+    )
+
+    df = pd.DataFrame({
+        'float_id': np.full(int(keep.sum()), int(arrays['platform_id']), dtype='int64'),
+        'cycle_number': cycles[keep].astype('int64'),
+        'profile_time': times[keep],
+        'latitude': lat[keep],
+        'longitude': lon[keep],
+        'pressure_dbar': np.split(pres[valid], bounds),
+        'temperature_celsius': np.split(temp[valid], bounds),
+        'salinity_psu': np.split(sal[valid], bounds),
+        'temperature_std': list(temperature_std),
+        'salinity_std': list(salinity_std),
+    }, columns=PROFILE_COLUMNS)
+    df.attrs['qc_dropped'] = qc_dropped
+    return df
+
+def count_level_frame(df):
+    """(level rows, profiles) for a level-layout frame."""
+    return len(df), int(df['cycle_number'].nunique())
+
+def count_profile_frame(df):
+    """(level rows, profiles) for a profile-layout frame."""
+    return int(sum(len(a) for a in df['pressure_dbar'])), len(df)
+
+def levels_for_parquet(argo_df):
+    """
+    One row per level in the analytical store's schema, from a frame in either
+    layout. Profile arrays are concatenated and their metadata repeated by
+    each profile's level count.
+    """
+    if 'pressure_dbar' in argo_df:
+        lengths = argo_df['pressure_dbar'].map(len).to_numpy()
+        levels = pd.DataFrame({
+            'platform_id': np.repeat(argo_df['float_id'].to_numpy(), lengths),
+            'cycle_number': np.repeat(argo_df['cycle_number'].to_numpy(), lengths),
+            'profile_time': np.repeat(argo_df['profile_time'].to_numpy(), lengths),
+            'latitude': np.repeat(argo_df['latitude'].to_numpy(), lengths),
+            'longitude': np.repeat(argo_df['longitude'].to_numpy(), lengths),
+            'pressure': np.concatenate(argo_df['pressure_dbar'].to_list()),
+            'temperature': np.concatenate(argo_df['temperature_celsius'].to_list()),
+            'salinity': np.concatenate(argo_df['salinity_psu'].to_list()),
+        })
+    else:
+        levels = argo_df.rename(columns={'timestamp': 'profile_time'})
+        levels = levels.assign(platform_id=pd.to_numeric(levels['platform_id'], errors='coerce'))
+        levels = levels.dropna(subset=['platform_id', 'profile_time'])
+
+    # Parsed times are naive UTC; times read back from Postgres carry their zone.
+    profile_time = pd.to_datetime(levels['profile_time'], utc=True)
+    return pd.DataFrame({
+        'platform_id': levels['platform_id'].astype('int64'),
+        'month': profile_time.dt.strftime('%Y-%m'),
+        'cycle_number': levels['cycle_number'].astype('int32'),
+        'profile_time': profile_time,
+        'latitude': levels['latitude'].astype('float64'),
+        'longitude': levels['longitude'].astype('float64'),
+        'pressure': levels['pressure'].astype('float32'),
+        'temperature': levels['temperature'].astype('float32'),
+        'salinity': levels['salinity'].astype('float32'),
+    })
+
+def parquet_staging_dir(parquet_dir, filename):
+    """
+    Where a file's partitions are written until its transaction commits. The
+    leading underscore hides it from pyarrow dataset discovery, so readers of
+    `parquet_dir` never see half-ingested files.
+    """
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(parquet_dir, '_staging', f"{stem}-{os.getpid()}")
+
+def parquet_cycle_path(parquet_dir, platform_id, month, cycle_number):
+    return os.path.join(parquet_dir, f"platform_id={platform_id}", f"month={month}",
+                        PARQUET_CYCLE_FILE.format(cycle=cycle_number))
+
+def write_parquet_partitions(argo_df, parquet_dir):
+    """
+    Writes a parsed frame's levels into the hive-partitioned Parquet dataset
+    under `parquet_dir`, one file per (platform_id, cycle_number) — the key
+    Postgres dedupes profiles on — so a cycle that arrives again, from a
+    reprocessed (D) file or an overlapping *_prof.nc file, replaces its file
+    instead of adding its levels a second time. Duplicates within the frame
+    are resolved the way the merge does: the longest profile of a cycle wins.
+    """
+    if 'pressure_dbar' in argo_df:
+        longest_first = argo_df['pressure_dbar'].map(len).to_numpy().argsort(kind='stable')[::-1]
+        argo_df = argo_df.iloc[longest_first].drop_duplicates(PROFILE_KEY)
+    levels = levels_for_parquet(argo_df)
+    if 'pressure_dbar' not in argo_df:
+        levels = levels.drop_duplicates(['platform_id', 'cycle_number', 'pressure'])
+    if levels.empty:
+        return 0
+
+    written = 0
+    for (platform_id, cycle_number), cycle in levels.groupby(['platform_id', 'cycle_number'], sort=False):
+        path = parquet_cycle_path(parquet_dir, platform_id, cycle['month'].iat[0], cycle_number)
+        # A streamed file can repeat a cycle in a later chunk; keep the longer one.
+        if os.path.exists(path) and pq.read_metadata(path).num_rows >= len(cycle):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # platform_id and month live in the partition path, as in any hive-partitioned dataset.
+        pq.write_table(pa.Table.from_pandas(cycle.drop(columns=['platform_id', 'month']), preserve_index=False),
+                       path)
+        written += len(cycle)
+    return written
+
+def publish_parquet_partitions(staging_dir, parquet_dir):
+    """
+    Moves a file's staged cycle files into `parquet_dir` once its rows are
+    committed, replacing the published file of each cycle. A cycle whose
+    profile time moved to another month also has its old file removed.
+    Each move is a rename within the same filesystem. Returns the published
+    paths.
+    """
+    if not os.path.isdir(staging_dir):
+        return []
+
+    published = []
+    for staged in glob.glob(os.path.join(staging_dir, "platform_id=*", "month=*", "*.parquet")):
+        target = os.path.join(parquet_dir, os.path.relpath(staged, staging_dir))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(staged, target)
+        platform_dir = os.path.dirname(os.path.dirname(target))
+        for old_file in glob.glob(os.path.join(platform_dir, "month=*", os.path.basename(target))):
+            if old_file != target:
+                os.remove(old_file)
+        published.append(target)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    try:
+        # Drop _staging itself once no other writer is using it.
+        os.rmdir(os.path.dirname(staging_dir))
+    except OSError:
+        pass
+    return published
+
+Layout = namedtuple('Layout', ['table', 'staging_table', 'staging_ddl', 'columns',
+                               'array_columns', 'shape', 'merge', 'count'])
+
+LAYOUTS = {
+    'profile': Layout('argo_profiles', 'argo_profiles_staging', PROFILE_STAGING_DDL, PROFILE_COLUMNS,
+                      PROFILE_ARRAY_COLUMNS, group_profiles, merge_staged_profiles, count_profile_frame),
+    'level': Layout('argo_levels', 'argo_levels_staging', LEVEL_STAGING_DDL, LEVEL_COLUMNS,
+                    (), flatten_profiles, merge_staged_levels, count_level_frame),
+}
+
+def iter_argo_profile_chunks(file_path, layout='level', chunk_profiles=DEFAULT_CHUNK_PROFILES, qc_keep=None):
+    """
+    Streaming counterpart of parse_argo_profile: yields the file's rows
+    `chunk_profiles` profiles at a time. The dataset is opened without caching
+    and sliced along N_PROF before any values are read, so only one slice of
+    each variable is in memory at once. Errors propagate to the caller.
+    """
+    spec = LAYOUTS[layout]
+    with xr.open_dataset(file_path, cache=False) as ds:
+        num_profiles = ds.sizes.get('N_PROF', 0)
+        for start in range(0, num_profiles, chunk_profiles):
+            block = ds.isel(N_PROF=slice(start, start + chunk_profiles))
+            yield spec.shape(read_profile_arrays(block), qc_keep)
+
+def parse_argo_profile(file_path, layout='level', qc_keep=None):
+    """
+    Parses a single Argo NetCDF file and extracts profile data into a DataFrame.
+    `qc_keep` lists the accepted QC flags; None keeps every level with values.
+    """
+    spec = LAYOUTS[layout]
     try:
         with xr.open_dataset(file_path) as ds:
-            platform_number = str(ds.PLATFORM_NUMBER.values.flat[0]).strip()
-            num_profiles = ds.sizes['N_PROF']
-            
-            profile_data = []
-            for i in range(num_profiles):
-                cycle_number = int(ds.CYCLE_NUMBER.values[i])
-                profile_time = pd.to_datetime(ds.JULD.values[i])
-                lat = float(ds.LATITUDE.values[i])
-                lon = float(ds.LONGITUDE.values[i])
-
-                temp = ds.TEMP_ADJUSTED.values[i]
-                sal = ds.PSAL_ADJUSTED.values[i]
-                pres = ds.PRES_ADJUSTED.values[i]
-                
-                df_prof = pd.DataFrame({
-                    'pressure': pres,
-                    'temperature': temp,
-                    'salinity': sal
-                })
-                
-                df_prof['platform_id'] = platform_number
-                df_prof['cycle_number'] = cycle_number
-                df_prof['timestamp'] = profile_time
-                df_prof['latitude'] = lat
-                df_prof['longitude'] = lon
-                
-                profile_data.append(df_prof)
-
-            if not profile_data:
-                return None
-                
-            final_df = pd.concat(profile_data, ignore_index=True)
-            final_df.dropna(subset=['pressure', 'temperature', 'salinity'], inplace=True)
-            
-            return final_df
+            if ds.sizes.get('N_PROF', 0) == 0:
+                return pd.DataFrame(columns=spec.columns)
+            return spec.shape(read_profile_arrays(ds), qc_keep)
 
     except Exception as e:
         logging.error(f"Failed to parse {os.path.basename(file_path)}: {e}")
         return None
 
+# Per-run settings threaded from the CLI through the parse workers and the writer.
+IngestOptions = namedtuple('IngestOptions',
+                           ['layout', 'loader', 'parquet_dir', 'chunk_profiles', 'data_dir', 'qc_keep'],
+                           defaults=[DEFAULT_LAYOUT, 'copy', PARQUET_DIR, None, DOWNLOAD_DIR,
+                                     parse_qc_keep(DEFAULT_QC_KEEP)])
+
+def parse_file(file_path, options=IngestOptions()):
+    """Parse step run by the workers: the file's manifest entry plus its rows."""
+    return describe_file(file_path), parse_argo_profile(file_path, options.layout, options.qc_keep)
+
+class LoadStats:
+    """Accumulates rows and wall time spent in the loader for a run."""
+    def __init__(self, loader):
+        self.loader = loader
+        self.rows = 0
+        self.seconds = 0.0
+
+    def add(self, rows, seconds):
+        self.rows += rows
+        self.seconds += seconds
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+def load_parsed_file(engine, file_info, argo_df, options=IngestOptions(), stats=None):
+    """
+    Writes one parsed file to the database and records it in the manifest.
+    Rows are staged, merged and the manifest updated in a single transaction,
+    so a failure at any point leaves the file to be picked up by the next run.
+    The Parquet partitions are staged alongside and only published once that
+    transaction commits, so a failed commit leaves no Parquet files behind.
+    """
+    if argo_df is None:
+        logging.warning(f"⚠️ No data ingested from {file_info['filename']}.")
+        return False
+    return load_file_chunks(engine, file_info, [argo_df], options, stats)
+
+def load_file_chunks(engine, file_info, chunks, options=IngestOptions(), stats=None):
+    """
+    Loads a file given as an iterable of parsed DataFrames. Each chunk is
+    COPYed into the staging table as soon as it is produced, and the merge into
+    the target table runs once at the end, so a streamed file is still one
+    transaction while only one chunk is held in memory at a time.
+    """
+    filename = file_info['filename']
+    spec = LAYOUTS[options.layout]
+    load = LOADERS[options.loader]
+    row_count = profile_count = chunk_count = qc_dropped = 0
+    staging_dir = parquet_staging_dir(options.parquet_dir, filename) if options.parquet_dir else None
+    if staging_dir:
+        # Left over if an earlier process with this pid died mid-file.
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    started = time.perf_counter()
+    try:
+        # One transaction per file: either every row lands or none do.
+        with engine.begin() as connection:
+            # JULD is UTC; make naive timestamps land as such in TIMESTAMPTZ columns.
+            connection.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+            connection.execute(text(spec.staging_ddl))
+            for chunk in chunks:
+                if chunk.empty:
+                    qc_dropped += chunk.attrs.get('qc_dropped', 0)
+                    continue
+                load(connection, chunk, spec)
+                rows, profiles = spec.count(chunk)
+                qc_dropped += chunk.attrs.get('qc_dropped', 0)
+                row_count += rows
+                profile_count += profiles
+                if staging_dir:
+                    write_parquet_partitions(chunk, staging_dir)
+                chunk_count += 1
+            if row_count:
+                spec.merge(connection)
+                bump_ingest_generation(connection)
+            record_manifest(connection, file_info, row_count, profile_count,
+                            qc_policy_name(options.qc_keep), qc_dropped)
+    except Exception as e:
+        logging.error(f"❌ Failed to load {filename}: {e}")
+        if staging_dir:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        return False
+    elapsed = time.perf_counter() - started
+
+    if staging_dir:
+        try:
+            publish_parquet_partitions(staging_dir, options.parquet_dir)
+        except OSError as e:
+            # The rows are committed; the analytical store just lags for this file.
+            logging.error(f"❌ Failed to publish Parquet partitions for {filename}: {e}")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    if stats is not None:
+        stats.add(row_count, elapsed)
+    rate = row_count / elapsed if elapsed > 0 else 0.0
+    if qc_dropped:
+        logging.info(f"QC policy {qc_policy_name(options.qc_keep)} dropped {qc_dropped} levels from {filename}.")
+    if not row_count:
+        logging.warning(f"⚠️ No valid levels in {filename}; recorded it as processed.")
+    else:
+        streamed = f" in {chunk_count} chunks" if chunk_count > 1 else ""
+        logging.info(f"✅ Ingested {row_count} data points ({profile_count} profiles) from {filename}{streamed} "
+                     f"into {spec.table} in {elapsed:.2f}s ({rate:,.0f} rows/s via {options.loader}).")
+    return True
+
+def parquet_store_complete(parquet_dir):
+    return os.path.exists(os.path.join(parquet_dir, PARQUET_COMPLETE_MARKER))
+
+def invalidate_parquet_store(parquet_dir):
+    """Sends the API back to Postgres until the store is exported again."""
+    try:
+        os.remove(os.path.join(parquet_dir, PARQUET_COMPLETE_MARKER))
+    except FileNotFoundError:
+        pass
+
+def export_parquet_store(engine, parquet_dir=PARQUET_DIR, layout=DEFAULT_LAYOUT,
+                         batch_profiles=PARQUET_EXPORT_BATCH_PROFILES):
+    """
+    Rewrites the Parquet store from the rows already in the database, for
+    profiles loaded before the store existed or by migrate_profiles.py.
+    Files the export did not write (cycles no longer in the database, or
+    files named after their source file by older versions) are removed, and
+    PARQUET_COMPLETE_MARKER is written last. Meant to run while nothing else
+    ingests; ensure_parquet_store runs it before an ingest when needed.
+    Returns the number of level rows exported.
+    """
+    spec = LAYOUTS[layout]
+    columns = [c for c in spec.columns if c not in ('temperature_std', 'salinity_std')]
+    key = ['float_id', 'cycle_number'] if layout == 'profile' else ['platform_id', 'cycle_number']
+    staging_dir = parquet_staging_dir(parquet_dir, '_export')
+
+    invalidate_parquet_store(parquet_dir)
+    os.makedirs(parquet_dir, exist_ok=True)
+    exported = 0
+    published = set()
+    held_back = None
+    with engine.connect() as connection:
+        # Level rows of one cycle can span two batches; ordering on the key lets
+        # the last cycle of a batch wait for the rest of its levels.
+        result = connection.execution_options(stream_results=True, yield_per=batch_profiles).execute(text(f"""
+            SELECT {", ".join(f'"{c}"' for c in columns)}
+            FROM {spec.table}
+            ORDER BY {", ".join(key)}
+        """))
+        for rows in result.partitions():
+            batch = pd.DataFrame([tuple(r) for r in rows], columns=columns)
+            if held_back is not None:
+                batch = pd.concat([held_back, batch], ignore_index=True)
+            last = (batch[key] == batch[key].iloc[-1]).all(axis=1)
+            held_back, batch = batch[last], batch[~last]
+            exported += _export_batch(batch, staging_dir, parquet_dir, published)
+    if held_back is not None:
+        exported += _export_batch(held_back, staging_dir, parquet_dir, published)
+
+    for path in glob.glob(os.path.join(parquet_dir, "platform_id=*", "month=*", "*.parquet")):
+        if path not in published:
+            os.remove(path)
+    with open(os.path.join(parquet_dir, PARQUET_COMPLETE_MARKER), 'w') as f:
+        json.dump({'exported_at': datetime.now(timezone.utc).isoformat(), 'layout': layout, 'rows': exported}, f)
+    logging.info(f"✅ Exported {exported:,} level rows from {spec.table} to {parquet_dir}.")
+    return exported
+
+def _export_batch(batch, staging_dir, parquet_dir, published):
+    if 'pressure_dbar' in batch:
+        # Profiles without levels have nothing to store.
+        batch = batch[batch['pressure_dbar'].map(len, na_action='ignore').fillna(0) > 0]
+    if batch.empty:
+        return 0
+    written = write_parquet_partitions(batch, staging_dir)
+    published.update(publish_parquet_partitions(staging_dir, parquet_dir))
+    return written
+
+def ensure_parquet_store(engine, options):
+    """Exports the database to the Parquet store before ingesting, unless it is already complete."""
+    if not options.parquet_dir or parquet_store_complete(options.parquet_dir):
+        return
+    logging.info(f"Parquet store {options.parquet_dir} is incomplete; exporting the existing rows first...")
+    export_parquet_store(engine, options.parquet_dir, options.layout)
+
+def ingest_serial(engine, filenames, options=IngestOptions(), stats=None, on_result=None):
+    """
+    Parses and loads files one at a time in this process. With
+    `options.chunk_profiles` set each file is streamed in N_PROF slices, so
+    peak memory follows the chunk size rather than the file size.
+    `on_result(filename, ok)` is called after each file.
+    """
+    files_ingested_count = 0
+    for filename in filenames:
+        file_path = os.path.join(options.data_dir, filename)
+        ok = False
+        try:
+            if options.chunk_profiles:
+                file_info = describe_file(file_path)
+                chunks = iter_argo_profile_chunks(file_path, options.layout, options.chunk_profiles,
+                                                  options.qc_keep)
+                ok = load_file_chunks(engine, file_info, chunks, options, stats)
+            else:
+                file_info, argo_df = parse_file(file_path, options)
+                ok = load_parsed_file(engine, file_info, argo_df, options, stats)
+        except OSError as e:
+            logging.error(f"❌ Failed to read {filename}: {e}")
+
+        if ok:
+            files_ingested_count += 1
+        if on_result is not None:
+            on_result(filename, ok)
+    return files_ingested_count
+
+def ingest_parallel(engine, filenames, workers, queue_size=DEFAULT_QUEUE_SIZE,
+                    options=IngestOptions(), stats=None, on_result=None):
+    """
+    Parses files in a pool of worker processes while this process acts as the
+    single database writer.
+
+    At most `workers + queue_size` files are in flight at once, so parsed
+    DataFrames cannot pile up in memory when the writer falls behind. Files are
+    only added to the manifest by the writer, together with their rows; a
+    worker that raises or dies simply leaves its file for the next run.
+    """
+    files_ingested_count = 0
+    pending = iter(filenames)
+    in_flight = {}
+    max_in_flight = workers + max(queue_size, 0)
+    pool_broken = False
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def submit_next():
+            nonlocal pool_broken
+            if pool_broken:
+                return False
+            for filename in pending:
+                try:
+                    future = pool.submit(parse_file, os.path.join(options.data_dir, filename), options)
+                except BrokenProcessPool:
+                    pool_broken = True
+                    return False
+                in_flight[future] = filename
+                return True
+            return False
+
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                filename = in_flight.pop(future)
+                ok = False
+                try:
+                    file_info, argo_df = future.result()
+                    ok = load_parsed_file(engine, file_info, argo_df, options, stats)
+                except BrokenProcessPool:
+                    pool_broken = True
+                    logging.error(f"❌ Worker pool died while parsing {filename}; it will be retried next run.")
+                except Exception as e:
+                    logging.error(f"❌ Worker failed to parse {filename}: {e}")
+
+                if ok:
+                    files_ingested_count += 1
+                if on_result is not None:
+                    on_result(filename, ok)
+                submit_next()
+
+    if pool_broken:
+        skipped = list(pending)
+        logging.error(f"❌ Parse workers crashed; {len(skipped)} unstarted files left for the next run.")
+        if on_result is not None:
+            for filename in skipped:
+                on_result(filename, False)
+    return files_ingested_count
+
+def ingest_files(engine, filenames, options=IngestOptions(), workers=1, queue_size=DEFAULT_QUEUE_SIZE,
+                 stats=None, on_result=None):
+    """Runs the serial or the parallel path depending on `workers` and streaming."""
+    if options.chunk_profiles and workers > 1:
+        # A streamed file has to be parsed where its transaction is open.
+        logging.warning("--chunk-profiles streams files through the writer process; ignoring --workers.")
+        return ingest_serial(engine, filenames, options, stats, on_result)
+    if workers > 1 and len(filenames) > 1:
+        logging.info(f"Parsing with {workers} worker processes.")
+        return ingest_parallel(engine, filenames, workers, queue_size, options, stats, on_result)
+    return ingest_serial(engine, filenames, options, stats, on_result)
+
+def add_ingest_arguments(parser):
+    """The options shared by this script and ingest_daemon.py."""
+    parser.add_argument("--data-dir", default=DOWNLOAD_DIR,
+                        help="Directory of .nc files to ingest (default: %(default)s, or $ARGO_DATA_DIR).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Parse worker processes. 1 (default) parses in-process.")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="Parsed files allowed to wait for the writer in parallel mode.")
+    parser.add_argument("--loader", choices=sorted(LOADERS), default="copy",
+                        help="Bulk COPY (default) or the legacy DataFrame.to_sql batched INSERTs.")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default=DEFAULT_LAYOUT,
+                        help="'profile' (default): one row per profile in argo_profiles. "
+                             "'level': one row per depth level in argo_levels.")
+    parser.add_argument("--parquet-dir", default=PARQUET_DIR,
+                        help="Partitioned Parquet copy of the level rows (default: %(default)s).")
+    parser.add_argument("--no-parquet", action="store_true",
+                        help="Skip writing the Parquet analytical store.")
+    parser.add_argument("--chunk-profiles", type=int, nargs='?', const=DEFAULT_CHUNK_PROFILES, default=None,
+                        help="Stream each file in slices of this many profiles (default slice: "
+                             f"{DEFAULT_CHUNK_PROFILES}) to bound memory on very large *_prof.nc files.")
+    parser.add_argument("--qc-keep", type=parse_qc_keep, default=parse_qc_keep(DEFAULT_QC_KEEP),
+                        help="Comma-separated *_ADJUSTED_QC flags to keep, or 'all' to skip QC filtering "
+                             f"(default: {DEFAULT_QC_KEEP}, or $ARGO_QC_KEEP).")
+    return parser
+
+def options_from_args(args):
+    return IngestOptions(
+        layout=args.layout,
+        loader=args.loader,
+        parquet_dir=None if args.no_parquet else args.parquet_dir,
+        chunk_profiles=args.chunk_profiles,
+        data_dir=args.data_dir,
+        qc_keep=args.qc_keep,
+    )
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingest local ARGO NetCDF files into Postgres.")
+    return add_ingest_arguments(parser).parse_args()
+
 def main():
     """Main function to ingest locally stored Argo data files."""
+    args = parse_args()
     logging.info("🚀 Starting ARGO data ingestion pipeline from LOCAL files...")
-    processed_files = get_processed_files()
-    logging.info(f"Found {len(processed_files)} previously processed files.")
-    
+
     try:
         engine = create_engine(DATABASE_URL)
         logging.info("✅ Successfully connected to the database.")
@@ -100,33 +1152,31 @@ def main():
         logging.error(f"❌ Failed to connect to database: {e}")
         return
 
+    try:
+        ensure_schema(engine, args.layout)
+    except Exception as e:
+        logging.error(f"❌ Failed to prepare database schema: {e}")
+        return
+
+    options = options_from_args(args)
+    try:
+        ensure_parquet_store(engine, options)
+    except Exception as e:
+        # The API keeps reading Postgres until an export completes.
+        logging.error(f"❌ Failed to export the Parquet store: {e}")
+
     # We are bypassing the network download and only processing local files.
-    local_files = [f for f in os.listdir(DOWNLOAD_DIR) if f.endswith('.nc')]
+    local_files = [f for f in os.listdir(args.data_dir) if f.endswith('.nc')]
     logging.info(f"Found {len(local_files)} local NetCDF files to process.")
-    
-    files_ingested_count = 0
-    for filename in local_files:
-        if filename in processed_files:
-            logging.info(f"Skipping already processed file: {filename}")
-            continue
 
-        local_filepath = os.path.join(DOWNLOAD_DIR, filename)
-        
-        try:
-            argo_df = parse_argo_profile(local_filepath)
-            
-            if argo_df is not None and not argo_df.empty:
-                # Use a smaller chunksize for local ingestion
-                argo_df.to_sql('argo_profiles', engine, if_exists='append', index=False, chunksize=500)
-                logging.info(f"✅ Ingested {len(argo_df)} data points from {filename}.")
-                log_processed_file(filename)
-                files_ingested_count += 1
-            else:
-                logging.warning(f"⚠️ No data ingested from {filename}.")
+    to_process = select_files_to_ingest(engine, local_files, args.data_dir, qc_policy_name(options.qc_keep))
+
+    stats = LoadStats(args.loader)
+    files_ingested_count = ingest_files(engine, to_process, options, args.workers, args.queue_size, stats)
 
-        except Exception as e:
-            logging.error(f"❌ Failed to process local file {filename}: {e}")
-            
+    if stats.rows:
+        logging.info(f"Loader '{stats.loader}': {stats.rows:,} rows in {stats.seconds:.2f}s "
+                     f"({stats.rows_per_sec:,.0f} rows/s).")
     logging.info(f"Pipeline run finished. Ingested {files_ingested_count} new local files. 🚀")
 
 if __name__ == "__main__":
@@ -0,0 +1,322 @@
+# data/scripts/ingest_daemon.py
+
+import argparse
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import create_engine
+
+from climatology import update_climatology
+from ingest_argo import (
+    DATABASE_URL, DEFAULT_QUEUE_SIZE, LoadStats, add_ingest_arguments, ensure_parquet_store, ensure_schema,
+    ingest_files, options_from_args, qc_policy_name, select_files_to_ingest,
+)
+
+# --- Configuration ---
+DEFAULT_SCAN_SECONDS = 60
+DEFAULT_BATCH_FILES = 50
+# Batches allowed to wait for the writer. Batches are file names only; nothing
+# is parsed until the writer takes a batch, so this bounds memory as well.
+DEFAULT_PENDING_BATCHES = 2
+# Files modified more recently than this are assumed to still be downloading.
+DEFAULT_SETTLE_SECONDS = 5
+# An unchanged file that failed to load is retried after this long, doubling
+# with each further failure up to MAX_RETRY_SECONDS. A changed file is retried
+# at the next scan.
+DEFAULT_RETRY_SECONDS = 300
+MAX_RETRY_SECONDS = 6 * 3600
+DEFAULT_METRICS_PORT = 9108
+
+
+class IngestCounters:
+    """Thread-safe counters shared by the scanner, the writer and /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {
+            'scans_total': 0,
+            'scans_deferred_total': 0,
+            'files_discovered_total': 0,
+            'files_ingested_total': 0,
+            'files_failed_total': 0,
+            'batches_loaded_total': 0,
+            'rows_loaded_total': 0,
+            'load_seconds_total': 0.0,
+            'last_batch_rows_per_second': 0.0,
+            'last_batch_completed_timestamp': 0.0,
+        }
+
+    def add(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self.values[key] += value
+
+    def set(self, **values):
+        with self._lock:
+            self.values.update(values)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.values)
+
+
+class WatchDirectoryIngest:
+    """
+    Picks up new or changed .nc files in a directory and loads them in batches.
+
+    The scanner (an APScheduler interval job) keeps the size and mtime of every
+    file it has seen, so a scan is a single os.scandir() with no database
+    round-trips for unchanged files. Changed candidates are checked against the
+    ingest manifest and queued as batches of names on a bounded queue. Files
+    that fail are retried with a backoff until they change. When
+    the writer falls behind the queue fills, new candidates stay in `pending`,
+    and the scanner stops handing out work until the writer catches up.
+    """
+
+    def __init__(self, engine, options, batch_files, pending_batches, settle_seconds,
+                 workers=1, queue_size=DEFAULT_QUEUE_SIZE, retry_seconds=DEFAULT_RETRY_SECONDS):
+        self.engine = engine
+        self.options = options
+        self.batch_files = batch_files
+        self.settle_seconds = settle_seconds
+        self.retry_seconds = retry_seconds
+        self.workers = workers
+        self.queue_size = queue_size
+        self.counters = IngestCounters()
+        self.batches = queue.Queue(maxsize=pending_batches)
+        self.stopping = threading.Event()
+
+        self._lock = threading.Lock()
+        self._seen = {}                    # filename -> (size, mtime_ns) as of the last scan
+        self._pending = OrderedDict()      # filename -> mtime, not yet handed to the writer
+        self._in_progress = {}             # filename -> mtime, queued or being loaded
+        self._changed_in_progress = set()  # in-progress files that changed again since they were queued
+        self._failures = {}                # filename -> (consecutive failures, retry at), for failed files
+
+    # --- Scanner side ---
+    def _changed_files(self):
+        """Settled files whose size or mtime differ from the previous scan, plus failed files due a retry."""
+        now = time.time()
+        changed = []
+        current = set()
+        with self._lock, os.scandir(self.options.data_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.nc') or not entry.is_file():
+                    continue
+                st = entry.stat()
+                current.add(entry.name)
+                if now - st.st_mtime < self.settle_seconds:
+                    continue
+                signature = (st.st_size, st.st_mtime_ns)
+                failure = self._failures.get(entry.name)
+                if self._seen.get(entry.name) != signature:
+                    self._seen[entry.name] = signature
+                    # New contents start a fresh backoff.
+                    self._failures.pop(entry.name, None)
+                    changed.append((entry.name, st.st_mtime))
+                elif failure is not None and now >= failure[1]:
+                    # Not due again until this attempt has failed too.
+                    self._failures[entry.name] = (failure[0], float('inf'))
+                    changed.append((entry.name, st.st_mtime))
+            # Forget deleted files so they are picked up again if they come back.
+            for name in set(self._seen) - current:
+                del self._seen[name]
+                self._failures.pop(name, None)
+        return changed
+
+    def scan(self):
+        """Scheduled job: find new work, then queue as many batches as there is room for."""
+        try:
+            changed = self._changed_files()
+            self.counters.add(scans_total=1)
+            if changed:
+                mtimes = dict(changed)
+                to_ingest = select_files_to_ingest(self.engine, list(mtimes), self.options.data_dir,
+                                                   qc_policy_name(self.options.qc_keep))
+                with self._lock:
+                    # Ingested elsewhere in the meantime; nothing left to retry.
+                    for name in set(mtimes) - set(to_ingest):
+                        self._failures.pop(name, None)
+                    for name in to_ingest:
+                        if name in self._in_progress:
+                            # The load may read either version; look again once it is done.
+                            self._changed_in_progress.add(name)
+                        else:
+                            self._pending[name] = mtimes[name]
+                self.counters.add(files_discovered_total=len(to_ingest))
+            self._enqueue_pending()
+        except Exception as e:
+            logging.error(f"❌ Directory scan failed: {e}")
+
+    def _enqueue_pending(self):
+        with self._lock:
+            while self._pending:
+                if self.batches.full():
+                    self.counters.add(scans_deferred_total=1)
+                    logging.info(f"Writer is behind; holding {len(self._pending)} files until it catches up.")
+                    return
+                names = []
+                while self._pending and len(names) < self.batch_files:
+                    name, mtime = self._pending.popitem(last=False)
+                    self._in_progress[name] = mtime
+                    names.append(name)
+                self.batches.put_nowait(names)
+
+    # --- Writer side ---
+    def _file_done(self, filename, ok):
+        with self._lock:
+            self._in_progress.pop(filename, None)
+            if filename in self._changed_in_progress:
+                # Let the next scan check its newer version against the manifest.
+                self._changed_in_progress.discard(filename)
+                self._seen.pop(filename, None)
+                self._failures.pop(filename, None)
+            elif ok:
+                self._failures.pop(filename, None)
+            else:
+                failures = self._failures.get(filename, (0, 0))[0] + 1
+                delay = min(self.retry_seconds * 2 ** (failures - 1), MAX_RETRY_SECONDS)
+                self._failures[filename] = (failures, time.time() + delay)
+                logging.warning(f"⚠️ {filename} failed {failures} time(s); retrying in {delay:.0f}s "
+                                f"or once it changes.")
+        self.counters.add(files_ingested_total=int(ok), files_failed_total=int(not ok))
+
+    def run_writer(self):
+        """Loads queued batches until stop() is called."""
+        while not self.stopping.is_set():
+            try:
+                names = self.batches.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            stats = LoadStats(self.options.loader)
+            ingest_files(self.engine, names, self.options, self.workers, self.queue_size,
+                         stats, on_result=self._file_done)
+            self.counters.add(batches_loaded_total=1, rows_loaded_total=stats.rows,
+                              load_seconds_total=stats.seconds)
+            self.counters.set(last_batch_rows_per_second=stats.rows_per_sec,
+                              last_batch_completed_timestamp=time.time())
+            logging.info(f"Batch of {len(names)} files done: {stats.rows:,} rows "
+                         f"({stats.rows_per_sec:,.0f} rows/s).")
+            if stats.rows:
+                self._update_climatology()
+            # Room just opened up on the queue.
+            self._enqueue_pending()
+
+    def _update_climatology(self):
+        """Folds the batch into the climatology cube, if one has been built."""
+        try:
+            update_climatology(self.engine)
+        except Exception as e:
+            logging.error(f"❌ Climatology update failed: {e}")
+
+    def stop(self):
+        self.stopping.set()
+
+    # --- Metrics ---
+    def metrics(self):
+        """Counters plus the current backlog and ingest lag."""
+        values = self.counters.snapshot()
+        with self._lock:
+            waiting = list(self._pending.values()) + list(self._in_progress.values())
+            values['pending_files'] = len(self._pending)
+            values['in_progress_files'] = len(self._in_progress)
+            values['failed_files'] = len(self._failures)
+        values['queued_batches'] = self.batches.qsize()
+        # How long the oldest file not yet loaded has been sitting in the directory.
+        values['lag_seconds'] = time.time() - min(waiting) if waiting else 0.0
+        return values
+
+
+def serve_metrics(service, port):
+    """Serves the daemon's counters in Prometheus text format on /metrics."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = "".join(
+                f"argo_ingest_{name} {value}\n" for name, value in sorted(service.metrics().items())
+            ).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Serving ingest metrics on :{port}/metrics")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuously ingest ARGO NetCDF files as they land.")
+    add_ingest_arguments(parser)
+    parser.add_argument("--scan-interval", type=float, default=DEFAULT_SCAN_SECONDS,
+                        help="Seconds between directory scans.")
+    parser.add_argument("--batch-files", type=int, default=DEFAULT_BATCH_FILES,
+                        help="Files loaded per batch.")
+    parser.add_argument("--pending-batches", type=int, default=DEFAULT_PENDING_BATCHES,
+                        help="Batches allowed to wait for the writer before scanning backs off.")
+    parser.add_argument("--settle-seconds", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="Ignore files modified more recently than this.")
+    parser.add_argument("--retry-seconds", type=float, default=DEFAULT_RETRY_SECONDS,
+                        help="Wait before retrying an unchanged file that failed; doubles per failure.")
+    parser.add_argument("--metrics-port", type=int, default=DEFAULT_METRICS_PORT,
+                        help="Port for the Prometheus /metrics endpoint; 0 disables it.")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+    ensure_schema(engine, args.layout)
+    options = options_from_args(args)
+    try:
+        ensure_parquet_store(engine, options)
+    except Exception as e:
+        logging.error(f"❌ Failed to export the Parquet store: {e}")
+
+    service = WatchDirectoryIngest(
+        engine, options,
+        batch_files=args.batch_files,
+        pending_batches=args.pending_batches,
+        settle_seconds=args.settle_seconds,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        retry_seconds=args.retry_seconds,
+    )
+    if args.metrics_port:
+        serve_metrics(service, args.metrics_port)
+
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(service.scan, 'interval', seconds=args.scan_interval,
+                      max_instances=1, coalesce=True, next_run_time=datetime.now())
+    scheduler.start()
+
+    def shutdown(signum, frame):
+        logging.info("Shutting down ingest daemon after the current batch...")
+        service.stop()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    logging.info(f"🚀 Watching {args.data_dir} every {args.scan_interval:.0f}s.")
+    try:
+        service.run_writer()
+    finally:
+        scheduler.shutdown(wait=False)
+    logging.info("Ingest daemon stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# data/scripts/migrate_profiles.py
+
+import argparse
+import logging
+from sqlalchemy import create_engine, text
+
+from ingest_argo import (
+    DATABASE_URL, LEVEL_KEY_INDEX, PARQUET_DIR, bump_ingest_generation, ensure_schema, has_level_layout,
+    invalidate_parquet_store, refresh_float_latest,
+)
+from argo_stats import rebuild_argo_stats
+from standard_levels import backfill_standard_levels, reset_standard_levels
+from ts_summary import rebuild_ts_summary
+
+# The migration moves the flat one-row-per-level table out of the way and
+# rebuilds argo_profiles as one row per profile with REAL[] arrays and a
+# PostGIS point, the shape declared by backend/app/models/argo.py.
+
+def table_exists(connection, table):
+    return bool(connection.execute(text("SELECT to_regclass(:table)"), {'table': table}).scalar())
+
+def rename_level_table(engine):
+    """Renames a flat argo_profiles table to argo_levels. Returns True if a rename happened."""
+    with engine.begin() as connection:
+        if not table_exists(connection, 'argo_profiles') or not has_level_layout(connection):
+            return False
+        if table_exists(connection, 'argo_levels'):
+            raise RuntimeError("Both a flat argo_profiles and argo_levels exist; merge them by hand first.")
+
+        logging.info("Renaming flat table argo_profiles -> argo_levels...")
+        connection.execute(text("ALTER TABLE argo_profiles RENAME TO argo_levels"))
+        connection.execute(text(
+            f"ALTER INDEX IF EXISTS argo_profiles_level_key RENAME TO {LEVEL_KEY_INDEX}"
+        ))
+        return True
+
+def populate_profiles(engine):
+    """
+    Folds argo_levels into argo_profiles, one row per (platform, cycle), with the
+    levels ordered by pressure and `geom` built from the profile position.
+    Existing profiles are left alone, so the step is safe to re-run.
+    """
+    with engine.begin() as connection:
+        connection.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+        result = connection.execute(text("""
+            INSERT INTO argo_profiles
+                (float_id, cycle_number, profile_time, latitude, longitude,
+                 pressure_dbar, temperature_celsius, salinity_psu, geom)
+            SELECT
+                float_id,
+                cycle_number,
+                profile_time,
+                latitude,
+                longitude,
+                pressure_dbar,
+                temperature_celsius,
+                salinity_psu,
+                ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
+            FROM (
+                SELECT
+                    -- Older loads stored platform ids as "b'1902672 '"; keep the digits only.
+                    regexp_replace(platform_id, '[^0-9]', '', 'g')::INTEGER AS float_id,
+                    cycle_number::INTEGER AS cycle_number,
+                    MIN("timestamp") AS profile_time,
+                    MIN(latitude) AS latitude,
+                    MIN(longitude) AS longitude,
+                    array_agg(pressure ORDER BY pressure) AS pressure_dbar,
+                    array_agg(temperature ORDER BY pressure) AS temperature_celsius,
+                    array_agg(salinity ORDER BY pressure) AS salinity_psu
+                FROM argo_levels
+                WHERE "timestamp" IS NOT NULL
+                  AND latitude IS NOT NULL
+                  AND longitude IS NOT NULL
+                  AND regexp_replace(platform_id, '[^0-9]', '', 'g') <> ''
+                GROUP BY 1, 2
+            ) grouped
+            ON CONFLICT (float_id, cycle_number) DO NOTHING
+        """))
+        return result.rowcount
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate ARGO data to the one-row-per-profile layout.")
+    parser.add_argument("--drop-levels", action="store_true",
+                        help="Drop argo_levels once its data has been folded into argo_profiles.")
+    parser.add_argument("--recompute-standard-levels", action="store_true",
+                        help="Re-interpolate every profile, e.g. after changing STANDARD_PRESSURE_LEVELS.")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    renamed = rename_level_table(engine)
+    if args.recompute_standard_levels:
+        with engine.begin() as connection:
+            if table_exists(connection, 'argo_standard_levels'):
+                logging.warning("Clearing the stored standard-level arrays...")
+                reset_standard_levels(connection)
+    ensure_schema(engine, 'profile')
+
+    with engine.connect() as connection:
+        has_levels = table_exists(connection, 'argo_levels')
+
+    if has_levels:
+        inserted = populate_profiles(engine)
+        logging.info(f"✅ Wrote {inserted} profiles from argo_levels into argo_profiles.")
+        if inserted:
+            # The Parquet store lacks these; the next ingest (or export_parquet.py) re-exports it.
+            invalidate_parquet_store(PARQUET_DIR)
+        with engine.begin() as connection:
+            refresh_float_latest(connection)
+            rebuild_argo_stats(connection)
+            rebuild_ts_summary(connection)
+            bump_ingest_generation(connection)
+        if args.drop_levels:
+            with engine.begin() as connection:
+                connection.execute(text("DROP TABLE argo_levels"))
+            logging.warning("Dropped argo_levels.")
+    elif not renamed:
+        logging.info("No flat level table found; argo_profiles is already in the profile layout.")
+
+    # Profiles loaded before the standard-level columns existed (or just
+    # migrated from argo_levels) are interpolated here.
+    filled = backfill_standard_levels(engine)
+    if filled:
+        with engine.begin() as connection:
+            bump_ingest_generation(connection)
+        logging.info(f"✅ Interpolated {filled} profiles onto the standard pressure levels.")
+
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE argo_profiles"))
+        connection.execute(text("ANALYZE argo_float_latest"))
+    logging.info("🚀 Migration finished.")
+
+if __name__ == "__main__":
+    main()
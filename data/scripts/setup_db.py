@@ -20,9 +20,15 @@ if not all([DB_USER, DB_PASSWORD, DB_NAME]):
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Everything ingest_argo.py writes. The manifest has to go too, otherwise the
+# next ingest would skip every file it has already seen.
+INGEST_TABLES = ["argo_profiles", "argo_levels", "argo_float_latest", "argo_stats", "argo_daily_stats",
+                 "argo_ts_histogram", "argo_ts_sample", "argo_depth_bands", "argo_standard_levels",
+                 "climatology_queue", "argo_alerts", "ingest_manifest", "ingest_state"]
+
 def reset_database():
     """
-    Connects to the database and drops the argo_profiles table if it exists,
+    Connects to the database and drops the ingest tables if they exist,
     ensuring a clean slate for data ingestion.
     """
     try:
@@ -32,9 +38,10 @@ def reset_database():
             
             # Use a transaction to safely drop the table
             with connection.begin():
-                logging.warning("Dropping table 'argo_profiles' if it exists...")
-                connection.execute(text("DROP TABLE IF EXISTS argo_profiles;"))
-                logging.info("✅ Table 'argo_profiles' dropped successfully.")
+                for table in INGEST_TABLES:
+                    logging.warning(f"Dropping table '{table}' if it exists...")
+                    connection.execute(text(f"DROP TABLE IF EXISTS {table};"))
+                    logging.info(f"✅ Table '{table}' dropped successfully.")
             
             logging.info("Database is now ready for fresh data ingestion.")
 
@@ -0,0 +1,177 @@
+# data/scripts/standard_levels.py
+
+import logging
+import numpy as np
+from sqlalchemy import text
+
+# Every profile is interpolated onto these pressures at ingest and stored next
+# to its raw levels in argo_profiles.temperature_std / salinity_std, one slot
+# per level (NULL where the profile does not bracket it). A depth slice is then
+# `temperature_std[i]` instead of an unnest over every raw level. The levels
+# are recorded in argo_standard_levels (1-based, matching Postgres arrays) so
+# the API can look an index up by pressure.
+#
+# Changing the list invalidates the stored arrays; recompute them with
+# `migrate_profiles.py --recompute-standard-levels`.
+
+STANDARD_PRESSURE_LEVELS = np.array([
+    5, 10, 20, 30, 50, 75, 100, 125, 150, 200, 250, 300, 400, 500,
+    600, 700, 800, 900, 1000, 1100, 1200, 1300, 1400, 1500, 1750, 2000,
+], dtype='float64')  # dbar
+
+# Two raw levels are only interpolated between when they are at most
+# MIN_GAP_DBAR + GAP_FRACTION * level apart, so a sparse profile does not
+# invent structure across a wide gap. Nothing is extrapolated.
+MIN_GAP_DBAR = 25.0
+GAP_FRACTION = 0.25
+
+# Profiles read per round trip when backfilling existing rows.
+BACKFILL_BATCH_PROFILES = 5000
+
+STANDARD_LEVELS_DDL = """
+    CREATE TABLE IF NOT EXISTS argo_standard_levels (
+        level_index SMALLINT PRIMARY KEY,
+        pressure_dbar REAL NOT NULL UNIQUE
+    );
+    ALTER TABLE argo_profiles ADD COLUMN IF NOT EXISTS temperature_std REAL[];
+    ALTER TABLE argo_profiles ADD COLUMN IF NOT EXISTS salinity_std REAL[];
+"""
+
+def interpolate_to_levels(profile_index, pressure, variables, n_profiles, levels=STANDARD_PRESSURE_LEVELS):
+    """
+    Linearly interpolates ragged profiles onto `levels` in one pass.
+
+    The profiles arrive flattened: level i belongs to profile
+    `profile_index[i]` (0..n_profiles-1) and was measured at `pressure[i]`;
+    each array in `variables` holds one value per level. Levels are sorted on
+    a (profile, pressure) composite key, so a single searchsorted finds the
+    bracketing raw levels of every (profile, standard level) pair at once.
+    Returns one n_profiles x len(levels) float32 array per variable, NaN
+    where a level is not bracketed within the allowed gap.
+    """
+    levels = np.asarray(levels, dtype='float64')
+    profile_index = np.asarray(profile_index, dtype='int64')
+    pressure = np.asarray(pressure, dtype='float64')
+    shape = (n_profiles, len(levels))
+    if len(pressure) == 0:
+        return [np.full(shape, np.nan, dtype='float32') for _ in variables]
+
+    order = np.lexsort((pressure, profile_index))
+    profile_index, pressure = profile_index[order], pressure[order]
+    values = [np.asarray(v, dtype='float64')[order] for v in variables]
+
+    # Shift pressures to be non-negative and space the profiles further apart
+    # than any pressure, so the composite key sorts profile-major.
+    low = min(pressure.min(), levels.min(), 0.0)
+    stride = max(pressure.max(), levels.max()) - low + 1.0
+    keys = profile_index * stride + (pressure - low)
+
+    target_profile = np.repeat(np.arange(n_profiles), len(levels))
+    target_level = np.tile(levels, n_profiles)
+    target_keys = target_profile * stride + (target_level - low)
+
+    upper = np.searchsorted(keys, target_keys, side='left')
+    lower = upper - 1
+    upper_c = np.minimum(upper, len(keys) - 1)
+    lower_c = np.maximum(lower, 0)
+
+    exact = (upper < len(keys)) & (keys[upper_c] == target_keys)
+    p_low, p_high = pressure[lower_c], pressure[upper_c]
+    bracketed = (
+        (lower >= 0) & (upper < len(keys))
+        & (profile_index[lower_c] == target_profile)
+        & (profile_index[upper_c] == target_profile)
+        & (p_high - p_low <= MIN_GAP_DBAR + GAP_FRACTION * target_level)
+    )
+    results = []
+    # Unbracketed pairs divide by zero or mix profiles; they are masked below.
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight = (target_level - p_low) / (p_high - p_low)
+        for v in values:
+            interpolated = v[lower_c] + weight * (v[upper_c] - v[lower_c])
+            out = np.where(exact, v[upper_c], np.where(bracketed, interpolated, np.nan))
+            results.append(out.reshape(shape).astype('float32'))
+    return results
+
+def interpolate_profile_lists(pressure_arrays, temperature_arrays, salinity_arrays):
+    """
+    (temperature_std, salinity_std) rows for per-profile arrays of raw
+    levels. Missing values (None or NaN) drop their level.
+    """
+    lengths = np.fromiter((len(p) for p in pressure_arrays), dtype='int64', count=len(pressure_arrays))
+    profile_index = np.repeat(np.arange(len(lengths)), lengths)
+
+    def flat(arrays):
+        arrays = [np.asarray(a, dtype='float64') for a in arrays if len(a)]
+        return np.concatenate(arrays) if arrays else np.empty(0)
+
+    pressure, temperature, salinity = flat(pressure_arrays), flat(temperature_arrays), flat(salinity_arrays)
+    present = np.isfinite(pressure) & np.isfinite(temperature) & np.isfinite(salinity)
+    temperature, salinity = interpolate_to_levels(
+        profile_index[present], pressure[present],
+        [temperature[present], salinity[present]], len(lengths),
+    )
+    return list(temperature), list(salinity)
+
+def ensure_standard_levels(connection):
+    """
+    Adds the standard-level columns and records the levels. Raises if the
+    recorded levels differ from STANDARD_PRESSURE_LEVELS, since the stored
+    arrays would no longer line up with them.
+    """
+    connection.execute(text(STANDARD_LEVELS_DDL))
+    stored = [row.pressure_dbar for row in connection.execute(text(
+        "SELECT pressure_dbar FROM argo_standard_levels ORDER BY level_index"
+    ))]
+    if not stored:
+        for index, pressure in enumerate(STANDARD_PRESSURE_LEVELS, start=1):
+            connection.execute(text(
+                "INSERT INTO argo_standard_levels (level_index, pressure_dbar) VALUES (:index, :pressure)"
+            ), {'index': index, 'pressure': float(pressure)})
+    elif not np.array_equal(np.asarray(stored, dtype='float64'), STANDARD_PRESSURE_LEVELS):
+        raise RuntimeError(
+            "argo_standard_levels does not match STANDARD_PRESSURE_LEVELS; "
+            "run data/scripts/migrate_profiles.py --recompute-standard-levels."
+        )
+
+def reset_standard_levels(connection):
+    """Forgets the recorded levels and every stored standard-level array."""
+    connection.execute(text("UPDATE argo_profiles SET temperature_std = NULL, salinity_std = NULL"))
+    connection.execute(text("DELETE FROM argo_standard_levels"))
+
+def _nullable(row):
+    return [None if np.isnan(v) else float(v) for v in row]
+
+def backfill_standard_levels(engine, batch_profiles=BACKFILL_BATCH_PROFILES):
+    """
+    Interpolates the profiles that have no standard-level arrays yet (rows
+    loaded before the columns existed), a batch per transaction. Returns the
+    number of profiles filled in.
+    """
+    filled = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(text("""
+                SELECT id, pressure_dbar, temperature_celsius, salinity_psu
+                FROM argo_profiles
+                WHERE temperature_std IS NULL
+                ORDER BY id
+                LIMIT :limit
+            """), {'limit': batch_profiles}).fetchall()
+            if not rows:
+                return filled
+
+            temperature, salinity = interpolate_profile_lists(
+                [r.pressure_dbar or [] for r in rows],
+                [r.temperature_celsius or [] for r in rows],
+                [r.salinity_psu or [] for r in rows],
+            )
+            # psycopg2 sends a list of only NULLs as text[], which Postgres will
+            # not assign to a REAL[] column, so the arrays are cast explicitly.
+            connection.execute(
+                text("UPDATE argo_profiles SET temperature_std = CAST(:t AS REAL[]), "
+                     "salinity_std = CAST(:s AS REAL[]) WHERE id = :id"),
+                [{'id': r.id, 't': _nullable(t), 's': _nullable(s)} for r, t, s in zip(rows, temperature, salinity)],
+            )
+        filled += len(rows)
+        logging.info(f"Interpolated {filled} profiles onto standard levels...")
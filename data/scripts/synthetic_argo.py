@@ -0,0 +1,73 @@
+# data/scripts/synthetic_argo.py
+
+import os
+import numpy as np
+import xarray as xr
+
+# Synthetic *_prof.nc files with the variables ingest_argo reads, for the
+# benchmarks. Nothing here touches the network or the database.
+
+FIRST_PLATFORM_NUMBER = 1902672
+
+def write_synthetic_argo_file(path, n_prof, n_levels, platform_number="1902672", seed=0):
+    """
+    Writes a multi-profile NetCDF file with the variables ingest_argo reads.
+    Each profile has a random number of valid levels followed by NaN padding,
+    the way real *_prof.nc files are laid out. Valid levels are flagged good
+    ('1') in the *_ADJUSTED_QC variables, apart from a few marked bad ('4').
+    """
+    rng = np.random.default_rng(seed)
+    pres = np.full((n_prof, n_levels), np.nan, dtype='float32')
+    temp = np.full((n_prof, n_levels), np.nan, dtype='float32')
+    psal = np.full((n_prof, n_levels), np.nan, dtype='float32')
+
+    depth_levels = np.linspace(5, 2000, n_levels, dtype='float32')
+    valid_levels = rng.integers(n_levels // 2, n_levels + 1, size=n_prof)
+    for i, n_valid in enumerate(valid_levels):
+        pres[i, :n_valid] = depth_levels[:n_valid]
+        temp[i, :n_valid] = 28 * np.exp(-depth_levels[:n_valid] / 700) + rng.normal(0, 0.2, n_valid)
+        psal[i, :n_valid] = 34.5 + rng.normal(0, 0.1, n_valid)
+    # Sprinkle a few isolated bad values that dropna has to catch.
+    temp[rng.random((n_prof, n_levels)) < 0.01] = np.nan
+
+    # Padding levels carry a blank flag, like real files.
+    present = ~np.isnan(pres)
+    pres_qc = np.where(present, b'1', b' ').astype('S1')
+    temp_qc = pres_qc.copy()
+    psal_qc = pres_qc.copy()
+    temp_qc[present & (rng.random((n_prof, n_levels)) < 0.02)] = b'4'
+    psal_qc[present & (rng.random((n_prof, n_levels)) < 0.01)] = b'4'
+
+    start = np.datetime64('2020-01-01T00:00:00', 'ns')
+    juld = start + np.arange(n_prof) * np.timedelta64(10, 'D')
+
+    ds = xr.Dataset(
+        {
+            'PLATFORM_NUMBER': (('N_PROF',), np.array([platform_number.ljust(8).encode()] * n_prof, dtype='S8')),
+            'CYCLE_NUMBER': (('N_PROF',), np.arange(1, n_prof + 1, dtype='int32')),
+            'JULD': (('N_PROF',), juld),
+            'LATITUDE': (('N_PROF',), rng.uniform(-60, 60, n_prof)),
+            'LONGITUDE': (('N_PROF',), rng.uniform(-180, 180, n_prof)),
+            'PRES_ADJUSTED': (('N_PROF', 'N_LEVELS'), pres),
+            'TEMP_ADJUSTED': (('N_PROF', 'N_LEVELS'), temp),
+            'PSAL_ADJUSTED': (('N_PROF', 'N_LEVELS'), psal),
+            'PRES_ADJUSTED_QC': (('N_PROF', 'N_LEVELS'), pres_qc),
+            'TEMP_ADJUSTED_QC': (('N_PROF', 'N_LEVELS'), temp_qc),
+            'PSAL_ADJUSTED_QC': (('N_PROF', 'N_LEVELS'), psal_qc),
+        }
+    )
+    ds.to_netcdf(path)
+    return path
+
+def write_synthetic_dataset(directory, n_files, n_prof, n_levels, seed=0):
+    """
+    Writes `n_files` synthetic files into `directory`, one float per file, and
+    returns their paths. The same arguments always produce the same files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(n_files):
+        platform_number = str(FIRST_PLATFORM_NUMBER + i)
+        path = os.path.join(directory, f"{platform_number}_prof.nc")
+        paths.append(write_synthetic_argo_file(path, n_prof, n_levels, platform_number, seed=seed + i))
+    return paths
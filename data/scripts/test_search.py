@@ -1,17 +1,21 @@
 # data/scripts/test_search.py
 
 import faiss
+import json
 import numpy as np
 import pandas as pd
 from sentence_transformers import SentenceTransformer
 import os
 import logging
 
+from vector_index import query_parameters
+
 # --- Configuration ---
 EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
 EMBEDDINGS_DIR = "data/embeddings/"
 FAISS_INDEX_PATH = os.path.join(EMBEDDINGS_DIR, "argo_float_index.faiss")
 ID_MAPPING_PATH = os.path.join(EMBEDDINGS_DIR, "index_to_id_mapping.csv")
+INDEX_META_PATH = os.path.join(EMBEDDINGS_DIR, "argo_float_index.json")
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] - %(message)s")
 
@@ -27,11 +31,20 @@ def run_test():
         logging.info(f"Loading FAISS index from: {FAISS_INDEX_PATH}")
         index = faiss.read_index(FAISS_INDEX_PATH)
 
-        logging.info(f"Loading ID mapping from: {ID_MAPPING_PATH}")
-        id_mapping_df = pd.read_csv(ID_MAPPING_PATH)
-        
-        # Convert mapping to a simple list for easy lookup
-        index_to_id = id_mapping_df['platform_id'].tolist()
+        meta = {}
+        if os.path.exists(INDEX_META_PATH):
+            with open(INDEX_META_PATH) as f:
+                meta = json.load(f)
+        logging.info(f"Index type: {meta.get('index_type', 'flat')} {meta.get('search_params', {})}")
+
+        # Indexes keyed on platform_id return it directly; older ones need the mapping
+        index_to_id = None
+        if not meta.get('id_mapped'):
+            logging.info(f"Loading ID mapping from: {ID_MAPPING_PATH}")
+            id_mapping_df = pd.read_csv(ID_MAPPING_PATH)
+
+            # Convert mapping to a simple list for easy lookup
+            index_to_id = id_mapping_df['platform_id'].tolist()
         
         logging.info("✅ All components loaded successfully.")
 
@@ -56,7 +69,9 @@ def run_test():
 
         # --- 4. Search the index ---
         k = 3 # Number of nearest neighbors to retrieve
-        distances, indices = index.search(query_embedding, k)
+        search_params = meta.get('search_params', {})
+        distances, indices = index.search(query_embedding, k, params=query_parameters(
+            meta.get('index_type', 'flat'), search_params.get('ef_search'), search_params.get('nprobe')))
         
         # --- 5. Display results ---
         print(f"\n🔍 Top {k} results for query: '{query}'")
@@ -64,7 +79,9 @@ def run_test():
         for i in range(k):
             # The 'indices' array is 2D, so we access with [0, i]
             result_index = indices[0, i]
-            platform_id = index_to_id[result_index]
+            if result_index < 0:
+                break
+            platform_id = result_index if index_to_id is None else index_to_id[result_index]
             distance = distances[0, i]
             
             print(f"  {i+1}. Platform ID: {platform_id} (Similarity Score/Distance: {distance:.4f})")
@@ -0,0 +1,154 @@
+# data/scripts/ts_summary.py
+
+from sqlalchemy import text
+
+# Summaries behind /charts/temperature-salinity, maintained by ingest_argo.py
+# in the same transaction as the profiles they describe:
+#
+#   argo_ts_histogram - level counts per (depth band, T bin, S bin) at a fine
+#                       base resolution; coarser bins are sums of these.
+#   argo_ts_sample    - a stratified sample: for every (float, depth band,
+#                       month) the TS_SAMPLE_PER_STRATUM levels with the
+#                       lowest hash priority (bottom-k sampling, so the
+#                       sample is deterministic and needs no RNG state).
+#
+# Changing the constants below invalidates both; rebuild with
+# `rebuild_ts_summary` (migrate_profiles.py does this).
+
+TS_DEPTH_BAND_EDGES = [0, 100, 500, 1000, 2000]  # dbar
+TS_TEMPERATURE_BIN = 0.1    # °C
+TS_SALINITY_BIN = 0.01      # PSU
+TS_SAMPLE_PER_STRATUM = 5
+
+_EDGES_SQL = f"ARRAY[{', '.join(str(e) for e in TS_DEPTH_BAND_EDGES)}]::float8[]"
+# Band 0 is anything above the surface edge, band len(edges) anything below the last.
+_DEPTH_BAND_SQL = f"width_bucket(l.pressure::float8, {_EDGES_SQL})"
+
+TS_SUMMARY_DDL = """
+    CREATE TABLE IF NOT EXISTS argo_depth_bands (
+        depth_band SMALLINT PRIMARY KEY,
+        min_dbar REAL,
+        max_dbar REAL
+    );
+    CREATE TABLE IF NOT EXISTS argo_ts_histogram (
+        depth_band SMALLINT NOT NULL,
+        t_bin INTEGER NOT NULL,
+        s_bin INTEGER NOT NULL,
+        count BIGINT NOT NULL,
+        PRIMARY KEY (depth_band, t_bin, s_bin)
+    );
+    CREATE TABLE IF NOT EXISTS argo_ts_sample (
+        float_id INTEGER NOT NULL,
+        depth_band SMALLINT NOT NULL,
+        month TIMESTAMPTZ NOT NULL,
+        sample_rank SMALLINT NOT NULL,
+        priority INTEGER NOT NULL,
+        cycle_number INTEGER NOT NULL,
+        pressure REAL NOT NULL,
+        temperature REAL NOT NULL,
+        salinity REAL NOT NULL,
+        PRIMARY KEY (float_id, depth_band, month, sample_rank)
+    );
+    -- Reading rank 1 of every stratum first, in priority order, spreads any
+    -- LIMIT evenly over floats, depth bands and months.
+    CREATE INDEX IF NOT EXISTS idx_argo_ts_sample_order ON argo_ts_sample (sample_rank, priority);
+"""
+
+def ensure_ts_summary(connection):
+    """Creates the summary tables and records the depth bands they use."""
+    connection.execute(text(TS_SUMMARY_DDL))
+    edges = TS_DEPTH_BAND_EDGES
+    for band in range(len(edges) + 1):
+        connection.execute(text("""
+            INSERT INTO argo_depth_bands (depth_band, min_dbar, max_dbar)
+            VALUES (:band, :min_dbar, :max_dbar)
+            ON CONFLICT (depth_band) DO UPDATE SET min_dbar = EXCLUDED.min_dbar, max_dbar = EXCLUDED.max_dbar
+        """), {
+            'band': band,
+            'min_dbar': edges[band - 1] if band > 0 else None,
+            'max_dbar': edges[band] if band < len(edges) else None,
+        })
+
+def add_ts_histogram(connection, profile_keys_sql=None, sign=1):
+    """
+    Adds (sign=1) or removes (sign=-1) the levels of the profiles whose
+    (float_id, cycle_number) are returned by `profile_keys_sql` (default:
+    every profile) to the histogram.
+    """
+    join = f"JOIN ({profile_keys_sql}) k USING (float_id, cycle_number)" if profile_keys_sql else ""
+    connection.execute(text(f"""
+        INSERT INTO argo_ts_histogram (depth_band, t_bin, s_bin, count)
+        SELECT
+            {_DEPTH_BAND_SQL},
+            floor(l.temperature / {TS_TEMPERATURE_BIN})::int,
+            floor(l.salinity / {TS_SALINITY_BIN})::int,
+            {int(sign)} * COUNT(*)
+        FROM argo_profiles p
+        {join}
+        CROSS JOIN LATERAL unnest(p.pressure_dbar, p.temperature_celsius, p.salinity_psu)
+            AS l(pressure, temperature, salinity)
+        WHERE l.temperature IS NOT NULL AND l.salinity IS NOT NULL AND l.pressure IS NOT NULL
+        GROUP BY 1, 2, 3
+        ON CONFLICT (depth_band, t_bin, s_bin) DO UPDATE SET count = argo_ts_histogram.count + EXCLUDED.count
+    """))
+
+def refresh_ts_sample(connection, strata_sql=None):
+    """
+    Re-draws the sample for the (float_id, month) strata returned by
+    `strata_sql` (default: all of them) from the profiles now stored.
+    Each (float, month) is read through the (float_id, profile_time) index.
+    """
+    # Months are UTC months.
+    connection.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+    if strata_sql:
+        connection.execute(text(f"""
+            CREATE TEMP TABLE ts_strata ON COMMIT DROP AS
+            SELECT DISTINCT float_id, month FROM ({strata_sql}) s
+        """))
+        connection.execute(text("""
+            DELETE FROM argo_ts_sample t USING ts_strata s
+            WHERE t.float_id = s.float_id AND t.month = s.month
+        """))
+        source = """
+            ts_strata s
+            JOIN argo_profiles p
+              ON p.float_id = s.float_id
+             AND p.profile_time >= s.month
+             AND p.profile_time < s.month + INTERVAL '1 month'
+        """
+    else:
+        connection.execute(text("TRUNCATE argo_ts_sample"))
+        source = "argo_profiles p"
+
+    connection.execute(text(f"""
+        INSERT INTO argo_ts_sample
+            (float_id, depth_band, month, sample_rank, priority, cycle_number, pressure, temperature, salinity)
+        SELECT float_id, depth_band, month, sample_rank, priority, cycle_number, pressure, temperature, salinity
+        FROM (
+            SELECT c.*,
+                   ROW_NUMBER() OVER (PARTITION BY float_id, depth_band, month ORDER BY priority) AS sample_rank
+            FROM (
+                SELECT
+                    p.float_id,
+                    {_DEPTH_BAND_SQL} AS depth_band,
+                    date_trunc('month', p.profile_time) AS month,
+                    ('x' || substr(md5(p.float_id || ':' || p.cycle_number || ':' || l.ord), 1, 8))::bit(32)::int
+                        AS priority,
+                    p.cycle_number,
+                    l.pressure,
+                    l.temperature,
+                    l.salinity
+                FROM {source}
+                CROSS JOIN LATERAL unnest(p.pressure_dbar, p.temperature_celsius, p.salinity_psu)
+                    WITH ORDINALITY AS l(pressure, temperature, salinity, ord)
+                WHERE l.temperature IS NOT NULL AND l.salinity IS NOT NULL AND l.pressure IS NOT NULL
+            ) c
+        ) ranked
+        WHERE sample_rank <= {TS_SAMPLE_PER_STRATUM}
+    """))
+
+def rebuild_ts_summary(connection):
+    """Recomputes the histogram and the sample from scratch."""
+    connection.execute(text("TRUNCATE argo_ts_histogram"))
+    add_ts_histogram(connection)
+    refresh_ts_sample(connection)
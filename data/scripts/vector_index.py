@@ -0,0 +1,89 @@
+# data/scripts/vector_index.py
+
+import math
+import faiss
+import numpy as np
+
+# FAISS index types for the float search index, all keyed on platform_id and
+# all L2. create_embeddings.py builds them; the type, build parameters and
+# default query parameters are stored in the index's JSON sidecar, which
+# backend/app/services/vector_service.py reads.
+#
+#   flat - exact brute-force scan (IndexFlatL2 in an IndexIDMap2). Query cost
+#          grows linearly with the index.
+#   hnsw - graph search (IndexHNSWFlat in an IndexIDMap2). Queries visit about
+#          log(n) nodes; efSearch trades recall for latency. The graph cannot
+#          delete, so replacing vectors rebuilds it from the stored vectors
+#          (no re-encoding).
+#   ivf  - inverted lists over nlist k-means centroids (IndexIVFFlat, native
+#          ids). Queries scan nprobe lists. The centroids are trained when the
+#          index is rebuilt; later additions reuse them.
+
+INDEX_TYPES = ('flat', 'hnsw', 'ivf')
+DEFAULT_INDEX_TYPE = 'flat'
+
+DEFAULT_HNSW_M = 32
+DEFAULT_EF_CONSTRUCTION = 200
+DEFAULT_EF_SEARCH = 64
+DEFAULT_NPROBE = 8
+# FAISS wants at least this many training vectors per IVF centroid.
+MIN_POINTS_PER_CENTROID = 39
+
+def default_nlist(n_vectors):
+    """About 4*sqrt(n) lists, capped so every centroid has enough training points."""
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // MIN_POINTS_PER_CENTROID))
+
+def build_params(index_type, n_vectors, m=None, ef_construction=None, nlist=None):
+    if index_type == 'hnsw':
+        return {'m': m or DEFAULT_HNSW_M, 'ef_construction': ef_construction or DEFAULT_EF_CONSTRUCTION}
+    if index_type == 'ivf':
+        return {'nlist': nlist or default_nlist(n_vectors)}
+    return {}
+
+def search_params(index_type, ef_search=None, nprobe=None):
+    """Default query-time parameters stored with the index."""
+    if index_type == 'hnsw':
+        return {'ef_search': ef_search or DEFAULT_EF_SEARCH}
+    if index_type == 'ivf':
+        return {'nprobe': nprobe or DEFAULT_NPROBE}
+    return {}
+
+def new_index(index_type, vectors, ids, params):
+    """An index of `index_type` holding `vectors` under `ids`; IVF is trained on `vectors`."""
+    d = vectors.shape[1]
+    if index_type == 'hnsw':
+        inner = faiss.IndexHNSWFlat(d, params['m'])
+        inner.hnsw.efConstruction = params['ef_construction']
+        index = faiss.IndexIDMap2(inner)
+    elif index_type == 'ivf':
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(d), d, params['nlist'])
+        index.train(vectors)
+    else:
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(d))
+    if len(ids):
+        index.add_with_ids(vectors, ids)
+    return index
+
+def remove_ids(index, index_type, ids, params):
+    """
+    Removes `ids` from the index and returns it. HNSW graphs cannot delete,
+    so a new graph is built from the vectors that remain.
+    """
+    ids = np.asarray(ids, dtype='int64')
+    if not len(ids):
+        return index
+    if index_type != 'hnsw':
+        index.remove_ids(ids)
+        return index
+    stored_ids = faiss.vector_to_array(index.id_map)
+    keep = ~np.isin(stored_ids, ids)
+    vectors = index.index.reconstruct_n(0, index.ntotal)[keep]
+    return new_index('hnsw', vectors, stored_ids[keep], params)
+
+def query_parameters(index_type, ef_search=None, nprobe=None):
+    """Per-call FAISS search parameters; None for a flat index."""
+    if index_type == 'hnsw':
+        return faiss.SearchParametersHNSW(efSearch=int(ef_search or DEFAULT_EF_SEARCH))
+    if index_type == 'ivf':
+        return faiss.SearchParametersIVF(nprobe=int(nprobe or DEFAULT_NPROBE))
+    return None
@@ -0,0 +1,134 @@
+# data/tests/test_alerts.py
+
+import os
+import sys
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+from alerts import (ALERT_MAX_DRIFT_KMH, ALERT_MIN_CLIMATOLOGY_COUNT, climatology_z_scores, haversine_km,
+                    profile_alerts)
+from climatology import apply_profiles, create_cube, open_cube
+from standard_levels import STANDARD_PRESSURE_LEVELS
+
+N_LEVELS = len(STANDARD_PRESSURE_LEVELS)
+START = datetime(2024, 1, 10, tzinfo=timezone.utc)
+
+# The columns detect_profile_alerts selects for each merged profile.
+Profile = namedtuple('Profile', ['float_id', 'cycle_number', 'profile_time', 'latitude', 'longitude',
+                                 'temperature_std', 'salinity_std', 'month', 'prev_cycle', 'prev_time',
+                                 'prev_latitude', 'prev_longitude'])
+CubeRow = namedtuple('CubeRow', ['month', 'latitude', 'longitude', 'temperature_std', 'salinity_std'])
+
+
+def profile(temperature=20.0, salinity=35.0, latitude=10.0, longitude=20.0, previous=None, hours=240.0):
+    """A January profile of float 1902672; `previous` is the (lat, lon) of the cycle before."""
+    prev = (None, None, None, None)
+    if previous is not None:
+        prev = (1, START - timedelta(hours=hours), *previous)
+    return Profile(1902672, 2, START, latitude, longitude,
+                   [temperature] * N_LEVELS if temperature is not None else None,
+                   [salinity] * N_LEVELS, 1, *prev)
+
+
+@pytest.fixture
+def climatology(tmp_path):
+    """A 30 degree cube whose January cell at 10N 20E holds temperatures 19..21 and salinity 35."""
+    directory = str(tmp_path / 'v000001')
+    meta = create_cube(directory, degrees=30)
+    temperatures = np.linspace(19, 21, ALERT_MIN_CLIMATOLOGY_COUNT + 2)
+    apply_profiles(meta, open_cube(directory), [CubeRow(1, 10.0, 20.0, [t] * N_LEVELS, [35.0] * N_LEVELS)
+                                                for t in temperatures])
+    return meta, open_cube(directory, mode='r')
+
+
+def kinds(alerts):
+    return sorted(alert['kind'] for alert in alerts)
+
+
+def test_typical_profile_raises_nothing(climatology):
+    assert profile_alerts([profile(temperature=20.5)], climatology) == []
+
+
+def test_temperature_far_from_climatology(climatology):
+    (alert,) = profile_alerts([profile(temperature=30.0)], climatology)
+
+    assert alert['kind'] == 'temperature_anomaly'
+    assert alert['value'] > 4
+    assert alert['pressure_dbar'] == STANDARD_PRESSURE_LEVELS[0]
+    assert 'above climatology' in alert['message']
+
+
+def test_worst_level_is_reported(climatology):
+    row = profile()
+    row.temperature_std[5] = 5.0
+
+    (alert,) = profile_alerts([row], climatology)
+
+    assert alert['pressure_dbar'] == STANDARD_PRESSURE_LEVELS[5]
+    assert 'below climatology' in alert['message']
+
+
+def test_minimum_std_keeps_constant_cells_from_flagging_noise(climatology):
+    # Every salinity in the cell is 35.0, so only the ALERT_MIN_STD floor bounds the z-score.
+    assert profile_alerts([profile(salinity=35.02)], climatology) == []
+    assert kinds(profile_alerts([profile(salinity=35.5)], climatology)) == ['salinity_anomaly']
+
+
+def test_thin_and_empty_cells_are_not_judged(climatology):
+    z = climatology_z_scores([profile(temperature=40.0, latitude=-70.0)], 'temperature', *climatology)
+
+    assert np.isnan(z).all()
+
+
+def test_missing_values_are_not_judged(climatology):
+    row = profile(temperature=None)
+
+    assert np.isnan(climatology_z_scores([row], 'temperature', *climatology)).all()
+    assert profile_alerts([row], climatology) == []
+
+
+def test_no_cube_still_checks_positions():
+    far = profile(previous=(10.0, 40.0), hours=24)
+
+    assert kinds(profile_alerts([far], None)) == ['position_jump']
+
+
+def test_position_jump():
+    # About 2,190 km in 10 days is ~9 km/h.
+    (alert,) = profile_alerts([profile(previous=(10.0, 40.0), hours=240)])
+
+    assert alert['kind'] == 'position_jump'
+    assert alert['value'] > ALERT_MAX_DRIFT_KMH
+    assert 'since cycle 1' in alert['message']
+
+
+def test_ordinary_drift_is_not_a_jump():
+    assert profile_alerts([profile(previous=(10.5, 20.5), hours=240)]) == []
+
+
+def test_first_profile_of_a_float_has_nothing_to_compare():
+    assert profile_alerts([profile()]) == []
+
+
+def test_same_hour_profiles_are_compared_an_hour_apart():
+    close = profile(previous=(10.0, 20.01), hours=0)
+    far = profile(previous=(10.0, 21.0), hours=0)
+
+    assert profile_alerts([close]) == []
+    (alert,) = profile_alerts([far])
+    assert alert['value'] == pytest.approx(haversine_km(10.0, 21.0, 10.0, 20.0))
+
+
+def test_haversine_km():
+    assert haversine_km(0, 0, 0, 0) == 0
+    assert haversine_km(0, 0, 0, 1) == pytest.approx(111.19, abs=0.01)
+    assert haversine_km(90, 0, -90, 0) == pytest.approx(np.pi * 6371.0)
+
+
+def test_no_rows():
+    assert profile_alerts([]) == []
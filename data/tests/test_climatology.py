@@ -0,0 +1,166 @@
+# data/tests/test_climatology.py
+
+import os
+import sys
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+import climatology
+from climatology import (apply_profiles, batch_statistics, create_cube, current_version, merge_statistics,
+                         open_cube, publish_version, read_meta, update_climatology)
+
+# A coarse grid keeps each test cube to a few kilobytes.
+DEGREES = 30
+QueueRow = namedtuple('QueueRow', ['id', 'sign', 'month', 'latitude', 'longitude', 'temperature_std',
+                                   'salinity_std'])
+
+
+def empty_stats(n_cells):
+    return {'count': np.zeros(n_cells, dtype='int32'), 'mean': np.zeros(n_cells), 'm2': np.zeros(n_cells)}
+
+
+def fold(stats, cells, values, sign=1):
+    merge_statistics(stats, *batch_statistics(np.asarray(cells), np.asarray(values, dtype='float64')), sign=sign)
+
+
+def test_batch_statistics_groups_by_cell():
+    cells, n, mean, m2 = batch_statistics(np.array([3, 1, 3, 3]), np.array([1.0, 5.0, 2.0, 6.0]))
+
+    assert cells.tolist() == [1, 3]
+    assert n.tolist() == [1, 3]
+    np.testing.assert_allclose(mean, [5.0, 3.0])
+    np.testing.assert_allclose(m2, [0.0, 14.0])
+
+
+def test_merging_batches_matches_statistics_of_all_values():
+    rng = np.random.default_rng(0)
+    values = rng.normal(15, 3, 1000)
+    cells = rng.integers(0, 4, 1000)
+    stats = empty_stats(4)
+
+    for start in range(0, 1000, 150):
+        fold(stats, cells[start:start + 150], values[start:start + 150])
+
+    for cell in range(4):
+        in_cell = values[cells == cell]
+        assert stats['count'][cell] == len(in_cell)
+        np.testing.assert_allclose(stats['mean'][cell], in_cell.mean())
+        np.testing.assert_allclose(stats['m2'][cell], ((in_cell - in_cell.mean()) ** 2).sum())
+
+
+def test_removing_a_batch_restores_the_earlier_statistics():
+    stats = empty_stats(2)
+    fold(stats, [0, 0, 0, 1], [10.0, 12.0, 14.0, 3.0])
+    before = {stat: array.copy() for stat, array in stats.items()}
+
+    fold(stats, [0, 0], [30.0, 31.0])
+    fold(stats, [0, 0], [30.0, 31.0], sign=-1)
+
+    assert stats['count'].tolist() == before['count'].tolist()
+    np.testing.assert_allclose(stats['mean'], before['mean'])
+    np.testing.assert_allclose(stats['m2'], before['m2'], atol=1e-9)
+
+
+def test_removing_every_value_empties_the_cell():
+    stats = empty_stats(1)
+    fold(stats, [0, 0], [20.0, 22.0])
+
+    fold(stats, [0, 0], [20.0, 22.0], sign=-1)
+
+    assert stats['count'][0] == 0
+    assert stats['mean'][0] == 0.0
+    assert stats['m2'][0] == 0.0
+
+
+def test_merge_leaves_other_cells_alone():
+    stats = empty_stats(3)
+    fold(stats, [2], [7.0])
+
+    assert stats['count'].tolist() == [0, 0, 1]
+    assert stats['mean'][:2].tolist() == [0.0, 0.0]
+
+
+def profile_row(row_id, month, value, sign=1, latitude=10.0, longitude=20.0):
+    n_levels = len(climatology.STANDARD_PRESSURE_LEVELS)
+    return QueueRow(row_id, sign, month, latitude, longitude, [value] * n_levels, [35.0] * n_levels)
+
+
+def test_apply_profiles_bins_by_month_and_cell(tmp_path):
+    meta = create_cube(str(tmp_path / 'v000001'), degrees=DEGREES)
+    cube = open_cube(str(tmp_path / 'v000001'))
+
+    apply_profiles(meta, cube, [profile_row(1, 1, 10.0), profile_row(2, 1, 14.0), profile_row(3, 7, 5.0),
+                                profile_row(4, 1, 99.0, latitude=-80.0)])
+
+    january, july = cube['temperature'][1], cube['temperature'][7]
+    # 10N 20E is lat row 3, lon column 6 on a 30 degree grid.
+    assert january['count'][:, 3, 6].tolist() == [2] * january['count'].shape[0]
+    np.testing.assert_allclose(january['mean'][0, 3, 6], 12.0)
+    np.testing.assert_allclose(january['m2'][0, 3, 6], 8.0)
+    assert january['count'][0, 0, 6] == 1
+    assert july['count'][0, 3, 6] == 1
+    assert int(cube['temperature'][2]['count'].sum()) == 0
+
+
+class QueueEngine:
+    """Serves climatology_queue rows to update_climatology; everything else is ignored."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    def execute(self, statement, parameters=None):
+        return self
+
+    def fetchall(self):
+        return self.rows
+
+
+def build_published_cube(base_dir):
+    directory = os.path.join(base_dir, 'v000001')
+    meta = create_cube(directory, degrees=DEGREES)
+    apply_profiles(meta, open_cube(directory), [profile_row(1, 1, 10.0), profile_row(2, 6, 20.0)])
+    publish_version(base_dir, directory)
+    return directory
+
+
+def test_update_only_copies_the_months_it_changes(tmp_path):
+    base_dir = str(tmp_path)
+    source = build_published_cube(base_dir)
+    source_files = {name: os.stat(os.path.join(source, name)) for name in os.listdir(source)}
+    # Keep the old version around the way a reader with it mapped would.
+    os.link(os.path.join(source, 'mean_temperature_m01.npy'), tmp_path / 'reader_view.npy')
+
+    assert update_climatology(QueueEngine([profile_row(5, 1, 14.0)]), base_dir) == 1
+
+    published = current_version(base_dir)
+    assert published != source and not os.path.exists(source)
+    for name in source_files:
+        if name == 'meta.json':
+            continue
+        linked = os.stat(os.path.join(published, name)).st_ino == source_files[name].st_ino
+        assert linked == ('_m01.' not in name), name
+
+    cube = open_cube(published, mode='r')
+    np.testing.assert_allclose(cube['temperature'][1]['mean'][0, 3, 6], 12.0)
+    assert cube['temperature'][1]['count'][0, 3, 6] == 2
+    np.testing.assert_allclose(np.load(tmp_path / 'reader_view.npy')[0, 3, 6], 10.0)
+    assert read_meta(published)['queue_id'] == 5
+
+
+def test_update_with_an_empty_queue_keeps_the_version(tmp_path):
+    source = build_published_cube(str(tmp_path))
+
+    assert update_climatology(QueueEngine([]), str(tmp_path)) == 0
+    assert current_version(str(tmp_path)) == source
+
+
+def test_update_without_a_cube(tmp_path):
+    assert update_climatology(QueueEngine([profile_row(1, 1, 10.0)]), str(tmp_path)) is None
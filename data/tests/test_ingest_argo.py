@@ -0,0 +1,415 @@
+# data/tests/test_ingest_argo.py
+
+import argparse
+import glob
+import os
+import sys
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pytest
+import pyarrow as pa
+import pyarrow.dataset as pads
+import xarray as xr
+
+# The ingest scripts import each other as top-level modules, so put
+# data/scripts on the path the same way running them directly would.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+import ingest_argo
+from ingest_argo import (LEVEL_COLUMNS, PROFILE_COLUMNS, IngestOptions, decode_platform_number,
+                         ensure_parquet_store, export_parquet_store, flatten_profiles, group_profiles,
+                         invalidate_parquet_store, iter_argo_profile_chunks, load_file_chunks, parquet_store_complete,
+                         parse_argo_profile, parse_qc_keep, qc_flag_mask, qc_policy_name, read_profile_arrays,
+                         valid_level_mask)
+from standard_levels import STANDARD_PRESSURE_LEVELS
+from synthetic_argo import write_synthetic_argo_file
+
+
+def make_arrays(n_prof=2, n_levels=4, qc=b'1'):
+    """N_PROF x N_LEVELS arrays shaped like read_profile_arrays returns them, every level valid."""
+    pres = np.tile(np.linspace(10, 40, n_levels, dtype='float32'), (n_prof, 1))
+    flags = np.full((n_prof, n_levels), qc, dtype='S1')
+    return {
+        'platform_id': '1902672',
+        'cycle_number': np.arange(1, n_prof + 1, dtype='int32'),
+        'timestamp': np.datetime64('2024-01-01', 'ns') + np.arange(n_prof) * np.timedelta64(10, 'D'),
+        'latitude': np.linspace(10, 11, n_prof),
+        'longitude': np.linspace(60, 61, n_prof),
+        'pressure': pres,
+        'temperature': np.full((n_prof, n_levels), 25.0, dtype='float32'),
+        'salinity': np.full((n_prof, n_levels), 35.0, dtype='float32'),
+        'pressure_qc': flags,
+        'temperature_qc': flags.copy(),
+        'salinity_qc': flags.copy(),
+    }
+
+
+def test_group_profiles_one_row_per_profile():
+    arrays = make_arrays()
+    arrays['temperature'][1, 2:] = np.nan
+
+    df = group_profiles(arrays)
+
+    assert list(df.columns) == PROFILE_COLUMNS
+    assert df['cycle_number'].tolist() == [1, 2]
+    assert [len(p) for p in df['pressure_dbar']] == [4, 2]
+    assert df['float_id'].tolist() == [1902672, 1902672]
+
+
+def test_group_profiles_drops_profiles_without_position_or_time():
+    arrays = make_arrays(n_prof=3)
+    arrays['latitude'][0] = np.nan
+    arrays['timestamp'][2] = np.datetime64('NaT')
+
+    df = group_profiles(arrays)
+
+    assert df['cycle_number'].tolist() == [2]
+
+
+def test_group_profiles_all_nan_returns_empty_frame():
+    arrays = make_arrays()
+    arrays['temperature'][:] = np.nan
+
+    df = group_profiles(arrays)
+
+    assert df.empty
+    assert list(df.columns) == PROFILE_COLUMNS
+    assert df.attrs['qc_dropped'] == 0
+
+
+def test_group_profiles_all_qc_rejected_returns_empty_frame():
+    arrays = make_arrays(qc=b'4')
+
+    df = group_profiles(arrays, qc_keep=('1', '2'))
+
+    assert df.empty
+    assert list(df.columns) == PROFILE_COLUMNS
+    assert df.attrs['qc_dropped'] == 8
+
+
+# --- NetCDF parsing ---
+def test_flatten_profiles_matches_a_per_level_loop(tmp_path):
+    path = write_synthetic_argo_file(str(tmp_path / '1902672_prof.nc'), n_prof=6, n_levels=20, seed=3)
+    with xr.open_dataset(path) as ds:
+        arrays = read_profile_arrays(ds)
+
+    df = flatten_profiles(arrays)
+
+    expected = [
+        (float(arrays['pressure'][i, j]), int(arrays['cycle_number'][i]))
+        for i in range(6) for j in range(20)
+        if not np.isnan([arrays['pressure'][i, j], arrays['temperature'][i, j], arrays['salinity'][i, j]]).any()
+    ]
+    assert list(df.columns) == LEVEL_COLUMNS
+    assert list(zip(df['pressure'].astype(float), df['cycle_number'])) == expected
+    assert set(df['platform_id']) == {'1902672'}
+
+
+def test_flatten_profiles_drops_levels_of_profiles_without_a_cycle_number():
+    arrays = make_arrays()
+    arrays['cycle_number'] = np.array([np.nan, 2.0])
+
+    df = flatten_profiles(arrays)
+
+    assert df['cycle_number'].tolist() == [2] * 4
+
+
+def test_parse_level_and_profile_layouts_agree(tmp_path):
+    path = write_synthetic_argo_file(str(tmp_path / '1902672_prof.nc'), n_prof=5, n_levels=30, seed=1)
+
+    levels = parse_argo_profile(path, layout='level')
+    profiles = parse_argo_profile(path, layout='profile')
+
+    assert list(profiles.columns) == PROFILE_COLUMNS
+    assert len(levels) == sum(len(p) for p in profiles['pressure_dbar'])
+    np.testing.assert_array_equal(np.concatenate(profiles['pressure_dbar'].to_list()), levels['pressure'])
+    assert all(len(t) == len(STANDARD_PRESSURE_LEVELS) for t in profiles['temperature_std'])
+
+
+def test_streamed_chunks_add_up_to_the_whole_file(tmp_path):
+    path = write_synthetic_argo_file(str(tmp_path / '1902672_prof.nc'), n_prof=7, n_levels=15, seed=2)
+    whole = parse_argo_profile(path, layout='profile', qc_keep=('1', '2'))
+
+    chunks = list(iter_argo_profile_chunks(path, 'profile', chunk_profiles=3, qc_keep=('1', '2')))
+
+    assert len(chunks) == 3
+    assert pd.concat(chunks)['cycle_number'].tolist() == whole['cycle_number'].tolist()
+    assert sum(chunk.attrs['qc_dropped'] for chunk in chunks) == whole.attrs['qc_dropped']
+
+
+def test_file_without_profiles_parses_to_an_empty_frame(tmp_path):
+    path = write_synthetic_argo_file(str(tmp_path / '1902672_prof.nc'), n_prof=0, n_levels=5)
+
+    df = parse_argo_profile(path, layout='level')
+
+    assert df.empty
+    assert list(df.columns) == LEVEL_COLUMNS
+
+
+def test_unreadable_file_parses_to_none(tmp_path):
+    path = tmp_path / 'broken_prof.nc'
+    path.write_bytes(b'not a netcdf file')
+
+    assert parse_argo_profile(str(path)) is None
+
+
+def test_decode_platform_number():
+    assert decode_platform_number(b'1902672 ') == '1902672'
+    assert decode_platform_number('  5904567') == '5904567'
+
+
+# --- QC filtering ---
+def test_parse_qc_keep():
+    assert parse_qc_keep('1,2') == ('1', '2')
+    assert parse_qc_keep(' 2 , 1,1 ') == ('1', '2')
+    assert parse_qc_keep('all') is None
+    assert parse_qc_keep('') is None
+    assert parse_qc_keep(None) is None
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_qc_keep('good')
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_qc_keep(',')
+
+
+def test_qc_policy_name():
+    assert qc_policy_name(('1', '2')) == 'keep:1,2'
+    assert qc_policy_name(None) == 'all'
+
+
+def test_qc_flag_mask_reads_bytes_and_str_flags():
+    expected = [[True, False, True, False]]
+
+    assert qc_flag_mask(np.array([[b'1', b'4', b'2', b' ']], dtype='S1'), ('1', '2')).tolist() == expected
+    assert qc_flag_mask(np.array([['1', '4', '2', ' ']]), ('1', '2')).tolist() == expected
+
+
+def test_valid_level_mask_needs_every_variable_flagged_good():
+    arrays = make_arrays(n_prof=1)
+    arrays['pressure_qc'][0, 0] = b'3'
+    arrays['temperature_qc'][0, 1] = b'4'
+    arrays['salinity'][0, 3] = np.nan
+
+    valid, dropped = valid_level_mask(arrays, ('1', '2'))
+
+    assert valid.tolist() == [[False, False, True, False]]
+    # The NaN level was never present, so it does not count as dropped for QC.
+    assert dropped == 2
+
+
+def test_valid_level_mask_without_a_policy_keeps_any_flag():
+    arrays = make_arrays(n_prof=1, qc=b'4')
+
+    valid, dropped = valid_level_mask(arrays)
+
+    assert valid.all()
+    assert dropped == 0
+
+
+def test_missing_qc_variables_are_not_filtered_on():
+    arrays = make_arrays(n_prof=1)
+    arrays['pressure_qc'] = None
+
+    valid, dropped = valid_level_mask(arrays, ('1', '2'))
+
+    assert valid.all()
+    assert dropped == 0
+
+
+def test_qc_policy_drops_flagged_levels_from_a_file(tmp_path):
+    path = write_synthetic_argo_file(str(tmp_path / '1902672_prof.nc'), n_prof=20, n_levels=40, seed=4)
+    with xr.open_dataset(path) as ds:
+        arrays = read_profile_arrays(ds)
+    flagged_bad = (arrays['temperature_qc'] == b'4') | (arrays['salinity_qc'] == b'4')
+
+    everything = parse_argo_profile(path, layout='level')
+    filtered = parse_argo_profile(path, layout='level', qc_keep=('1', '2'))
+
+    assert filtered.attrs['qc_dropped'] > 0
+    assert len(filtered) == len(everything) - filtered.attrs['qc_dropped']
+    bad_levels = {(int(arrays['cycle_number'][i]), float(arrays['pressure'][i, j]))
+                  for i, j in zip(*np.nonzero(flagged_bad))}
+    kept_levels = set(zip(filtered['cycle_number'], filtered['pressure'].astype(float)))
+    assert not bad_levels & kept_levels
+
+
+# --- Loading ---
+class FakeEngine:
+    """Stands in for the database: statements are ignored and the commit fails on request."""
+
+    def __init__(self, fail_commit=False):
+        self.fail_commit = fail_commit
+
+    @contextmanager
+    def begin(self):
+        yield self
+        if self.fail_commit:
+            raise RuntimeError("commit failed")
+
+    def execute(self, statement, parameters=None):
+        return None
+
+
+@pytest.fixture
+def offline_loader(monkeypatch):
+    """Skips the Postgres-only COPY, merge and manifest steps of load_file_chunks."""
+    monkeypatch.setitem(ingest_argo.LOADERS, 'copy', lambda connection, df, spec: None)
+    monkeypatch.setitem(ingest_argo.LAYOUTS, 'profile',
+                        ingest_argo.LAYOUTS['profile']._replace(merge=lambda connection: None))
+    monkeypatch.setattr(ingest_argo, 'record_manifest', lambda *args, **kwargs: None)
+
+
+def parquet_files(parquet_dir):
+    return sorted(os.path.relpath(path, parquet_dir) for path in
+                  glob.glob(os.path.join(parquet_dir, '**', '*.parquet'), recursive=True))
+
+
+def read_levels(parquet_dir):
+    """The published dataset as the API reads it."""
+    partitioning = pads.partitioning(pa.schema([('platform_id', pa.int64()), ('month', pa.string())]),
+                                     flavor='hive')
+    return pads.dataset(str(parquet_dir), format='parquet', partitioning=partitioning).to_table().to_pandas()
+
+
+def cycle_arrays(cycles, n_levels=4, days=None):
+    arrays = make_arrays(n_prof=len(cycles), n_levels=n_levels)
+    arrays['cycle_number'] = np.array(cycles, dtype='int32')
+    if days is not None:
+        arrays['timestamp'] = np.datetime64('2024-01-01', 'ns') + np.array(days) * np.timedelta64(1, 'D')
+    return arrays
+
+
+def test_load_publishes_parquet_after_commit(tmp_path, offline_loader):
+    options = IngestOptions(parquet_dir=str(tmp_path))
+    file_info = {'filename': '1902672_prof.nc'}
+
+    assert load_file_chunks(FakeEngine(), file_info, [group_profiles(make_arrays())], options)
+
+    assert parquet_files(tmp_path) == ['platform_id=1902672/month=2024-01/cycle-1.parquet',
+                                       'platform_id=1902672/month=2024-01/cycle-2.parquet']
+    assert not os.path.exists(tmp_path / '_staging' / f"1902672_prof-{os.getpid()}")
+    levels = read_levels(tmp_path)
+    assert len(levels) == 8
+    assert set(levels['platform_id']) == {1902672}
+
+
+def test_failed_commit_leaves_published_parquet_untouched(tmp_path, offline_loader):
+    options = IngestOptions(parquet_dir=str(tmp_path))
+    file_info = {'filename': '1902672_prof.nc'}
+    assert load_file_chunks(FakeEngine(), file_info, [group_profiles(make_arrays(n_prof=1))], options)
+    published = tmp_path / 'platform_id=1902672' / 'month=2024-01' / 'cycle-1.parquet'
+    before = published.read_bytes()
+
+    assert not load_file_chunks(FakeEngine(fail_commit=True), file_info,
+                                [group_profiles(make_arrays(n_prof=2))], options)
+
+    assert published.read_bytes() == before
+    assert parquet_files(tmp_path) == ['platform_id=1902672/month=2024-01/cycle-1.parquet']
+
+
+def test_reprocessed_cycle_replaces_its_levels(tmp_path, offline_loader):
+    options = IngestOptions(parquet_dir=str(tmp_path))
+    assert load_file_chunks(FakeEngine(), {'filename': 'R1902672_001.nc'},
+                            [group_profiles(cycle_arrays([1], n_levels=4))], options)
+
+    # The delayed-mode file of the same cycle, with one level fewer and a corrected date.
+    assert load_file_chunks(FakeEngine(), {'filename': 'D1902672_001.nc'},
+                            [group_profiles(cycle_arrays([1], n_levels=3, days=[40]))], options)
+
+    assert parquet_files(tmp_path) == ['platform_id=1902672/month=2024-02/cycle-1.parquet']
+    assert len(read_levels(tmp_path)) == 3
+
+
+def test_overlapping_files_store_each_cycle_once(tmp_path, offline_loader):
+    options = IngestOptions(parquet_dir=str(tmp_path))
+    assert load_file_chunks(FakeEngine(), {'filename': 'R1902672_002.nc'},
+                            [group_profiles(cycle_arrays([2]))], options)
+
+    assert load_file_chunks(FakeEngine(), {'filename': '1902672_prof.nc'},
+                            [group_profiles(cycle_arrays([1, 2, 3]))], options)
+
+    levels = read_levels(tmp_path)
+    assert len(levels) == 12
+    assert levels.groupby('cycle_number').size().tolist() == [4, 4, 4]
+
+
+def test_longest_profile_of_a_repeated_cycle_wins(tmp_path, offline_loader):
+    options = IngestOptions(parquet_dir=str(tmp_path))
+    arrays = cycle_arrays([5, 5], n_levels=4)
+    arrays['temperature'][0, 2:] = np.nan
+    # Streamed, the longer profile can also arrive in an earlier chunk than the shorter one.
+    chunks = [group_profiles({key: value if key == 'platform_id' else value[i:i + 1]
+                              for key, value in arrays.items()}) for i in (1, 0)]
+
+    assert load_file_chunks(FakeEngine(), {'filename': '1902672_prof.nc'}, [group_profiles(arrays)], options)
+    assert len(read_levels(tmp_path)) == 4
+    assert load_file_chunks(FakeEngine(), {'filename': '1902672_prof.nc'}, chunks, options)
+    assert len(read_levels(tmp_path)) == 4
+
+
+class ExportEngine:
+    """Streams the rows of a frame the way the export's server-side cursor does, `batch` rows at a time."""
+
+    def __init__(self, frame, batch):
+        self.frame = frame
+        self.batch = batch
+
+    @contextmanager
+    def connect(self):
+        yield self
+
+    def execution_options(self, **options):
+        return self
+
+    def execute(self, statement, parameters=None):
+        return self
+
+    def partitions(self):
+        rows = list(self.frame.itertuples(index=False))
+        for start in range(0, len(rows), self.batch):
+            yield rows[start:start + self.batch]
+
+
+def exported_frame(arrays, layout):
+    frame = group_profiles(arrays) if layout == 'profile' else flatten_profiles(arrays)
+    columns = [c for c in ingest_argo.LAYOUTS[layout].columns if c not in ('temperature_std', 'salinity_std')]
+    return frame.reindex(columns=columns)
+
+
+def test_export_rewrites_the_store_from_the_database(tmp_path):
+    legacy = tmp_path / 'platform_id=1902672' / 'month=2024-01' / 'R1902672_001.parquet'
+    legacy.parent.mkdir(parents=True)
+    legacy.write_bytes(b'')
+    engine = ExportEngine(exported_frame(cycle_arrays([1, 2, 3]), 'profile'), batch=2)
+
+    assert export_parquet_store(engine, str(tmp_path), 'profile') == 12
+
+    assert parquet_files(tmp_path) == [f'platform_id=1902672/month=2024-01/cycle-{c}.parquet' for c in (1, 2, 3)]
+    assert not os.path.exists(tmp_path / '_staging')
+    assert parquet_store_complete(str(tmp_path))
+    levels = read_levels(tmp_path)
+    assert levels.groupby('cycle_number').size().tolist() == [4, 4, 4]
+
+
+def test_level_export_keeps_each_cycle_whole_across_batches(tmp_path):
+    engine = ExportEngine(exported_frame(cycle_arrays([1, 2, 3]), 'level'), batch=3)
+
+    assert export_parquet_store(engine, str(tmp_path), 'level') == 12
+
+    assert read_levels(tmp_path).groupby('cycle_number').size().tolist() == [4, 4, 4]
+
+
+def test_store_is_exported_only_until_complete(tmp_path, monkeypatch):
+    exports = []
+    monkeypatch.setattr(ingest_argo, 'export_parquet_store', lambda *args: exports.append(args))
+    options = IngestOptions(parquet_dir=str(tmp_path))
+
+    ensure_parquet_store(None, options)
+    (tmp_path / ingest_argo.PARQUET_COMPLETE_MARKER).write_text('{}')
+    ensure_parquet_store(None, options)
+    invalidate_parquet_store(str(tmp_path))
+    invalidate_parquet_store(str(tmp_path))
+    ensure_parquet_store(None, options)
+
+    assert exports == [(None, str(tmp_path), 'profile')] * 2
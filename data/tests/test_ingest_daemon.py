@@ -0,0 +1,91 @@
+# data/tests/test_ingest_daemon.py
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+import ingest_daemon
+from ingest_argo import IngestOptions
+from ingest_daemon import WatchDirectoryIngest
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """A daemon over tmp_path whose manifest never has a file yet."""
+    monkeypatch.setattr(ingest_daemon, 'select_files_to_ingest', lambda engine, names, *args: names)
+    return WatchDirectoryIngest(None, IngestOptions(data_dir=str(tmp_path)), batch_files=10, pending_batches=2,
+                                settle_seconds=0)
+
+
+def write_file(path, size, mtime):
+    path.write_bytes(b'x' * size)
+    os.utime(path, (mtime, mtime))
+
+
+def take_batch(service):
+    return service.batches.get_nowait() if not service.batches.empty() else None
+
+
+def test_new_file_is_queued_once(tmp_path, service):
+    write_file(tmp_path / 'a.nc', 10, 1_000_000)
+
+    service.scan()
+    service.scan()
+
+    assert take_batch(service) == ['a.nc']
+    assert take_batch(service) is None
+    assert service.counters.snapshot()['files_discovered_total'] == 1
+
+
+def test_file_changed_while_loading_is_queued_again(tmp_path, service):
+    write_file(tmp_path / 'a.nc', 10, 1_000_000)
+    service.scan()
+    assert take_batch(service) == ['a.nc']
+
+    write_file(tmp_path / 'a.nc', 20, 1_000_100)
+    service.scan()
+    assert take_batch(service) is None
+    service._file_done('a.nc', True)
+    service.scan()
+
+    assert take_batch(service) == ['a.nc']
+
+
+def test_failed_file_waits_for_its_retry(tmp_path, service, monkeypatch):
+    write_file(tmp_path / 'a.nc', 10, 1_000_000)
+    service.scan()
+    assert take_batch(service) == ['a.nc']
+    service._file_done('a.nc', False)
+
+    service.scan()
+    assert take_batch(service) is None
+
+    retry_at = service._failures['a.nc'][1]
+    monkeypatch.setattr(ingest_daemon.time, 'time', lambda: retry_at + 1)
+    service.scan()
+    service.scan()
+    assert take_batch(service) == ['a.nc']
+    assert take_batch(service) is None
+    service._file_done('a.nc', False)
+
+    # The second failure waits twice as long.
+    assert service._failures['a.nc'][0] == 2
+    assert service._failures['a.nc'] == (2, retry_at + 1 + 2 * ingest_daemon.DEFAULT_RETRY_SECONDS)
+    assert service.counters.snapshot()['files_discovered_total'] == 2
+
+
+def test_failed_file_is_retried_once_it_changes(tmp_path, service):
+    write_file(tmp_path / 'a.nc', 10, 1_000_000)
+    service.scan()
+    assert take_batch(service) == ['a.nc']
+    service._file_done('a.nc', False)
+
+    write_file(tmp_path / 'a.nc', 20, 1_000_100)
+    service.scan()
+    assert take_batch(service) == ['a.nc']
+    service._file_done('a.nc', True)
+
+    assert service.metrics()['failed_files'] == 0
@@ -0,0 +1,81 @@
+# data/tests/test_standard_levels.py
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+from standard_levels import (STANDARD_PRESSURE_LEVELS, _nullable, interpolate_profile_lists,
+                             interpolate_to_levels)
+
+LEVELS = [10.0, 20.0, 50.0]
+
+
+def test_exact_and_interpolated_levels():
+    (temperature,) = interpolate_to_levels([0, 0, 0], [10.0, 30.0, 50.0], [[20.0, 16.0, 10.0]], 1, LEVELS)
+
+    np.testing.assert_allclose(temperature[0], [20.0, 18.0, 10.0])
+    assert temperature.dtype == np.float32
+
+
+def test_levels_outside_the_profile_are_not_extrapolated():
+    (temperature,) = interpolate_to_levels([0, 0], [15.0, 30.0], [[20.0, 17.0]], 1, LEVELS)
+
+    assert np.isnan(temperature[0, 0])
+    np.testing.assert_allclose(temperature[0, 1], 19.0)
+    assert np.isnan(temperature[0, 2])
+
+
+def test_wide_gaps_are_not_interpolated_across():
+    # 10 -> 100 dbar is wider than MIN_GAP_DBAR + GAP_FRACTION * 50.
+    (temperature,) = interpolate_to_levels([0, 0], [10.0, 100.0], [[20.0, 10.0]], 1, LEVELS)
+
+    np.testing.assert_allclose(temperature[0, 0], 20.0)
+    assert np.isnan(temperature[0, 1:]).all()
+
+
+def test_profiles_do_not_mix_and_may_arrive_unsorted():
+    profile_index = [1, 0, 1, 0]
+    pressure = [20.0, 20.0, 10.0, 10.0]
+    temperature, salinity = interpolate_to_levels(
+        profile_index, pressure, [[11.0, 21.0, 12.0, 22.0], [35.1, 34.1, 35.2, 34.2]], 3, LEVELS)
+
+    np.testing.assert_allclose(temperature[0, :2], [22.0, 21.0])
+    np.testing.assert_allclose(temperature[1, :2], [12.0, 11.0])
+    np.testing.assert_allclose(salinity[1, :2], [35.2, 35.1], rtol=1e-6)
+    # Profile 2 has no levels at all, and profile 0 does not reach 50 dbar.
+    assert np.isnan(temperature[2]).all()
+    assert np.isnan(temperature[:2, 2]).all()
+
+
+def test_no_levels():
+    temperature, salinity = interpolate_to_levels([], [], [[], []], 2, LEVELS)
+
+    assert temperature.shape == salinity.shape == (2, 3)
+    assert np.isnan(temperature).all()
+
+
+def test_profile_lists_drop_missing_values():
+    temperature, salinity = interpolate_profile_lists(
+        [[10.0, 15.0, 20.0], []],
+        [[20.0, None, 18.0], []],
+        [[35.0, 35.5, float('nan')], []],
+    )
+
+    assert len(temperature) == len(salinity) == 2
+    assert len(temperature[0]) == len(STANDARD_PRESSURE_LEVELS)
+    level_10 = list(STANDARD_PRESSURE_LEVELS).index(10.0)
+    np.testing.assert_allclose(temperature[0][level_10], 20.0)
+    # 20 dbar lost its salinity, so the salinity at 20 dbar is unbracketed.
+    assert np.isnan(salinity[0][level_10 + 1])
+    assert np.isnan(temperature[1]).all()
+
+
+def test_profile_with_no_bracketed_levels_becomes_all_nulls():
+    # One raw level between two standard levels brackets neither of them.
+    temperature, salinity = interpolate_profile_lists([[12.0]], [[20.0]], [[35.0]])
+
+    assert _nullable(temperature[0]) == [None] * len(STANDARD_PRESSURE_LEVELS)
+    assert _nullable(salinity[0]) == [None] * len(STANDARD_PRESSURE_LEVELS)